@@ -0,0 +1,143 @@
+'''
+    Some simple benchmarks for the bounce vector paddle.
+    Run it from this directory, since we load bounce_vector.kv:
+
+        > python benchmarks.py
+
+    With --json <file>, the results are saved for run_benchmarks.py
+    instead of printed.
+
+    Every benchmark also checks the results of what it timed, and stops
+    with an AssertionError if they are wrong.
+'''
+import os
+import sys
+from collections import namedtuple
+from random import Random
+
+from gamelib.benchmark import best_of, check, save_results
+
+# Kivy would otherwise try to parse our options as its own.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+
+Touch = namedtuple('Touch', 'x y')
+
+
+def load_kv():
+    # The App loads its kv file when it runs, but we don't run it.
+    from kivy.lang import Builder
+    from bounce_vector import BounceVectorApp
+
+    kv_file = os.path.abspath(BounceVectorApp.kv_file)
+
+    if kv_file not in Builder.files:
+        Builder.load_file(kv_file)
+
+
+def make_paddle():
+    from bounce_vector import Paddle
+
+    load_kv()
+
+    return Paddle(pos=(100, 100), size=(25, 150))
+
+
+def make_touches(count=1000, seed=0):
+    # touches all around the paddle, and some inside it
+    rng = Random(seed)
+
+    return [Touch(rng.uniform(0, 225), rng.uniform(0, 350))
+            for _i in range(count)]
+
+
+def check_positions(paddle, touch, start, end):
+    # The line starts on the edge of the paddle, and goes to the touch,
+    # or away from it if the touch is inside the paddle.
+    on_side = (start[0] in (paddle.x, paddle.right) and
+               paddle.y <= start[1] <= paddle.top)
+    on_end = (start[1] in (paddle.y, paddle.top) and
+              paddle.x <= start[0] <= paddle.right)
+    check(on_side or on_end,
+          'the bounce vector for {} starts off the paddle'.format(touch))
+
+    if paddle.collide_point(touch.x, touch.y):
+        expected = (2 * start[0] - touch.x, 2 * start[1] - touch.y)
+    else:
+        expected = (touch.x, touch.y)
+
+    check(abs(end[0] - expected[0]) < 1e-9 and
+          abs(end[1] - expected[1]) < 1e-9,
+          'the bounce vector for {} ends in the wrong place'.format(touch))
+
+
+def bench_positions(repeat=5):
+    '''
+        The start and end of the bounce vector line, per touch.
+    '''
+    paddle = make_paddle()
+    touches = make_touches()
+
+    def run():
+        for touch in touches:
+            start = paddle.get_start_position(touch)
+            paddle.get_end_position(start, touch)
+
+    elapsed = best_of(run, repeat) / len(touches)
+
+    for touch in touches:
+        start = paddle.get_start_position(touch)
+        check_positions(paddle, touch, start,
+                        paddle.get_end_position(start, touch))
+
+    return elapsed
+
+
+def bench_attach(repeat=5):
+    '''
+        A touch going down and up, which takes a bounce vector from the
+        pool and gives it back.
+    '''
+    from bounce_vector import bounce_vector_pool
+
+    paddle = make_paddle()
+    touches = make_touches()
+    bounce_vector_pool.prewarm(10)
+
+    def run():
+        for touch in touches:
+            paddle.attach_bounce_vector(touch)
+            paddle.move_bounce_vector(touch)
+            paddle.detach_bounce_vector()
+
+    elapsed = best_of(run, repeat) / len(touches)
+
+    check(paddle.bounce_vector is None and not paddle.children,
+          'a bounce vector was left on the paddle')
+    check(bounce_vector_pool.misses == 0,
+          'the pool made new bounce vectors instead of reusing them')
+
+    return elapsed
+
+
+def suite():
+    '''
+        All of the benchmarks as a flat dict of times in seconds.
+    '''
+    return {'positions': bench_positions(),
+            'attach_detach': bench_attach()}
+
+
+def main():
+    if '--json' in sys.argv:
+        filename = sys.argv[sys.argv.index('--json') + 1]
+        save_results(suite(), filename)
+        return
+
+    print('per touch (microseconds)')
+    print('{:>14} {:>10.2f}'.format('positions', bench_positions() * 1e6))
+    print('{:>14} {:>10.2f}'.format('attach_detach', bench_attach() * 1e6))
+
+
+if __name__ == '__main__':
+    main()
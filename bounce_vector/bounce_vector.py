@@ -1,17 +1,21 @@
+# This comes first, so that the startup timing covers the imports.
+from gamelib.startup import TimedStartup
+
 import kivy
 kivy.require('1.10.1')  # replace with your current kivy version !
 
-from kivy.lang import Builder
 from kivy.app import App
+from kivy.logger import Logger
 from kivy.graphics import Line
 from kivy.uix.widget import Widget
 from kivy.properties import (NumericProperty,
                              ObjectProperty)
 from kivy.vector import Vector
-from kivy.clock import Clock
-
 
-Builder.load_file('bounce_vector.kv')
+from gamelib import geometry
+from gamelib.pool import Pool
+from gamelib.scheduler import TickScheduler
+from gamelib.timestep import FixedTimestep
 
 
 class Paddle(Widget):
@@ -19,18 +23,25 @@ class Paddle(Widget):
     bounce_vector = None
 
     def attach_bounce_vector(self, touch):
+        if self.bounce_vector is not None:
+            # another touch came down before this one went up
+            self.detach_bounce_vector()
+
         start_pos = self.get_start_position(touch)
         end_pos = self.get_end_position(start_pos, touch)
 
-        self.bounce_vector = BounceVector(points=[start_pos[0], start_pos[1],
-                                                  end_pos[0], end_pos[1]])
+        self.bounce_vector = bounce_vector_pool.acquire()
+        self.bounce_vector.line.points = [start_pos[0], start_pos[1],
+                                          end_pos[0], end_pos[1]]
         self.add_widget(self.bounce_vector)
 
         self.bounce_vector.center = start_pos
 
     def detach_bounce_vector(self):
-        self.remove_widget(self.bounce_vector)
-        self.bounce_vector = None
+        if self.bounce_vector is not None:
+            self.remove_widget(self.bounce_vector)
+            bounce_vector_pool.release(self.bounce_vector)
+            self.bounce_vector = None
 
     def move_bounce_vector(self, touch):
         if self.bounce_vector is not None:
@@ -48,24 +59,8 @@ class Paddle(Widget):
             This needs to work even if the touch position is
             inside the paddle.
         '''
-        pos_x = self.clamp(touch.x, self.x, self.right)
-        pos_y = self.clamp(touch.y, self.y, self.top)
-
-        # this is a bit convoluted. We could probably do better
-        d_left = abs(pos_x - self.x)
-        d_right = abs(pos_x - self.right)
-        d_top = abs(pos_y - self.top)
-        d_bot = abs(pos_y - self.y)
-        d_min = min(d_left, d_bot, d_right, d_top)
-
-        if d_left == d_min:
-            return self.x, pos_y
-        elif d_right == d_min:
-            return self.right, pos_y
-        elif d_top == d_min:
-            return pos_x, self.top
-        else:
-            return pos_x, self.y
+        return geometry.surface_point(self.x, self.y, self.right, self.top,
+                                      touch.x, touch.y)
 
     def get_end_position(self, start, touch):
         '''
@@ -75,19 +70,8 @@ class Paddle(Widget):
             - If the touch position is inside the paddle, we will reverse
               the direction of our line relative to the starting point.
         '''
-        if self.inside_paddle(touch):
-            # reversed position relative to start
-            return (start[0] + (start[0] - touch.x),
-                    start[1] + (start[1] - touch.y))
-        else:
-            return touch.x, touch.y
-
-    def inside_paddle(self, touch):
-        return ((self.x < touch.x < self.right) and
-                (self.y < touch.y < self.top))
-
-    def clamp(self, x, lower, upper):
-        return max(lower, min(upper, x))
+        return geometry.end_point(self.x, self.y, self.right, self.top,
+                                  start, touch.x, touch.y)
 
 
 class BounceVector(Widget):
@@ -99,6 +83,10 @@ class BounceVector(Widget):
             self.line = Line(points=points, width=1)
 
 
+# Bounce vectors come and go with every touch, so we reuse them.
+bounce_vector_pool = Pool(BounceVector)
+
+
 class BounceVectorGame(Widget):
     player = ObjectProperty(None)
 
@@ -118,14 +106,37 @@ class BounceVectorGame(Widget):
         self.player.move_bounce_vector(touch)
 
 
-class BounceVectorApp(App):
+class BounceVectorApp(TimedStartup, App):
+    # The App loads this for us, rather than it being parsed when we
+    # are imported.
+    kv_file = 'bounce_vector.kv'
+
     def build(self):
         game = BounceVectorGame()
+        bounce_vector_pool.prewarm(10)
+
+        self.timestep = FixedTimestep(game.update, rate=60.0)
 
-        Clock.schedule_interval(game.update, 1.0 / 60.0)
+        # Nothing moves unless it is touched, so we stop ticking a
+        # second after the last touch.
+        self.scheduler = TickScheduler(self.timestep, idle_rate=0,
+                                       idle_after=1.0)
+        self.scheduler.start()
 
         return game
 
+    def on_pause(self):
+        self.scheduler.suspend()
+        return True
+
+    def on_resume(self):
+        self.scheduler.wake()
+
+    def on_stop(self):
+        self.scheduler.stop()
+        Logger.info('Pool: bounce vectors {}'.format(
+            bounce_vector_pool.stats()))
+
 
 if __name__ == '__main__':
     BounceVectorApp().run()
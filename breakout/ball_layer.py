@@ -0,0 +1,104 @@
+'''
+    Draw all of the extra balls of multi-ball with a single Mesh.
+
+    Each ball is a quad textured with a disc, so they look like the
+    Ellipse of the main ball.  The quads are written straight from the
+    NumPy position arrays, and unused quads are collapsed to nothing.
+    The mesh only grows, so adding and losing balls doesn't change the
+    number of draw calls.
+'''
+import numpy as np
+
+from kivy.graphics import InstructionGroup, Color, Mesh
+from kivy.graphics.texture import Texture
+
+
+# A mesh can't have more than 65535 indices
+MAX_BALLS = 65535 // 6
+FLOATS_PER_BALL = 4 * 4  # 4 vertices of x, y, u, v
+
+CORNERS_X = np.array([0, 1, 1, 0], dtype=np.float32)
+CORNERS_Y = np.array([0, 0, 1, 1], dtype=np.float32)
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+
+def make_disc_texture(size=64):
+    # a white disc with a soft edge, on a transparent background
+    center = (size - 1) / 2.0
+    y, x = np.mgrid[0:size, 0:size]
+    distance = np.hypot(x - center, y - center)
+    alpha = np.clip(size / 2.0 - distance, 0.0, 1.0)
+
+    pixels = np.empty((size, size, 4), dtype=np.uint8)
+    pixels[..., :3] = 255
+    pixels[..., 3] = (alpha * 255).astype(np.uint8)
+
+    texture = Texture.create(size=(size, size), colorfmt='rgba')
+    texture.blit_buffer(pixels.tobytes(), colorfmt='rgba',
+                        bufferfmt='ubyte')
+
+    return texture
+
+
+class BallLayer(InstructionGroup):
+    def __init__(self, color=(1, 0.9, 0, 0.75), **kwargs):
+        super(BallLayer, self).__init__(**kwargs)
+        self.texture = make_disc_texture()
+        self.capacity = 0
+        self.count = 0
+        self.vertices = np.zeros(0, dtype=np.float32)
+
+        self.add(Color(*color))
+        self.mesh = Mesh(mode='triangles', texture=self.texture)
+        self.add(self.mesh)
+
+    def reserve(self, count):
+        '''
+            Make room for at least count balls.
+        '''
+        if count <= self.capacity:
+            return
+
+        if count > MAX_BALLS:
+            raise ValueError('we can draw at most {} extra balls'
+                             .format(MAX_BALLS))
+
+        capacity = min(max(count, self.capacity * 2, 64), MAX_BALLS)
+        indices = (np.arange(capacity, dtype=np.uint32)[:, None] * 4 +
+                   QUAD_INDICES).astype(np.uint16)
+
+        self.capacity = capacity
+        self.vertices = np.zeros(capacity * FLOATS_PER_BALL,
+                                 dtype=np.float32)
+        quads = self.vertices.reshape(capacity, 4, 4)
+        quads[:, :, 2] = CORNERS_X
+        quads[:, :, 3] = CORNERS_Y
+        self.count = capacity
+
+        self.mesh.indices = indices.ravel()
+
+    def update(self, xs, ys, size):
+        '''
+            Put a ball at each of the (xs, ys) positions, and hide the
+            rest.  Call this once a frame.
+        '''
+        count = len(xs)
+
+        if count == 0 and self.count == 0:
+            return
+
+        self.reserve(count)
+        quads = self.vertices.reshape(self.capacity, 4, 4)
+        quads[:count, :, 0] = np.asarray(xs)[:, None] + CORNERS_X * size
+        quads[:count, :, 1] = np.asarray(ys)[:, None] + CORNERS_Y * size
+
+        # collapse the quads that were in use, but aren't any more
+        if self.count > count:
+            quads[count:self.count, :, 0:2] = 0.0
+
+        self.count = count
+        self.mesh.vertices = self.vertices
+
+    @property
+    def draw_calls(self):
+        return 1 if self.capacity else 0
@@ -0,0 +1,525 @@
+'''
+    Some simple benchmarks for the breakout game logic.
+    Most of these don't need a window, so they can be run anywhere:
+
+        > python benchmarks.py
+
+    The rendering benchmarks need a GL context, so they are only run
+    with the --render option.  On a machine without a display, SDL can
+    give us an offscreen window:
+
+        > SDL_VIDEODRIVER=offscreen python benchmarks.py --render
+
+    With --json <file>, the results are saved for run_benchmarks.py
+    instead of printed.
+
+    Every benchmark also checks the results of what it timed, and stops
+    with an AssertionError if they are wrong.
+'''
+import os
+import sys
+import tracemalloc
+from random import Random
+from timeit import default_timer
+
+import numpy as np
+
+from gamelib import geometry
+from gamelib.benchmark import best_of, check, save_results
+
+from simulation import BallState, BreakoutSim
+
+
+LEVEL_SIZES = ((8, 5), (50, 25), (200, 100), (400, 200))
+RENDER_SIZES = ((8, 5), (50, 25), (100, 50), (200, 100))
+BALL_COUNTS = (1, 10, 100, 1000, 5000)
+
+# Kivy would otherwise try to parse our options as its own.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+
+def make_sim(level_width, level_height, width=1600, height=1200):
+    sim = BreakoutSim(width, height)
+    sim.level_width = level_width
+    sim.level_height = level_height
+    sim.load_level()
+
+    return sim
+
+
+def linear_find_brick(sim, rect):
+    # The way hit_a_brick() used to work, checking every brick
+    bricks = sim.bricks
+
+    for i in bricks.indices():
+        if bricks.collides(i, rect):
+            return i
+
+    return None
+
+
+def ball_positions(sim, count, seed=0):
+    # random ball positions over the upper half, where the bricks are.
+    rng = Random(seed)
+
+    return [(rng.uniform(0, sim.width - sim.ball.width),
+             rng.uniform(sim.height / 2, sim.height - sim.ball.height))
+            for _i in range(count)]
+
+
+def time_per_call(func, sim, positions):
+    ball = sim.ball
+    start = default_timer()
+
+    for ball.x, ball.y in positions:
+        func(sim, ball)
+
+    return (default_timer() - start) / len(positions)
+
+
+def check_find_brick(sim, positions):
+    # The grid can find a different brick when the ball overlaps two,
+    # but it has to find one whenever there is one.
+    bricks, ball = sim.bricks, sim.ball
+
+    for ball.x, ball.y in positions:
+        linear = linear_find_brick(sim, ball)
+        grid = sim.find_brick(ball)
+
+        check((linear is None) == (grid is None),
+              'find_brick() disagrees with checking every brick at '
+              '({:.1f}, {:.1f})'.format(ball.x, ball.y))
+        check(grid is None or bricks.collides(grid, ball),
+              'find_brick() found a brick the ball does not touch')
+
+
+def bench_hit_a_brick(sizes=LEVEL_SIZES, ticks=2000):
+    '''
+        Per-tick cost of finding the brick hit by the ball, the old
+        way scanning all bricks, and with the grid index.
+    '''
+    results = []
+
+    for level_width, level_height in sizes:
+        sim = make_sim(level_width, level_height)
+        positions = ball_positions(sim, ticks)
+
+        linear = time_per_call(linear_find_brick, sim, positions[:200])
+        grid = time_per_call(BreakoutSim.find_brick, sim, positions)
+        check_find_brick(sim, positions[:200])
+
+        results.append((level_width * level_height, linear, grid))
+
+    return results
+
+
+class Box(object):
+    def __init__(self, x, y, width, height):
+        self.x, self.y = x, y
+        self.right, self.top = x + width, y + height
+
+
+def make_vector_solid():
+    # The way the Solid mixin worked before it used gamelib.geometry,
+    # with a few Kivy Vectors for every bounce.
+    from kivy.vector import Vector
+
+    class VectorSolid(Box):
+        def get_bounce_vector(self, other):
+            n = self.get_surface_normal(other)
+            d = Vector(other.velocity)
+
+            return d - 2.0 * (d.dot(n)) * n
+
+        def get_surface_normal(self, other):
+            return self.get_surface_vector(other).normalize()
+
+        def get_surface_vector(self, other):
+            start = self.get_surface_point(other)
+            end = self.get_end_point(start, other)
+
+            return Vector(end[0] - start[0],
+                          end[1] - start[1])
+
+        def get_surface_point(self, other):
+            pos_x = self.clamp(other.center_x, self.x, self.right)
+            pos_y = self.clamp(other.center_y, self.y, self.top)
+
+            d_left = abs(pos_x - self.x)
+            d_right = abs(pos_x - self.right)
+            d_top = abs(pos_y - self.top)
+            d_bot = abs(pos_y - self.y)
+            d_min = min(d_left, d_bot, d_right, d_top)
+
+            if d_left == d_min:
+                return self.x, pos_y
+            elif d_right == d_min:
+                return self.right, pos_y
+            elif d_top == d_min:
+                return pos_x, self.top
+            else:
+                return pos_x, self.y
+
+        def get_end_point(self, start, other):
+            if self.inside_paddle(other):
+                return (start[0] + (start[0] - other.center_x),
+                        start[1] + (start[1] - other.center_y))
+            else:
+                return other.center_x, other.center_y
+
+        def inside_paddle(self, other):
+            return Vector.in_bbox((other.center_x, other.center_y),
+                                  (self.x, self.y),
+                                  (self.right, self.top))
+
+        def clamp(self, x, lower, upper):
+            return max(lower, min(upper, x))
+
+    return VectorSolid
+
+
+def allocated_per_call(func, *args):
+    # the most memory a call has in use at once, in bytes
+    tracemalloc.start()
+    func(*args)
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    func(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    return peak - base
+
+
+def bench_reflection(count=10000, seed=0):
+    '''
+        Per ball cost of bouncing balls off a box: the old Solid with
+        Kivy Vectors, the new Solid, the scalar geometry function, and
+        the batch one.
+    '''
+    from main import Solid
+
+    class GeometrySolid(Box, Solid):
+        pass
+
+    VectorSolid = make_vector_solid()
+    box = (100.0, 100.0, 200.0, 20.0)
+    rng = Random(seed)
+    balls = []
+
+    for _i in range(count):
+        ball = BallState(10.0)
+        ball.center_x = rng.uniform(50, 350)
+        ball.center_y = rng.uniform(50, 170)
+        ball.velocity = rng.uniform(-300, 300), rng.uniform(-300, 300)
+        balls.append(ball)
+
+    left, bottom, right, top = box[0], box[1], box[0] + box[2], box[1] + box[3]
+
+    def scalar(ball):
+        return geometry.bounce_vector(left, bottom, right, top,
+                                      ball.center_x, ball.center_y,
+                                      ball.velocity_x, ball.velocity_y)
+
+    xs = np.array([b.center_x for b in balls])
+    ys = np.array([b.center_y for b in balls])
+    v_xs = np.array([b.velocity_x for b in balls])
+    v_ys = np.array([b.velocity_y for b in balls])
+
+    def batch():
+        return geometry.bounce_vectors(left, bottom, right, top,
+                                       xs, ys, v_xs, v_ys)
+
+    results = []
+    expected = np.column_stack(batch())
+
+    for name, func in (('Vector Solid', VectorSolid(*box).get_bounce_vector),
+                       ('Solid', GeometrySolid(*box).get_bounce_vector),
+                       ('geometry', scalar)):
+        start = default_timer()
+
+        for ball in balls:
+            func(ball)
+
+        elapsed = (default_timer() - start) / count
+        results.append((name, elapsed, allocated_per_call(func, balls[0])))
+
+        bounces = np.array([tuple(func(ball)) for ball in balls])
+        check(np.allclose(bounces, expected),
+              '{} bounces differently from the batch'.format(name))
+
+    start = default_timer()
+    batch()
+    elapsed = (default_timer() - start) / count
+    results.append(('batch', elapsed, allocated_per_call(batch) / count))
+
+    return results
+
+
+def check_bricks_removed(layer, count):
+    # every removed brick has its corners collapsed onto one point
+    check(not layer.dirty, 'flush() left dirty meshes')
+    corners = np.concatenate([np.asarray(vertices).reshape(-1, 4, 4)
+                              for vertices in layer.vertices])[:count]
+    check(np.all(corners[:, :, :2] == corners[:, :1, :2]),
+          'remove_brick() left some bricks showing')
+
+
+def bench_brick_rendering(sizes=RENDER_SIZES, repeat=5):
+    '''
+        Time to show a level and then destroy all of its bricks, with
+        a widget per brick and with the BrickLayer meshes.
+    '''
+    from kivy.base import EventLoop
+    from kivy.lang import Builder
+    from kivy.uix.widget import Widget
+
+    EventLoop.ensure_window()
+    Builder.load_file('breakout.kv')
+
+    from brick_layer import BrickLayer
+    from main import Brick
+
+    results = []
+
+    for level_width, level_height in sizes:
+        sim = make_sim(level_width, level_height)
+        bricks = sim.bricks
+        indices = bricks.indices()
+
+        parent = Widget()
+        start = default_timer()
+        widgets = {}
+
+        for i in indices:
+            widgets[i] = Brick(pos=(bricks.x[i], bricks.y[i]),
+                               size=(bricks.width[i], bricks.height[i]),
+                               value=bricks.value[i], hue=bricks.hue[i])
+            parent.add_widget(widgets[i])
+
+        widget_load = default_timer() - start
+        start = default_timer()
+
+        for i in indices:
+            parent.remove_widget(widgets.pop(i))
+
+        widget_remove = default_timer() - start
+        check(not parent.children, 'some brick widgets were left')
+
+        layer = BrickLayer()
+        mesh_load = mesh_remove = None
+
+        for _i in range(repeat):
+            start = default_timer()
+            layer.load(bricks)
+            elapsed = default_timer() - start
+            mesh_load = elapsed if mesh_load is None else min(mesh_load,
+                                                              elapsed)
+            start = default_timer()
+
+            for i in indices:
+                layer.remove_brick(i)
+                layer.flush()
+
+            elapsed = default_timer() - start
+            mesh_remove = elapsed if mesh_remove is None else min(
+                mesh_remove, elapsed)
+
+        check_bricks_removed(layer, len(indices))
+
+        results.append((len(indices), widget_load, widget_remove,
+                        mesh_load, mesh_remove, layer.draw_calls))
+
+    return results
+
+
+def bench_load_level(sizes=LEVEL_SIZES, repeat=3):
+    '''
+        Time to lay out a level, and to clear it away again.
+    '''
+    results = []
+
+    for level_width, level_height in sizes:
+        sim = make_sim(level_width, level_height)
+        load = best_of(sim.load_level, repeat)
+        check(len(sim.bricks.indices()) == level_width * level_height,
+              'load_level() laid out the wrong number of bricks')
+        reset = None
+
+        for _i in range(repeat):
+            sim.load_level()
+            start = default_timer()
+            sim.reset_level()
+            elapsed = default_timer() - start
+            reset = elapsed if reset is None else min(reset, elapsed)
+
+        check(not sim.bricks.indices() and sim.grid is None,
+              'reset_level() left bricks behind')
+
+        results.append((level_width * level_height, load, reset))
+
+    return results
+
+
+def bench_ticks(ticks=3000, repeat=3):
+    '''
+        The cost of a whole update tick, in demo mode, and in a game
+        played by the AI.
+    '''
+    results = []
+
+    for name in ('demo', 'game'):
+        sim = BreakoutSim(1600, 1200, seed=0)
+
+        if name == 'demo':
+            sim.start_demo()
+        else:
+            sim.autoplay = True
+            sim.start_game()
+
+        def run():
+            done = 0
+
+            while done < ticks:
+                done += sim.step(ticks - done)
+
+                # the AI does lose, so keep it playing
+                if sim.game_over:
+                    sim.start_game()
+
+        results.append((name, best_of(run, repeat) / ticks))
+
+        ball = sim.ball
+        check(sim.ticks == ticks * repeat, 'step() skipped some ticks')
+        check(sim.game_in_play == (name == 'game'),
+              'the {} ran in the wrong mode'.format(name))
+        check(ball.x >= 0 and ball.right <= sim.width and
+              ball.top <= sim.height, 'the ball got out through a wall')
+
+    return results
+
+
+def bench_multi_ball(ticks=60):
+    '''
+        The cost of a tick with lots of extra balls.  The balls are
+        sent off from the middle of the screen, so they hit the walls,
+        the bricks and the paddle during the run.
+    '''
+    results = []
+
+    for count in BALL_COUNTS:
+        sim = make_sim(50, 25)
+        sim.rng.seed(count)
+        sim.serve_ball()
+        sim.ball.center_y = sim.height / 2.0
+        sim.spawn_balls(count)
+        bricks = len(sim.bricks.indices())
+
+        start = default_timer()
+        sim.step(ticks)
+        elapsed = (default_timer() - start) / ticks
+
+        results.append((count, elapsed, len(sim.extra_balls)))
+
+        balls = sim.extra_balls
+        check(len(sim.bricks.indices()) < bricks,
+              'none of the balls hit a brick')
+        check(np.all(balls.x >= 0) and
+              np.all(balls.x + balls.size <= sim.width) and
+              np.all(balls.y + balls.size <= sim.height),
+              'some of the balls got out through a wall')
+
+    return results
+
+
+def suite(render=False):
+    '''
+        All of the benchmarks as a flat dict of times in seconds.
+    '''
+    results = {}
+
+    for bricks, _linear, grid in bench_hit_a_brick():
+        results['hit_a_brick.{}'.format(bricks)] = grid
+
+    for bricks, load, reset in bench_load_level():
+        results['load_level.{}'.format(bricks)] = load
+        results['reset_level.{}'.format(bricks)] = reset
+
+    for name, elapsed, _allocated in bench_reflection():
+        results['bounce.' + name.lower().replace(' ', '_')] = elapsed
+
+    for name, elapsed in bench_ticks():
+        results['tick.' + name] = elapsed
+
+    for count, elapsed, _left in bench_multi_ball():
+        results['multi_ball.{}'.format(count)] = elapsed
+
+    if render:
+        for result in bench_brick_rendering():
+            bricks = result[0]
+            results['mesh_load.{}'.format(bricks)] = result[3]
+            results['mesh_remove.{}'.format(bricks)] = result[4]
+
+    return results
+
+
+def main():
+    if '--json' in sys.argv:
+        filename = sys.argv[sys.argv.index('--json') + 1]
+        save_results(suite('--render' in sys.argv), filename)
+        return
+
+    print('hit_a_brick per-tick cost (microseconds)')
+    print('{:>10} {:>12} {:>12}'.format('bricks', 'linear', 'grid'))
+
+    for bricks, linear, grid in bench_hit_a_brick():
+        print('{:>10} {:>12.2f} {:>12.2f}'.format(bricks,
+                                                  linear * 1e6, grid * 1e6))
+
+    print('')
+    print('load_level and reset_level (milliseconds)')
+    print('{:>10} {:>12} {:>12}'.format('bricks', 'load', 'reset'))
+
+    for bricks, load, reset in bench_load_level():
+        print('{:>10} {:>12.3f} {:>12.3f}'.format(bricks, load * 1e3,
+                                                  reset * 1e3))
+
+    print('')
+    print('update tick (microseconds)')
+
+    for name, elapsed in bench_ticks():
+        print('{:>10} {:>12.2f}'.format(name, elapsed * 1e6))
+
+    print('')
+    print('bounce a ball off a box')
+    print('{:>14} {:>12} {:>14}'.format('', 'microseconds', 'bytes in use'))
+
+    for name, elapsed, allocated in bench_reflection():
+        print('{:>14} {:>12.3f} {:>14.0f}'.format(name, elapsed * 1e6,
+                                                  allocated))
+
+    print('')
+    print('multi-ball tick cost (microseconds)')
+    print('{:>10} {:>12} {:>12} {:>10}'.format('balls', 'per tick',
+                                               'per ball', 'left'))
+
+    for count, elapsed, left in bench_multi_ball():
+        print('{:>10} {:>12.1f} {:>12.2f} {:>10}'.format(
+            count, elapsed * 1e6, elapsed * 1e6 / count, left))
+
+    if '--render' in sys.argv:
+        print('')
+        print('show and destroy a level (milliseconds)')
+        print('{:>10} {:>12} {:>12} {:>12} {:>12} {:>6}'.format(
+            'bricks', 'widget load', 'widget rm', 'mesh load', 'mesh rm',
+            'draws'))
+
+        for result in bench_brick_rendering():
+            bricks, times, draw_calls = result[0], result[1:5], result[5]
+            print('{:>10} {:>12.1f} {:>12.1f} {:>12.1f} {:>12.1f} {:>6}'
+                  .format(bricks, *[t * 1e3 for t in times] +
+                          [draw_calls]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+'''
+    The bricks of a level, stored column-wise in flat arrays.
+
+    A brick is never moved once it is laid out, so we only need an
+    alive flag to remove it, and a count of the hits it has left.
+'''
+from array import array
+
+import numpy as np
+
+from gamelib.rect import Rect
+
+
+class BrickField(object):
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.x = array('d')
+        self.y = array('d')
+        self.width = array('d')
+        self.height = array('d')
+        self.value = array('i')
+        self.hue = array('d')
+        self.hits = array('i')
+        self.alive = bytearray()
+        self.remaining = 0
+
+    @classmethod
+    def from_arrays(cls, x, y, width, height, value, hue, hits):
+        '''
+            A field of all of the bricks in some NumPy arrays (or
+            anything NumPy can turn into arrays) at once.
+        '''
+        bricks = cls()
+
+        for column, values in ((bricks.x, x), (bricks.y, y),
+                               (bricks.width, width),
+                               (bricks.height, height),
+                               (bricks.value, value), (bricks.hue, hue),
+                               (bricks.hits, hits)):
+            dtype = np.intc if column.typecode == 'i' else np.float64
+            column.frombytes(np.ascontiguousarray(values, dtype).tobytes())
+
+        bricks.alive = bytearray(b'\x01') * len(bricks.x)
+        bricks.remaining = len(bricks.x)
+
+        return bricks
+
+    def __len__(self):
+        return self.remaining
+
+    def add(self, x, y, width, height, value, hue, hits=1):
+        self.x.append(x)
+        self.y.append(y)
+        self.width.append(width)
+        self.height.append(height)
+        self.value.append(value)
+        self.hue.append(hue)
+        self.hits.append(hits)
+        self.alive.append(1)
+        self.remaining += 1
+
+        return len(self.alive) - 1
+
+    def hit(self, i):
+        '''
+            Knock a hit off brick i.  Returns True if that broke it.
+        '''
+        self.hits[i] -= 1
+
+        return self.hits[i] <= 0
+
+    def remove(self, i):
+        if self.alive[i]:
+            self.alive[i] = 0
+            self.remaining -= 1
+
+    def rect(self, i):
+        return Rect(self.x[i], self.y[i], self.width[i], self.height[i])
+
+    def indices(self):
+        return [i for i, a in enumerate(self.alive) if a]
+
+    def collides(self, i, other):
+        x, y = self.x[i], self.y[i]
+
+        return not (x + self.width[i] < other.x or x > other.right or
+                    y + self.height[i] < other.y or y > other.top)
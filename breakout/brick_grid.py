@@ -0,0 +1,90 @@
+'''
+    A uniform grid index for the bricks of a level.
+
+    load_level() lays the bricks out in a regular grid of cells, one
+    brick per cell, so we can find the bricks a ball might be touching
+    by looking only at the few cells that its bounding box overlaps,
+    instead of testing every brick in the level.
+'''
+from array import array
+from math import floor
+
+import numpy as np
+
+
+class BrickGrid(object):
+    def __init__(self, x, y, cell_width, cell_height, cols, rows):
+        self.x = x
+        self.y = y
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.cols = cols
+        self.rows = rows
+
+        # brick index for each cell, or -1 if the cell is empty
+        self.cells = array('i', [-1]) * (cols * rows)
+        # cell index for each brick, so we can remove a brick in O(1)
+        self.cell_of = array('i')
+
+    def add(self, brick, col, row):
+        cell = row * self.cols + col
+        self.cells[cell] = brick
+
+        if brick >= len(self.cell_of):
+            self.cell_of.extend([-1] * (brick + 1 - len(self.cell_of)))
+
+        self.cell_of[brick] = cell
+
+    def fill(self, cols, rows):
+        '''
+            Add bricks 0, 1, 2... to the cells at (cols[i], rows[i]) all
+            at once, where cols and rows are NumPy arrays.
+        '''
+        cell_of = (rows * self.cols + cols).astype(np.intc)
+        cells = np.full(self.cols * self.rows, -1, dtype=np.intc)
+        cells[cell_of] = np.arange(len(cell_of), dtype=np.intc)
+
+        self.cells = array('i', cells.tobytes())
+        self.cell_of = array('i', cell_of.tobytes())
+
+    def remove(self, brick):
+        cell = self.cell_of[brick]
+
+        if cell >= 0:
+            self.cells[cell] = -1
+            self.cell_of[brick] = -1
+
+    def cell_range(self, x0, x1, lower, cell_size, count):
+        first = int(floor((x0 - lower) / cell_size))
+        last = int(floor((x1 - lower) / cell_size))
+
+        if last < 0 or first >= count:
+            return 0, 0
+
+        return max(first, 0), min(last, count - 1) + 1
+
+    def query(self, rect):
+        '''
+            Return the indices of the bricks in the cells that the
+            rect overlaps, lowest index first, so we pick the same brick
+            a scan over the whole level would.
+        '''
+        col0, col1 = self.cell_range(rect.x, rect.right, self.x,
+                                     self.cell_width, self.cols)
+        row0, row1 = self.cell_range(rect.y, rect.top, self.y,
+                                     self.cell_height, self.rows)
+        cells, cols = self.cells, self.cols
+        found = []
+
+        for row in range(row0, row1):
+            offset = row * cols
+
+            for col in range(col0, col1):
+                brick = cells[offset + col]
+
+                if brick >= 0:
+                    found.append(brick)
+
+        found.sort()
+
+        return found
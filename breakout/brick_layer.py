@@ -0,0 +1,140 @@
+'''
+    Draw the whole brick field of a level with a handful of Mesh
+    instructions, instead of a Widget with its own canvas per brick.
+
+    The default Kivy shader doesn't have per-vertex colors, so we give
+    the mesh a small texture holding a strip of hues, and point the
+    texture coordinates of each brick at its hue.
+
+    A destroyed brick is collapsed to zero size in our vertex buffer,
+    and the buffers that changed are handed to their Mesh once per frame
+    in flush(), so removing bricks doesn't change any draw calls.
+'''
+from array import array
+from colorsys import hsv_to_rgb
+
+import numpy as np
+
+from kivy.graphics import InstructionGroup, Color, Mesh
+from kivy.graphics.texture import Texture
+
+
+# A mesh can't have more than 65535 indices, so big levels are split
+# into several meshes.
+BRICKS_PER_MESH = 65535 // 6
+FLOATS_PER_BRICK = 4 * 4  # 4 vertices of x, y, u, v
+HUE_STEPS = 64
+
+
+def make_hue_texture(steps=HUE_STEPS):
+    pixels = bytearray()
+
+    for i in range(steps):
+        rgb = hsv_to_rgb(i / float(steps), 1.0, 1.0)
+        pixels.extend(int(c * 255) for c in rgb)
+
+    texture = Texture.create(size=(steps, 1), colorfmt='rgb')
+    texture.blit_buffer(bytes(pixels), colorfmt='rgb', bufferfmt='ubyte')
+    texture.mag_filter = 'nearest'
+    texture.min_filter = 'nearest'
+
+    return texture
+
+
+def build_buffers(bricks):
+    '''
+        The vertex and index buffers of each mesh for a BrickField.
+        This doesn't touch OpenGL, so it can run on any thread.
+    '''
+    count = len(bricks.alive)
+
+    if count == 0:
+        return []
+
+    x, y = np.frombuffer(bricks.x), np.frombuffer(bricks.y)
+    alive = np.frombuffer(bytes(bricks.alive), dtype=np.uint8) != 0
+    r = np.where(alive, x + np.frombuffer(bricks.width), x)
+    t = np.where(alive, y + np.frombuffer(bricks.height), y)
+    # the texture coordinate of the middle of each brick's hue texel
+    u = ((np.floor(np.frombuffer(bricks.hue) * HUE_STEPS) % HUE_STEPS + 0.5) /
+         HUE_STEPS)
+    v = np.full(count, 0.5)
+
+    # x, y, u, v of the 4 corners of each brick
+    vertices = np.stack([x, y, u, v, r, y, u, v,
+                         r, t, u, v, x, t, u, v], axis=1).astype(np.float32)
+    quad = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint16)
+    buffers = []
+
+    for first in range(0, count, BRICKS_PER_MESH):
+        last = min(first + BRICKS_PER_MESH, count)
+        corners = np.arange(0, (last - first) * 4, 4, dtype=np.uint16)
+        indices = corners[:, None] + quad
+
+        buffers.append((array('f', vertices[first:last].tobytes()),
+                        array('H', indices.tobytes())))
+
+    return buffers
+
+
+class BrickLayer(InstructionGroup):
+    def __init__(self, **kwargs):
+        super(BrickLayer, self).__init__(**kwargs)
+        self.texture = make_hue_texture()
+        self.meshes = []
+        self.vertices = []
+        self.dirty = set()
+
+        self.add(Color(1, 1, 1, 1))
+
+    def clear_bricks(self):
+        for mesh in self.meshes:
+            self.remove(mesh)
+
+        self.meshes = []
+        self.vertices = []
+        self.dirty.clear()
+
+    def load(self, bricks, buffers=None):
+        '''
+            Build the meshes for a BrickField.  Bricks keep their index
+            in the field, so we can find them again to remove them.
+            The buffers can be made ahead of time with build_buffers().
+        '''
+        self.clear_bricks()
+
+        if buffers is None:
+            buffers = build_buffers(bricks)
+
+        for vertices, indices in buffers:
+            mesh = Mesh(vertices=vertices, indices=indices,
+                        mode='triangles', texture=self.texture)
+            self.add(mesh)
+            self.meshes.append(mesh)
+            self.vertices.append(vertices)
+
+    def remove_brick(self, i):
+        chunk, offset = divmod(i, BRICKS_PER_MESH)
+        vertices = self.vertices[chunk]
+        start = offset * FLOATS_PER_BRICK
+
+        # Collapse the other corners onto the first one.
+        x, y = vertices[start], vertices[start + 1]
+        for corner in range(start + 4, start + FLOATS_PER_BRICK, 4):
+            vertices[corner] = x
+            vertices[corner + 1] = y
+
+        self.dirty.add(chunk)
+
+    def flush(self):
+        '''
+            Hand the changed vertex buffers to their meshes.
+        '''
+        for chunk in self.dirty:
+            self.meshes[chunk].vertices = self.vertices[chunk]
+
+        self.dirty.clear()
+
+    @property
+    def draw_calls(self):
+        return len(self.meshes)
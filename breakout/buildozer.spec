@@ -13,7 +13,7 @@ package.domain = org.james.makela
 source.dir = .
 
 # (list) Source files to include (let empty to include all the files)
-source.include_exts = py,kv,png
+source.include_exts = py,kv,png,level
 
 # (list) List of inclusions using pattern matching
 #source.include_patterns = assets/*,images/*.png
@@ -36,7 +36,7 @@ version = 0.1
 
 # (list) Application requirements
 # comma seperated e.g. requirements = sqlite3,kivy
-requirements = kivy
+requirements = kivy,numpy
 
 # (str) Custom source folders for requirements
 # Sets custom source for any requirements with recipes
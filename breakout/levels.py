@@ -0,0 +1,214 @@
+'''
+    Level files, and laying levels out as bricks.
+
+    A level file is plain text.  It lists the kinds of brick it uses,
+    and then draws the grid of bricks with a character per brick, top
+    row first:
+
+        # the first level
+        brick a 1 0.0
+        brick b 2 0.2
+        brick c 5 0.4 2
+        cccccccc
+        bbbbbbbb
+        a.a.a.a.
+
+    A brick line gives the character, the points the brick is worth, its
+    hue (0 to 1), and how many hits it takes to break, which is 1 if it
+    is left out.  A '.' is an empty cell, and short rows are padded with
+    them.  Blank lines and lines starting with '#' are skipped.
+
+    Laying a level out turns it into the BrickField and BrickGrid of a
+    sim, all with NumPy, so even a grid of tens of thousands of bricks
+    only takes a few milliseconds.  A LevelLoader can also do it on a
+    worker thread, for the next level while the current one is played.
+'''
+import os
+from concurrent.futures import ThreadPoolExecutor
+from glob import glob
+
+import numpy as np
+
+from brick_field import BrickField
+from brick_grid import BrickGrid
+
+
+EMPTY = '.'
+GRID_PADDING = 2
+CELL_PADDING = 2
+
+
+class Level(object):
+    '''
+        A grid of bricks, as cells[row, col] with row 0 at the bottom.
+        A cell is 0 if it is empty, or else n for the brick kinds[n - 1],
+        where each kind is a (value, hue, hits) tuple.
+    '''
+    def __init__(self, cells, kinds, name=''):
+        self.cells = np.asarray(cells, dtype=np.uint16)
+        self.kinds = list(kinds)
+        self.name = name
+
+        if self.cells.ndim != 2:
+            raise ValueError('level cells must be a 2D array')
+
+    @property
+    def cols(self):
+        return self.cells.shape[1]
+
+    @property
+    def rows(self):
+        return self.cells.shape[0]
+
+    @classmethod
+    def generated(cls, cols, rows, num_colors=5):
+        '''
+            The level we had before there were level files, with every
+            row worth a point more than the one below it.
+        '''
+        kinds = [(y + 1, (1.0 / num_colors) * (y % num_colors), 1)
+                 for y in range(rows)]
+        cells = np.repeat(np.arange(1, rows + 1)[:, None], cols, axis=1)
+
+        return cls(cells, kinds, 'generated {}x{}'.format(cols, rows))
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename) as f:
+            return cls.parse(f.read(), filename)
+
+    @classmethod
+    def parse(cls, text, name=''):
+        kinds = []
+        lookup = np.full(128, -1, dtype=np.int32)
+        lookup[ord(EMPTY)] = 0
+        rows = []
+
+        for number, line in enumerate(text.splitlines(), 1):
+            line = line.rstrip()
+
+            if not line or line.startswith('#'):
+                continue
+
+            if line.startswith('brick '):
+                key, kind = parse_brick(line, '{}:{}'.format(name, number))
+                kinds.append(kind)
+                lookup[ord(key)] = len(kinds)
+            else:
+                rows.append(line)
+
+        if not rows:
+            raise ValueError('{}: the level has no bricks'.format(name))
+
+        cols = max(len(row) for row in rows)
+        text = ''.join(row.ljust(cols, EMPTY) for row in reversed(rows))
+        chars = np.frombuffer(text.encode('utf-8'), dtype=np.uint8)
+
+        if len(chars) != len(text) or (chars >= 128).any():
+            raise ValueError('{}: level rows can only use ASCII '
+                             'characters'.format(name))
+
+        cells = lookup[chars]
+
+        if (cells < 0).any():
+            bad = text[int(np.argmax(cells < 0))]
+            raise ValueError('{}: no brick line for {!r}'.format(name, bad))
+
+        return cls(cells.reshape((len(rows), cols)), kinds, name)
+
+
+def parse_brick(line, where):
+    parts = line.split()
+
+    if len(parts) not in (4, 5) or len(parts[1]) != 1:
+        raise ValueError('{}: a brick line is "brick <character> <value> '
+                         '<hue> [<hits>]"'.format(where))
+
+    key = parts[1]
+
+    if key == EMPTY or ord(key) >= 128:
+        raise ValueError('{}: {!r} can\'t be a brick'.format(where, key))
+
+    try:
+        value, hue = int(parts[2]), float(parts[3])
+        hits = int(parts[4]) if len(parts) == 5 else 1
+    except ValueError:
+        raise ValueError('{}: bad number in brick line'.format(where))
+
+    if hits < 1:
+        raise ValueError('{}: a brick needs at least 1 hit'.format(where))
+
+    return key, (value, hue, hits)
+
+
+def find_levels(directory='levels'):
+    '''
+        The level files in a directory, in the order of their names.
+    '''
+    return sorted(glob(os.path.join(directory, '*.level')))
+
+
+def lay_out(level, width, height):
+    '''
+        The BrickField and BrickGrid of a level, in the top half of a
+        width by height game, filling the second quarter down.
+    '''
+    cell_width = (width - GRID_PADDING * 2) / level.cols
+    cell_height = (height - GRID_PADDING * 2) / 4 / level.rows
+
+    # Bricks are numbered down each column in turn, the same order
+    # load_level() always had, so the lowest numbered brick still wins
+    # when the ball touches two at once.
+    cols, rows = np.nonzero(level.cells.T)
+    kinds = np.array(level.kinds, dtype=np.float64).reshape((-1, 3))
+    values, hues, hits = kinds[level.cells.T[cols, rows] - 1].T
+
+    x = cell_width * cols + CELL_PADDING + GRID_PADDING
+    y = cell_height * rows + CELL_PADDING + GRID_PADDING + height / 2
+    bricks = BrickField.from_arrays(
+        x, y,
+        np.full(len(x), cell_width - CELL_PADDING * 2),
+        np.full(len(x), cell_height - CELL_PADDING * 2),
+        values, hues, hits)
+
+    grid = BrickGrid(GRID_PADDING, height / 2 + GRID_PADDING,
+                     cell_width, cell_height, level.cols, level.rows)
+    grid.fill(cols, rows)
+
+    return bricks, grid
+
+
+class LevelLoader(object):
+    '''
+        Loads levels, by calling a function for them, either as they are
+        needed or ahead of time on a worker thread.  Either way load()
+        returns the same thing, the thread only changes when the work
+        is done.
+    '''
+    def __init__(self, threaded=False):
+        self.executor = ThreadPoolExecutor(max_workers=1) if threaded else None
+        self.pending = {}
+
+    def preload(self, key, func, *args):
+        '''
+            Start loading a level we are going to need soon.
+        '''
+        if self.executor is not None and key not in self.pending:
+            self.pending[key] = self.executor.submit(func, *args)
+
+    def load(self, key, func, *args):
+        '''
+            The level, waiting for it if it is still being preloaded.
+        '''
+        future = self.pending.pop(key, None)
+
+        if future is None:
+            return func(*args)
+
+        return future.result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+
+        self.pending.clear()
@@ -1,4 +1,8 @@
-from random import randint, random
+# This comes first, so that the startup timing covers the imports.
+from gamelib.startup import TimedStartup, on_first_frame
+
+import os
+from random import Random
 
 import kivy
 kivy.require('1.10.0')  # replace with your current kivy version !
@@ -7,19 +11,38 @@ from kivy.base import EventLoop
 from kivy.app import App
 from kivy.vector import Vector
 from kivy.clock import Clock
+from kivy.logger import Logger
 from kivy.uix.widget import Widget
 from kivy.uix.modalview import ModalView
+from kivy.utils import platform
 
 from kivy.properties import (NumericProperty,
                              ReferenceListProperty,
                              ObjectProperty)
 
+from gamelib import geometry
+from gamelib.pool import Pool
+from gamelib.profiler import NULL_PROFILER, profiler_from_env
+from gamelib.replay import InputLog, MOVE, START, SPAWN
+from gamelib.scheduler import TickScheduler
+from gamelib.timestep import FixedTimestep
+from gamelib.touch_input import TouchCoalescer
+from gamelib.viewport import Viewport
+
+from ball_layer import BallLayer
+from brick_layer import BrickLayer, build_buffers
+from levels import LevelLoader, find_levels
+from simulation import BreakoutSim
+
 
 class Solid(object):
     '''
         Mixin for objects we want to treat as solid.  Solid objects for this
         purpose are bricks or paddles which a ball will bounce off of.
         So the code for figuring out how the bounce will happen is here.
+
+        The game itself is played by BreakoutSim, which does its own
+        swept collision with sweep_aabb() in simulation.py.
     '''
     def get_bounce_vector(self, other):
         '''
@@ -29,84 +52,19 @@ class Solid(object):
             (Note: we will assume that the other object is coming toward our
                    object for now.)
         '''
-        n = self.get_surface_normal(other)
-        d = Vector(other.velocity)
+        v_x, v_y = other.velocity
 
-        return d - 2.0 * (d.dot(n)) * n
-
-    def get_surface_normal(self, other):
-        return self.get_surface_vector(other).normalize()
-
-    def get_surface_vector(self, other):
-        '''
-           Calculate a vector which points outward and perpendicular
-           to the closest surface
-        '''
-        start = self.get_surface_point(other)
-        end = self.get_end_point(start, other)
-
-        return Vector(end[0] - start[0],
-                      end[1] - start[1])
-
-    def get_surface_point(self, other):
-        '''
-            Here we determine the point location on the surface of
-            the paddle that is closest to our touch position.
-            This needs to work even if the touch position is
-            inside the paddle.
-        '''
-        pos_x = self.clamp(other.center_x, self.x, self.right)
-        pos_y = self.clamp(other.center_y, self.y, self.top)
-
-        # this is a bit convoluted. We could probably do better
-        d_left = abs(pos_x - self.x)
-        d_right = abs(pos_x - self.right)
-        d_top = abs(pos_y - self.top)
-        d_bot = abs(pos_y - self.y)
-        d_min = min(d_left, d_bot, d_right, d_top)
-
-        if d_left == d_min:
-            return self.x, pos_y
-        elif d_right == d_min:
-            return self.right, pos_y
-        elif d_top == d_min:
-            return pos_x, self.top
-        else:
-            return pos_x, self.y
-
-    def get_end_point(self, start, other):
-        '''
-            Here we determine the endpoint of the line that represents
-            the surface perpendicular vector.
-            - Normal case is that we will simply use the other object's
-              center position.
-            - If the other object's center position is inside the paddle,
-              we will reverse the direction of our line relative to the
-              starting point.
-        '''
-        if self.inside_paddle(other):
-            # reversed position relative to start
-            return (start[0] + (start[0] - other.center_x),
-                    start[1] + (start[1] - other.center_y))
-        else:
-            return other.center_x, other.center_y
-
-    def inside_paddle(self, other):
-        return Vector.in_bbox((other.center_x, other.center_y),
-                              (self.x, self.y),
-                              (self.right, self.top))
-
-    def clamp(self, x, lower, upper):
-        return max(lower, min(upper, x))
+        return Vector(geometry.bounce_vector(self.x, self.y,
+                                             self.right, self.top,
+                                             other.center_x, other.center_y,
+                                             v_x, v_y))
 
 
 class StartGameModal(ModalView):
     root = ObjectProperty(None)
 
     def dismiss(self, *args, **kwargs):
-        self.root.reset_game()
-        self.root.game_in_play = True
-        self.root.serve_ball()
+        self.root.start_game()
 
         super(StartGameModal, self).dismiss(*args, **kwargs)
 
@@ -119,76 +77,134 @@ class Ball(Widget):
     velocity_y = NumericProperty(0)
     velocity = ReferenceListProperty(velocity_x, velocity_y)
 
-    def move(self):
-        # move the ball one step in the direction of its velocity.
-        self.pos = Vector(*self.velocity) + self.pos
-
-    def move_to(self, vec):
-        # move the ball to a relative vector position.
-        self.pos = vec + self.pos
-
 
 class Paddle(Widget, Solid):
     score = NumericProperty(0)
     missed_balls = NumericProperty(0)
-    collided = False  # to 'debounce' the bounce logic
-
-    def bounce_ball(self, ball):
-        if self.collide_widget(ball):
-            if not self.collided:
-                ball.velocity = self.get_bounce_vector(ball)
-                self.collided = True
-        else:
-            self.collided = False
 
 
 class Brick(Widget, Solid):
     value = NumericProperty(0)
     hue = NumericProperty(0)
 
-    def bounce_ball(self, ball):
-        if self.collide_widget(ball):
-            ball.velocity = self.get_bounce_vector(ball)
-
 
 class BreakoutGame(Widget):
     app = ObjectProperty(None)
 
     ball = ObjectProperty(None)
     player = ObjectProperty(None)
-    bricks = []
     game_in_play = ObjectProperty(False)
 
+    # The size of the game, in the coordinates the simulation and all
+    # of our children use.  The viewport scales it to fit the window.
+    game_width = NumericProperty(800)
+    game_height = NumericProperty(600)
+
     start_dlg = None
-    level_width = 8
-    level_height = 5
-    follow_speed = None
-
-    def update(self, _dt):
-        self.ball.move()
-        self.player.bounce_ball(self.ball)
-        self.bounce_off_walls()
-
-        if self.game_in_play:
-            self.hit_a_brick()
-            self.out_of_bounds()
-
-            if self.game_is_over():
-                self.game_in_play = False
-                self.serve_ball()
-                self.show_start_buttons()
-            elif self.player_won():
-                self.reset_level()
-                self.load_level()
-                self.serve_ball()
+    sim = None
+    profiler = NULL_PROFILER
+
+    # Draw the bricks in a few big meshes instead of a widget per brick.
+    use_brick_mesh = True
+
+    # how many extra balls a double tap sends off
+    multi_ball_count = 50
+
+    def __init__(self, **kwargs):
+        super(BreakoutGame, self).__init__(**kwargs)
+        self.bricks = {}
+        self.levels_shown = 0
+
+        # Resizing the window, or turning the phone around, only
+        # changes the viewport's transform.
+        self.viewport = Viewport(self.game_width, self.game_height)
+        self.viewport.attach(self)
+
+        self.brick_layer = BrickLayer()
+        self.canvas.add(self.brick_layer)
+
+        # all of the extra balls of multi-ball, in one draw call
+        self.ball_layer = BallLayer()
+        self.canvas.add(self.ball_layer)
+
+        # Brick widgets are reused from level to level.
+        self.brick_pool = Pool(Brick)
+
+        # The simulation owns all of the game state.  Our widgets
+        # only mirror it once per frame in sync_widgets().
+        seed = Random().randrange(1 << 32)
+        self.sim = BreakoutSim(self.game_width, self.game_height,
+                               paddle_size=self.player.size,
+                               ball_size=self.ball.width,
+                               seed=seed)
+
+        # The levels come from the files in levels/.  Each one is laid
+        # out, mesh buffers and all, on a worker thread while the one
+        # before it is played, so only the meshes are made in a frame.
+        self.sim.levels = find_levels() or None
+        self.sim.loader = LevelLoader(threaded=True)
+
+        if self.use_brick_mesh:
+            self.sim.prepare_bricks = build_buffers
+
+        # Everything the player does is logged, so the session can be
+        # saved and replayed later.
+        self.input_log = InputLog(seed, self.sim.setup())
+
+        # Touch moves are saved up and applied once per physics step.
+        self.touches = TouchCoalescer()
+
+    def update(self, dt):
+        '''
+            Advance the game one physics step of dt seconds.
+            This is called by our FixedTimestep, which takes care of
+            calling render() once per frame.
+        '''
+        for player, move_to in self.touches.pop_moves():
+            self.move_player(player, move_to)
+
+        self.sim.step(1, dt)
+
+        if self.sim.game_over:
+            self.sim.game_over = False
+            self.game_in_play = False
+            self.show_start_buttons()
+
+    def render(self, alpha=1.0):
+        self.profiler.begin()
+        self.sync_widgets(alpha)
+        self.profiler.mark('render')
+
+    def add_widget(self, widget, *args, **kwargs):
+        self.profiler.count('widget_adds')
+        super(BreakoutGame, self).add_widget(widget, *args, **kwargs)
+
+    def remove_widget(self, widget, *args, **kwargs):
+        self.profiler.count('widget_removes')
+        super(BreakoutGame, self).remove_widget(widget, *args, **kwargs)
+
+    def sync_widgets(self, alpha=1.0):
+        sim = self.sim
+
+        self.ball.pos = sim.ball.lerp(alpha)
+        self.ball.velocity = sim.ball.velocity
+        self.player.pos = sim.player.lerp(alpha)
+        self.player.score = sim.player.score
+        self.player.missed_balls = sim.player.missed_balls
+
+        if self.levels_shown != sim.levels_loaded:
+            self.show_level()
         else:
-            # demo mode
-            self.hit_a_brick(score_point=False)
-            self.out_of_bounds()
-            self.follow_ball()
-            if len(self.bricks) == 0:
-                self.load_level()
-                self.serve_ball()
+            for i in sim.pop_removed_bricks():
+                self.remove_brick(i)
+
+        self.brick_layer.flush()
+
+        extra_x, extra_y = sim.extra_balls.lerp(alpha)
+        self.ball_layer.update(extra_x, extra_y, sim.extra_balls.size)
+
+    def on_game_in_play(self, _instance, value):
+        self.sim.game_in_play = value
 
     def show_start_buttons(self):
         if self.start_dlg is None:
@@ -197,133 +213,194 @@ class BreakoutGame(Widget):
 
         self.start_dlg.open()
 
-    def serve_ball(self):
-        self.ball.center = (self.player.center_x,
-                            self.player.top + self.ball.height / 2)
-        direction = randint(15, 165)
+        # The demo carries on under the modal, but nobody is watching
+        # it closely, so we don't need every frame.
+        self.app.scheduler.idle()
 
-        # velocity needs to scale with the resolution of the game window
-        # or the ball will appear to be very fast on small screens and
-        # very slow on hi-res screens.
-        scaled_velocity = min(*self.size) * 0.0067
-        self.ball.velocity = Vector(scaled_velocity, 0).rotate(direction)
+    def serve_ball(self):
+        self.sim.serve_ball()
+        self.sync_widgets()
 
-    def bounce_off_walls(self):
-        ''' bounce off left, right, and top walls '''
-        if self.ball.x < 0 or self.ball.right > self.width:
-            self.ball.velocity_x *= -1
+    def load_level(self):
+        self.sim.load_level()
+        self.sync_widgets()
 
-        if self.ball.top > self.height:
-            self.ball.velocity_y *= -1
+    def start_demo(self):
+        self.sim.start_demo()
+        self.sync_widgets()
 
-    def hit_a_brick(self, score_point=True):
-        for b in self.bricks:
-            if b.collide_widget(self.ball):
-                b.bounce_ball(self.ball)
-                self.remove_brick(b)
+    def start_game(self):
+        self.input_log.record(self.sim.ticks, START)
+        self.sim.start_game()
+        self.game_in_play = True
+        self.app.scheduler.wake()
+        self.sync_widgets()
 
-                if score_point:
-                    self.player.score += b.value
+    def show_level(self):
+        '''
+            Replace our bricks with the ones in the current
+            simulation level.
+        '''
+        self.reset_level()
+        bricks = self.sim.bricks
 
-                break
+        if self.use_brick_mesh:
+            self.brick_layer.load(bricks, self.sim.prepared_bricks)
+        else:
+            for i in bricks.indices():
+                brick = self.brick_pool.acquire()
+                brick.pos = bricks.x[i], bricks.y[i]
+                brick.size = bricks.width[i], bricks.height[i]
+                brick.value = bricks.value[i]
+                brick.hue = bricks.hue[i]
 
-    def out_of_bounds(self):
-        # went out-of-bounds?
-        if self.ball.y < self.y:
-            self.player.missed_balls += 1
-            self.serve_ball()
+                self.add_widget(brick)
+                self.bricks[i] = brick
 
-    def load_level(self):
-        grid_padding = 2
-        cell_padding = 2
-        cell_width = (self.width - grid_padding * 2) / self.level_width
-        cell_height = (self.height - grid_padding * 2) / 4 / self.level_height
-
-        for x in range(self.level_width):
-            for y in range(self.level_height):
-                num_colors = 5
-                hue = (1.0 / num_colors) * (y % num_colors)
-
-                pos_x, pos_y = (cell_width * x + cell_padding + grid_padding,
-                                cell_height * y + cell_padding + grid_padding)
-                w, h = (cell_width - (cell_padding * 2),
-                        cell_height - (cell_padding * 2))
-
-                brick = Brick(pos=(pos_x, pos_y + self.height / 2),
-                              size=(w, h),
-                              value=y + 1,
-                              hue=hue)
+        # The mesh buffers were made before any bricks were broken.
+        for i in self.sim.pop_removed_bricks():
+            self.remove_brick(i)
 
-                self.add_widget(brick)
-                self.bricks.append(brick)
+        self.levels_shown = self.sim.levels_loaded
 
     def reset_level(self):
-        for b in self.bricks[:]:
-            self.remove_brick(b)
+        self.brick_layer.clear_bricks()
+
+        for i in list(self.bricks):
+            self.remove_brick(i)
 
     def reset_game(self):
-        self.player.missed_balls = 0
-        self.player.score = 0
-        self.reset_level()
-        self.load_level()
+        self.sim.reset_game()
+        self.sync_widgets()
 
-    def remove_brick(self, b):
-        self.remove_widget(b)
-        self.bricks.remove(b)
+    def remove_brick(self, i):
+        if self.use_brick_mesh:
+            self.brick_layer.remove_brick(i)
+            return
 
-    def follow_ball(self):
-        # Here we have the paddle try to hit the ball back.
-        # This is just for demo play.
-        if self.follow_speed is None:
-            # we should be able to catch up to the ball if it is traveling
-            # in a vertical slope of 55 degrees or more
-            self.follow_speed = Vector(*self.ball.velocity).length() * 0.57
+        brick = self.bricks.pop(i, None)
 
-        if self.player.center_x > self.ball.center_x:
-            self.player.x -= self.follow_speed
+        if brick is not None:
+            self.remove_widget(brick)
+            self.brick_pool.release(brick)
 
-        if self.player.center_x < self.ball.center_x:
-            self.player.x += self.follow_speed
+    def spawn_balls(self, count):
+        self.input_log.record(self.sim.ticks, SPAWN, x=count)
+        self.sim.spawn_balls(count)
 
-    def game_is_over(self):
-        return self.player_lost()
+    def on_touch_down(self, touch):
+        self.touches.down(touch.uid, self.touch_x(touch))
 
-    def player_lost(self):
-        return self.player.missed_balls >= 3
+        if touch.is_double_tap:
+            self.spawn_balls(self.multi_ball_count)
 
-    def player_won(self):
-        return len(self.bricks) == 0
+    def on_touch_move(self, touch):
+        self.touches.move(touch.uid, self.touch_x(touch), self.player)
 
-    def on_touch_down(self, touch):
-        self.old_x = touch.x
+    def on_touch_up(self, touch):
+        self.touches.up(touch.uid)
 
-    def on_touch_move(self, touch):
-        move_to = touch.x - self.old_x
-        self.move_player(self.player, move_to)
-        self.old_x = touch.x
+    def touch_x(self, touch):
+        return self.viewport.to_game(touch.x, touch.y)[0]
 
     def move_player(self, player, move_to):
-        new_pos = player.center_x + move_to
-        player.center_x = min(self.width - player.width / 2,
-                              max(player.width / 2, new_pos))
+        self.input_log.record(self.sim.ticks, MOVE, x=move_to)
+        self.sim.move_player(move_to)
+        player.x = self.sim.player.x
+
+
+class BreakoutApp(TimedStartup, App):
+    # The ball uses continuous collision, so we can save some battery
+    # on phones by running the physics at a lower rate.  The rendering
+    # is interpolated between physics steps, so it still looks smooth.
+    tick_rate = 30.0 if platform == 'android' else 60.0
+    timestep = None
+    scheduler = None
 
+    # frames per second while the start modal is up
+    idle_rate = 10.0
+
+    # Set BREAKOUT_REPLAY to a file name to save a replay of the session
+    # when we quit.  Play it back with replay.py.
+    replay_file = os.environ.get('BREAKOUT_REPLAY')
 
-class BreakoutApp(App):
     def build(self):
-        EventLoop.ensure_window()
+        # TimedStartup has made the window by now
         self.window = EventLoop.window
         game = BreakoutGame(app=self)
+        self.set_profiler(game, profiler_from_env())
 
-        game.load_level()
-        game.serve_ball()
-        Clock.schedule_interval(game.update, 1.0 / 60.0)
-        Clock.schedule_once(self.show_start_buttons, 2)
+        if not game.use_brick_mesh:
+            game.brick_pool.prewarm(game.sim.level_width *
+                                    game.sim.level_height)
+
+        game.input_log.setup['tick_rate'] = self.tick_rate
+        self.timestep = FixedTimestep(game.update, game.render,
+                                      rate=self.tick_rate)
+        self.scheduler = TickScheduler(self.timestep,
+                                       idle_rate=self.idle_rate)
+        self.scheduler.profiler = game.profiler
+
+        # Nothing has to wait for the first level before the first
+        # frame.  It is laid out on the loader's thread meanwhile, and
+        # the demo starts once the frame is up.
+        game.sim.preload_level()
+        on_first_frame(self.start_demo)
 
         return game
 
+    def start_demo(self):
+        self.root.start_demo()
+        self.scheduler.start()
+        Clock.schedule_once(self.show_start_buttons, 2)
+
     def show_start_buttons(self, _instance):
         self.root.show_start_buttons()
 
+    def set_profiler(self, game, profiler):
+        game.profiler = game.sim.profiler = profiler
+        game.touches.profiler = profiler
+
+        if profiler.enabled:
+            from gamelib.profiler_overlay import ProfilerOverlay
+
+            # After the first frame our root widget is in the window, so
+            # the overlay goes on top of it rather than under the game.
+            on_first_frame(ProfilerOverlay(profiler).show)
+
+    def on_pause(self):
+        # Android is putting us in the background, so stop ticking
+        # until we come back.
+        self.scheduler.suspend()
+        return True
+
+    def on_resume(self):
+        # Only a game in play needs every frame.  Otherwise the start
+        # modal is up over the demo, so we go back to idling.
+        if self.root.game_in_play:
+            self.scheduler.wake()
+        else:
+            self.scheduler.idle()
+
+    def on_stop(self):
+        self.scheduler.stop()
+        self.root.sim.loader.shutdown()
+        Logger.info('Scheduler: {}'.format(self.scheduler.stats()))
+        Logger.info('Input: touch to physics latency\n' +
+                    self.root.touches.latency.report())
+
+        # The pool is only used when the bricks are widgets.
+        if not self.root.use_brick_mesh:
+            Logger.info('Pool: bricks {}'.format(
+                self.root.brick_pool.stats()))
+
+        self.root.profiler.close()
+
+        if self.replay_file:
+            game = self.root
+            game.input_log.finish(game.sim)
+            game.input_log.save(self.replay_file)
+
 
 if __name__ == '__main__':
     BreakoutApp().run()
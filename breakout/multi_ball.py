@@ -0,0 +1,196 @@
+'''
+    Lots of extra balls at once, for multi-ball power-ups.
+
+    The position and velocity of every extra ball are kept in NumPy
+    arrays, and a tick moves them all, bounces them off the walls and
+    the paddle, and finds the bricks they hit, with a handful of array
+    operations whatever the number of balls.  The only per-ball Python
+    work left is removing the bricks that were hit, which is a few at
+    most in a tick.
+
+    Extra balls are a bonus.  Losing one off the bottom of the screen
+    doesn't count as a miss, only losing the main ball does.
+'''
+from math import ceil
+
+import numpy as np
+
+from gamelib.geometry import bounce_vectors
+
+
+class MultiBall(object):
+    '''
+        The extra balls of a BreakoutSim.  Balls that are lost are
+        dropped from the arrays, so the arrays only ever hold live balls.
+    '''
+    def __init__(self, size):
+        self.size = float(size)
+        self.clear()
+
+    def clear(self):
+        self.x = np.zeros(0)
+        self.y = np.zeros(0)
+        self.prev_x = np.zeros(0)
+        self.prev_y = np.zeros(0)
+        self.vx = np.zeros(0)
+        self.vy = np.zeros(0)
+        self.collided = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return len(self.x)
+
+    def spawn(self, x, y, vx, vy):
+        '''
+            Add balls at (x, y) positions (the bottom left corners),
+            moving at (vx, vy).
+        '''
+        x, y, vx, vy = np.broadcast_arrays(*[np.asarray(v, dtype=float)
+                                             for v in (x, y, vx, vy)])
+        self.x = np.concatenate([self.x, x])
+        self.y = np.concatenate([self.y, y])
+        self.prev_x = np.concatenate([self.prev_x, x])
+        self.prev_y = np.concatenate([self.prev_y, y])
+        self.vx = np.concatenate([self.vx, vx])
+        self.vy = np.concatenate([self.vy, vy])
+        self.collided = np.concatenate([self.collided,
+                                        np.zeros(len(x), dtype=bool)])
+
+    def keep(self, mask):
+        for name in ('x', 'y', 'prev_x', 'prev_y', 'vx', 'vy', 'collided'):
+            setattr(self, name, getattr(self, name)[mask])
+
+    def lerp(self, alpha):
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
+
+    def tick(self, sim, dt, score_point=True):
+        '''
+            Move every ball one tick, and bounce them off everything.
+            Returns the number of balls lost off the bottom.
+        '''
+        if len(self) == 0:
+            return 0
+
+        self.prev_x, self.prev_y = self.x, self.y
+        self.x = self.x + self.vx * dt
+        self.y = self.y + self.vy * dt
+
+        self.bounce_paddle(sim.player)
+        self.bounce_off_walls(sim.width, sim.height)
+
+        if sim.grid is not None:
+            self.hit_bricks(sim, score_point)
+
+        lost = self.y < 0
+        if lost.any():
+            self.keep(~lost)
+
+        return int(lost.sum())
+
+    def bounce_off_walls(self, width, height):
+        # We push the velocity away from the wall, rather than flipping
+        # it, so a ball can't get stuck flipping back and forth.
+        self.vx = np.where(self.x < 0, np.abs(self.vx), self.vx)
+        self.vx = np.where(self.x + self.size > width,
+                           -np.abs(self.vx), self.vx)
+        self.vy = np.where(self.y + self.size > height,
+                           -np.abs(self.vy), self.vy)
+
+    def bounce_paddle(self, player):
+        half = self.size / 2.0
+        touching = ~((self.x + self.size < player.x) |
+                     (self.x > player.right) |
+                     (self.y + self.size < player.y) |
+                     (self.y > player.top))
+
+        # like BreakoutSim.bounce_paddle(), a ball only bounces once
+        # each time it touches the paddle
+        hit = touching & ~self.collided
+        self.collided = touching
+
+        if hit.any():
+            vx, vy = bounce_vectors(player.x, player.y,
+                                    player.right, player.top,
+                                    self.x[hit] + half, self.y[hit] + half,
+                                    self.vx[hit], self.vy[hit])
+            self.vx[hit] = vx
+            self.vy[hit] = vy
+
+    def hit_bricks(self, sim, score_point=True):
+        '''
+            Find the brick each ball hits, if any, by looking up the grid
+            cells under a few points of each ball.  The points are no
+            further apart than a cell, so every cell a ball overlaps is
+            looked at.  Like hit_a_brick(), a ball hits one brick a tick,
+            the one with the lowest index.
+        '''
+        grid, bricks = sim.grid, sim.bricks
+
+        # Most balls are nowhere near the bricks, so we only look
+        # closely at the ones that overlap the grid.
+        near = np.nonzero(
+            (self.x + self.size >= grid.x) &
+            (self.x <= grid.x + grid.cols * grid.cell_width) &
+            (self.y + self.size >= grid.y) &
+            (self.y <= grid.y + grid.rows * grid.cell_height))[0]
+
+        if near.size == 0:
+            return
+
+        cells = np.frombuffer(grid.cells, dtype=np.intc)
+        ball_x, ball_y = self.x[near, None], self.y[near, None]
+
+        nx = int(ceil(self.size / grid.cell_width)) + 1
+        ny = int(ceil(self.size / grid.cell_height)) + 1
+        offsets_x = np.repeat(np.linspace(0.0, self.size, nx), ny)
+        offsets_y = np.tile(np.linspace(0.0, self.size, ny), nx)
+
+        col = np.floor((ball_x + offsets_x - grid.x) /
+                       grid.cell_width).astype(np.intp)
+        row = np.floor((ball_y + offsets_y - grid.y) /
+                       grid.cell_height).astype(np.intp)
+        on_grid = ((col >= 0) & (col < grid.cols) &
+                   (row >= 0) & (row < grid.rows))
+
+        candidates = np.full(col.shape, -1, dtype=np.intp)
+        candidates[on_grid] = cells[row[on_grid] * grid.cols + col[on_grid]]
+
+        if not (candidates >= 0).any():
+            return
+
+        # check the candidates really overlap the ball
+        ids = np.maximum(candidates, 0)
+        brick_x = np.frombuffer(bricks.x)[ids]
+        brick_y = np.frombuffer(bricks.y)[ids]
+        brick_r = brick_x + np.frombuffer(bricks.width)[ids]
+        brick_t = brick_y + np.frombuffer(bricks.height)[ids]
+        overlap = ((candidates >= 0) &
+                   ~((brick_r < ball_x) | (brick_x > ball_x + self.size) |
+                     (brick_t < ball_y) | (brick_y > ball_y + self.size)))
+
+        big = np.iinfo(np.intp).max
+        hit_brick = np.where(overlap, candidates, big).min(axis=1)
+        hit = hit_brick != big
+
+        if not hit.any():
+            return
+
+        hit_brick = hit_brick[hit]
+        hit = near[hit]
+        half = self.size / 2.0
+        left = np.frombuffer(bricks.x)[hit_brick]
+        bottom = np.frombuffer(bricks.y)[hit_brick]
+        right = left + np.frombuffer(bricks.width)[hit_brick]
+        top = bottom + np.frombuffer(bricks.height)[hit_brick]
+
+        vx, vy = bounce_vectors(left, bottom, right, top,
+                                self.x[hit] + half, self.y[hit] + half,
+                                self.vx[hit], self.vy[hit])
+        self.vx[hit] = vx
+        self.vy[hit] = vy
+
+        # Several balls can hit the same brick in a tick.
+        # They all bounce, but it only takes one hit.
+        for i in np.unique(hit_brick).tolist():
+            if sim.hit_brick(i) and score_point:
+                sim.player.score += bricks.value[i]
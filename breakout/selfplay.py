@@ -0,0 +1,69 @@
+'''
+    Tune the demo AI by having it play thousands of games by itself.
+
+    Each game is played headless with the paddle following the ball (or
+    with ai=predict, going to where the ball will come down), at
+    follow_ratio times the speed of the ball, and serves going off
+    within serve_spread degrees of straight up.  A game is won if the
+    AI clears the level before it misses three balls.
+
+        > python selfplay.py --games 500 --follow-ratio 0.4,0.57,0.8
+
+    The games run across all of the cores, in a process pool.
+'''
+import argparse
+
+from gamelib import selfplay
+
+from simulation import BreakoutSim, TICK_RATE
+
+
+WIDTH, HEIGHT = 800, 600
+
+# Give up on games that go on for longer than 10 minutes
+MAX_TICKS = int(TICK_RATE * 60 * 10)
+
+
+def play_game(params, seed):
+    sim = BreakoutSim(WIDTH, HEIGHT, seed=seed)
+    sim.follow_ratio = params['follow_ratio']
+    spread = int(params['serve_spread'])
+    sim.serve_angles = (90 - spread, 90 + spread)
+    sim.predictive = params['ai'] == 'predict'
+    sim.autoplay = True
+
+    sim.start_game()
+
+    # The first tick loads the first level, and clearing it loads the
+    # next, which is as far as we need to play.
+    while (sim.ticks < MAX_TICKS and not sim.game_over and
+           sim.levels_loaded < 2):
+        sim.step()
+
+    return {'won': sim.levels_loaded > 1,
+            'paddle_hits': sim.paddle_hits,
+            'serves': sim.serves,
+            'ticks': sim.ticks,
+            'score': sim.player.score}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Breakout self-play')
+    parser.add_argument('--follow-ratio', type=selfplay.floats,
+                        default=[0.4, 0.57, 0.8])
+    parser.add_argument('--serve-spread', type=selfplay.floats,
+                        default=[75])
+    parser.add_argument('--ai', type=selfplay.names,
+                        default=['chase', 'predict'],
+                        help='chase the ball, or predict where it goes')
+    selfplay.add_arguments(parser)
+    args = parser.parse_args()
+
+    param_sets = selfplay.grid(ai=args.ai,
+                               follow_ratio=args.follow_ratio,
+                               serve_spread=args.serve_spread)
+    selfplay.run(args, play_game, param_sets)
+
+
+if __name__ == '__main__':
+    main()
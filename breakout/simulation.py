@@ -0,0 +1,706 @@
+'''
+    A headless simulation core for the Breakout game.
+
+    All of the game state (ball, paddle and bricks) lives here in plain
+    Python objects and arrays, and nothing in this module imports Kivy.
+    This lets us run the game logic without a window, and a lot faster
+    than real time.  The Kivy widgets in main.py only mirror this state
+    once per rendered frame.
+
+    Velocities are in pixels per second, and the simulation is advanced
+    in ticks of dt seconds with step(n, dt).
+
+    All of the randomness comes from a seeded random generator, so the
+    same seed and the same inputs always play out the same game.  That
+    is what lets us record and replay sessions (see replay.py).
+'''
+from math import cos, sin, radians, sqrt
+from random import Random
+
+from gamelib import geometry
+from gamelib.geometry import clamp
+from gamelib.profiler import NULL_PROFILER
+from gamelib.prediction import BallPredictor, predict_crossing, step_towards
+from gamelib.rect import Rect
+from gamelib.replay import MOVE, START, SPAWN, hash_values
+
+from brick_field import BrickField
+from levels import Level, LevelLoader, lay_out
+from multi_ball import MultiBall
+
+
+TICK_RATE = 60.0
+DEFAULT_DT = 1.0 / TICK_RATE
+
+
+class BallState(Rect):
+    def __init__(self, size=0.0):
+        super(BallState, self).__init__(width=size, height=size)
+        self.velocity_x = 0.0
+        self.velocity_y = 0.0
+
+    @property
+    def velocity(self):
+        return self.velocity_x, self.velocity_y
+
+    @velocity.setter
+    def velocity(self, value):
+        self.velocity_x, self.velocity_y = value
+
+    def move(self, dt):
+        # move the ball one step in the direction of its velocity.
+        self.x += self.velocity_x * dt
+        self.y += self.velocity_y * dt
+
+
+class PaddleState(Rect):
+    def __init__(self, width=0.0, height=0.0):
+        super(PaddleState, self).__init__(width=width, height=height)
+        self.score = 0
+        self.missed_balls = 0
+        self.collided = False  # to 'debounce' the bounce logic
+
+
+def get_surface_point(solid, other):
+    '''
+        The point on the surface of the solid that is closest to the
+        center of the other object.
+    '''
+    return geometry.surface_point(solid.x, solid.y, solid.right, solid.top,
+                                  other.center_x, other.center_y)
+
+
+def get_bounce_vector(solid, other):
+    '''
+        The same reflection that the Solid mixin in main.py calculates,
+        but without allocating any Kivy Vectors.
+    '''
+    return geometry.bounce_vector(solid.x, solid.y, solid.right, solid.top,
+                                  other.center_x, other.center_y,
+                                  other.velocity_x, other.velocity_y)
+
+
+def sweep_aabb(ball, dx, dy, left, bottom, right, top):
+    '''
+        Sweep a moving box (the ball) along the displacement (dx, dy)
+        against a static box.  We grow the static box by the ball's half
+        size, so this becomes a ray test from the center of the ball.
+
+        Returns (time_of_impact, normal_x, normal_y) with the time in the
+        range [0, 1] of the displacement, or None if there is no hit.
+        A ball already overlapping the box and moving into it is a hit
+        at time 0 on the face it has penetrated least.
+    '''
+    half_w, half_h = ball.width / 2.0, ball.height / 2.0
+    left, right = left - half_w, right + half_w
+    bottom, top = bottom - half_h, top + half_h
+    x, y = ball.center_x, ball.center_y
+
+    if left < x < right and bottom < y < top:
+        # Already overlapping.
+        faces = ((x - left, -1.0, 0.0), (right - x, 1.0, 0.0),
+                 (y - bottom, 0.0, -1.0), (top - y, 0.0, 1.0))
+        _depth, n_x, n_y = min(faces)
+
+        if dx * n_x + dy * n_y < 0.0:
+            return 0.0, n_x, n_y
+
+        return None
+
+    if dx == 0.0:
+        if not left < x < right:
+            return None
+        tx_enter, tx_exit = float('-inf'), float('inf')
+    else:
+        t1, t2 = (left - x) / dx, (right - x) / dx
+        tx_enter, tx_exit = min(t1, t2), max(t1, t2)
+
+    if dy == 0.0:
+        if not bottom < y < top:
+            return None
+        ty_enter, ty_exit = float('-inf'), float('inf')
+    else:
+        t1, t2 = (bottom - y) / dy, (top - y) / dy
+        ty_enter, ty_exit = min(t1, t2), max(t1, t2)
+
+    t_enter = max(tx_enter, ty_enter)
+    t_exit = min(tx_exit, ty_exit)
+
+    if t_enter >= t_exit or t_enter < 0.0 or t_enter > 1.0:
+        return None
+
+    if tx_enter > ty_enter:
+        return t_enter, (-1.0 if dx > 0.0 else 1.0), 0.0
+    else:
+        return t_enter, 0.0, (-1.0 if dy > 0.0 else 1.0)
+
+
+class BreakoutSim(object):
+    '''
+        The Breakout game logic, free of any widgets.
+
+        The sizes default to the same proportions that breakout.kv uses
+        for the Kivy widgets, so a headless game plays like the real one.
+    '''
+    # The level files to play, in order, over and over.  Without any,
+    # every level is a generated one of level_width by level_height.
+    levels = None
+    level_width = 8
+    level_height = 5
+
+    # Use continuous collision for the ball.  With this we can run at
+    # a lower tick rate without the ball passing through things.
+    swept = True
+    max_hits_per_tick = 4
+
+    # The most extra balls there can be in play at once.  BallLayer can
+    # draw up to MAX_BALLS (10922) of them in its one mesh.
+    max_extra_balls = 10000
+
+    # The demo AI.  Serves go off at a random angle in this range of
+    # degrees, and the paddle follows the ball at this fraction of the
+    # ball's speed.  selfplay.py can sweep these.
+    serve_angles = (15, 165)
+    follow_ratio = 0.57
+
+    # Have the demo AI go to where the ball is going to come down,
+    # instead of chasing where it is now.
+    predictive = True
+
+    def __init__(self, width, height, paddle_size=None, ball_size=None,
+                 seed=None):
+        self.width = float(width)
+        self.height = float(height)
+        self.seed = seed
+        self.rng = Random(seed)
+
+        if paddle_size is None:
+            paddle_size = (self.width * 0.15, self.height * 0.04)
+
+        if ball_size is None:
+            ball_size = min(self.width, self.height) * 0.066
+
+        self.ball = BallState(ball_size)
+        self.player = PaddleState(*paddle_size)
+        self.bricks = BrickField()
+        self.grid = None
+        self.extra_balls = MultiBall(ball_size)
+
+        self.player.center_x = self.width / 2.0
+        self.ball.center_x = self.width / 2.0
+        self.ball.center_y = self.height / 2.0
+        self.ball.save_position()
+        self.player.save_position()
+
+        self.game_in_play = False
+        self.game_over = False
+        self.autoplay = False
+        self.follow_speed = None
+        self.predictor = BallPredictor(self.predict_ball)
+        self.profiler = NULL_PROFILER
+
+        self.ticks = 0
+        self.serves = 0
+        self.paddle_hits = 0
+        self.levels_loaded = 0
+        self.level_number = 0
+        self.removed_bricks = []
+
+        # Levels are laid out as they are needed, unless we are given
+        # a threaded loader.  If prepare_bricks is set, it is called
+        # with the bricks of every level as it is laid out, on the
+        # loader's thread, and what it returns is kept in
+        # prepared_bricks, so the game can get ready to draw them too.
+        self.loader = LevelLoader()
+        self.prepare_bricks = None
+        self.prepared_bricks = None
+
+    def step(self, n=1, dt=DEFAULT_DT):
+        '''
+            Advance the simulation n ticks of dt seconds each.
+            We stop early if the game ends, and return the number of
+            ticks that were actually run.
+        '''
+        for i in range(n):
+            self.tick(dt)
+
+            if self.game_over:
+                return i + 1
+
+        return n
+
+    def tick(self, dt):
+        profiler = self.profiler
+        profiler.begin()
+
+        self.ticks += 1
+        self.ball.save_position()
+        self.player.save_position()
+
+        self.move_ball(dt, score_point=self.game_in_play)
+        profiler.mark('move')
+
+        if not self.swept:
+            self.bounce_off_walls()
+            profiler.mark('walls')
+
+        self.extra_balls.tick(self, dt, score_point=self.game_in_play)
+        profiler.mark('multi_ball')
+
+        if self.game_in_play:
+            if not self.swept:
+                self.hit_a_brick()
+                profiler.mark('bricks')
+
+            self.out_of_bounds()
+            profiler.mark('out_of_bounds')
+
+            if self.autoplay:
+                self.follow_ball(dt)
+                profiler.mark('ai')
+
+            if self.game_is_over():
+                self.game_in_play = False
+                self.game_over = True
+                self.serve_ball()
+            elif self.player_won():
+                self.next_level()
+                self.serve_ball()
+
+            profiler.mark('level')
+        else:
+            # demo mode
+            if not self.swept:
+                self.hit_a_brick(score_point=False)
+                profiler.mark('bricks')
+
+            self.out_of_bounds()
+            profiler.mark('out_of_bounds')
+            self.follow_ball(dt)
+            profiler.mark('ai')
+
+            if len(self.bricks) == 0:
+                self.next_level()
+                self.serve_ball()
+
+            profiler.mark('level')
+
+    def serve_ball(self):
+        self.ball.center_x = self.player.center_x
+        self.ball.center_y = self.player.top + self.ball.height / 2.0
+        direction = radians(self.rng.randint(*self.serve_angles))
+
+        # velocity needs to scale with the size of the game, or the ball
+        # will appear to be very fast in a big game and very slow in a
+        # small one.  (The window doesn't matter, the game is scaled to
+        # fit it.)
+        scaled_velocity = min(self.width, self.height) * 0.0067 * TICK_RATE
+        self.ball.velocity = (scaled_velocity * cos(direction),
+                              scaled_velocity * sin(direction))
+
+        # a serve is a jump, not something to interpolate
+        self.ball.save_position()
+        self.serves += 1
+        self.predictor.reset()
+
+    def spawn_balls(self, count):
+        '''
+            Multi-ball!  Send count extra balls off from where the main
+            ball is, in random directions, at the same speed.  We only
+            send as many as there is room for under max_extra_balls.
+        '''
+        count = max(0, min(count,
+                           self.max_extra_balls - len(self.extra_balls)))
+        ball = self.ball
+        speed = sqrt(ball.velocity_x ** 2 + ball.velocity_y ** 2)
+        directions = [radians(self.rng.randint(*self.serve_angles))
+                      for _i in range(count)]
+
+        self.extra_balls.spawn(ball.x, ball.y,
+                               [speed * cos(d) for d in directions],
+                               [speed * sin(d) for d in directions])
+
+    def move_ball(self, dt, score_point=True):
+        if not self.swept:
+            self.ball.move(dt)
+            self.bounce_paddle()
+            return
+
+        # Continuous collision.  We sweep the ball along its path and
+        # resolve the hits in the order they happen, so the ball can't
+        # tunnel through a brick, the paddle or a wall no matter how far
+        # it travels in one tick.
+        ball, bricks = self.ball, self.bricks
+        remaining = dt
+
+        for hits in range(self.max_hits_per_tick + 1):
+            dx, dy = ball.velocity_x * remaining, ball.velocity_y * remaining
+            hit, hit_brick, hit_wall = self.sweep_paddle(dx, dy), None, False
+            wall_hit = self.sweep_walls(dx, dy)
+
+            if wall_hit is not None and (hit is None or
+                                         wall_hit[0] < hit[0]):
+                hit, hit_wall = wall_hit, True
+
+            if self.grid is not None:
+                path = Rect(min(ball.x, ball.x + dx), min(ball.y, ball.y + dy),
+                            ball.width + abs(dx), ball.height + abs(dy))
+
+                for i in self.grid.query(path):
+                    brick_hit = sweep_aabb(ball, dx, dy, bricks.x[i],
+                                           bricks.y[i],
+                                           bricks.x[i] + bricks.width[i],
+                                           bricks.y[i] + bricks.height[i])
+
+                    if brick_hit is not None and (hit is None or
+                                                  brick_hit[0] < hit[0]):
+                        hit, hit_brick, hit_wall = brick_hit, i, False
+
+            if hit is None:
+                ball.move(remaining)
+                return
+
+            toi, normal = hit[0], hit[1:]
+            ball.x += dx * toi
+            ball.y += dy * toi
+
+            if hits == self.max_hits_per_tick:
+                # Out of hits for this tick, so the ball waits at the
+                # contact point, and bounces at the start of the next.
+                # It loses the rest of this tick's move, rather than
+                # moving on through whatever it touched.
+                return
+
+            remaining *= 1.0 - toi
+
+            if hit_wall:
+                self.reflect_velocity(normal)
+            elif hit_brick is None:
+                self.reflect_ball(self.player, normal)
+                self.paddle_hits += 1
+            else:
+                self.reflect_ball(bricks.rect(hit_brick), normal)
+
+                if self.hit_brick(hit_brick) and score_point:
+                    self.player.score += bricks.value[hit_brick]
+
+    def sweep_paddle(self, dx, dy):
+        player = self.player
+
+        return sweep_aabb(self.ball, dx, dy,
+                          player.x, player.y, player.right, player.top)
+
+    def sweep_walls(self, dx, dy):
+        '''
+            The first of the left, right and top walls the ball touches
+            moving by (dx, dy), like sweep_aabb().  A ball that is already
+            past a wall and still moving out hits it at time 0.
+        '''
+        ball = self.ball
+        hits = []
+
+        if dx < 0.0:
+            hits.append((max(0.0, ball.x / -dx), 1.0, 0.0))
+        elif dx > 0.0:
+            hits.append((max(0.0, (self.width - ball.right) / dx),
+                         -1.0, 0.0))
+
+        if dy > 0.0:
+            hits.append((max(0.0, (self.height - ball.top) / dy),
+                         0.0, -1.0))
+
+        hits = [hit for hit in hits if hit[0] <= 1.0]
+
+        return min(hits) if hits else None
+
+    def reflect_velocity(self, normal):
+        '''
+            Mirror the ball's velocity off a surface with this normal.
+        '''
+        ball = self.ball
+        d_x, d_y = ball.velocity
+        dot = d_x * normal[0] + d_y * normal[1]
+        ball.velocity = (d_x - 2.0 * dot * normal[0],
+                         d_y - 2.0 * dot * normal[1])
+
+    def reflect_ball(self, solid, normal):
+        '''
+            Bounce the ball off a solid it has just touched.  We use the
+            same closest-surface reflection as the discrete collision, so
+            a hit near a corner still bounces off at an angle, but the
+            ball must end up moving away from the face it hit.
+        '''
+        ball = self.ball
+        v_x, v_y = get_bounce_vector(solid, ball)
+
+        if v_x * normal[0] + v_y * normal[1] <= 0.0:
+            self.reflect_velocity(normal)
+        else:
+            ball.velocity = v_x, v_y
+
+    def bounce_paddle(self):
+        player, ball = self.player, self.ball
+
+        if player.collide(ball):
+            if not player.collided:
+                ball.velocity = get_bounce_vector(player, ball)
+                player.collided = True
+                self.paddle_hits += 1
+        else:
+            player.collided = False
+
+    def bounce_off_walls(self):
+        ''' bounce off left, right, and top walls '''
+        ball = self.ball
+
+        if ball.x < 0 or ball.right > self.width:
+            ball.velocity_x *= -1
+
+        if ball.top > self.height:
+            ball.velocity_y *= -1
+
+    def hit_a_brick(self, score_point=True):
+        i = self.find_brick(self.ball)
+
+        if i is not None:
+            self.ball.velocity = get_bounce_vector(self.bricks.rect(i),
+                                                   self.ball)
+
+            if self.hit_brick(i) and score_point:
+                self.player.score += self.bricks.value[i]
+
+    def find_brick(self, rect):
+        '''
+            Find the first brick that collides with the rect.  We only
+            look at the grid cells that the rect overlaps.
+        '''
+        if self.grid is None:
+            return None
+
+        for i in self.grid.query(rect):
+            if self.bricks.collides(i, rect):
+                return i
+
+        return None
+
+    def out_of_bounds(self):
+        # went out-of-bounds?
+        if self.ball.y < 0:
+            self.player.missed_balls += 1
+            self.serve_ball()
+
+    def load_level(self):
+        '''
+            Put in the bricks of level number level_number, and start
+            getting the next one ready.
+        '''
+        number = self.level_number
+        self.bricks, self.grid, self.prepared_bricks = self.loader.load(
+            number, self.lay_out_level, number)
+        self.loader.preload(number + 1, self.lay_out_level, number + 1)
+
+        self.levels_loaded += 1
+        del self.removed_bricks[:]
+
+    def preload_level(self):
+        '''
+            Start laying out the current level ahead of time, so
+            load_level() doesn't have to wait for it.  This only helps
+            with a threaded loader.
+        '''
+        number = self.level_number
+        self.loader.preload(number, self.lay_out_level, number)
+
+    def lay_out_level(self, number):
+        '''
+            The bricks and grid of a level.  This can run on the
+            loader's thread, so it mustn't change anything.
+        '''
+        if self.levels:
+            level = Level.load(self.levels[number % len(self.levels)])
+        else:
+            level = Level.generated(self.level_width, self.level_height)
+
+        bricks, grid = lay_out(level, self.width, self.height)
+        prepared = None
+
+        if self.prepare_bricks is not None:
+            prepared = self.prepare_bricks(bricks)
+
+        return bricks, grid, prepared
+
+    def next_level(self):
+        self.level_number += 1
+        self.reset_level()
+        self.load_level()
+
+    def reset_level(self):
+        self.bricks = BrickField()
+        self.grid = None
+        self.prepared_bricks = None
+        del self.removed_bricks[:]
+
+    def reset_game(self):
+        self.extra_balls.clear()
+        self.player.missed_balls = 0
+        self.player.score = 0
+        self.game_over = False
+        self.level_number = 0
+        self.reset_level()
+        self.load_level()
+
+    def hit_brick(self, i):
+        '''
+            Knock a hit off brick i, and remove it if that broke it.
+            Returns True if it did.
+        '''
+        if self.bricks.hit(i):
+            self.remove_brick(i)
+            return True
+
+        return False
+
+    def remove_brick(self, i):
+        self.bricks.remove(i)
+        self.grid.remove(i)
+        self.removed_bricks.append(i)
+
+    def pop_removed_bricks(self):
+        '''
+            Return the indices of the bricks removed since the last call.
+            The widget layer uses this to mirror brick destruction.
+        '''
+        removed = self.removed_bricks
+        self.removed_bricks = []
+
+        return removed
+
+    def follow_ball(self, dt):
+        # Here we have the paddle try to hit the ball back.
+        # This is just for demo play.
+        if self.follow_speed is None:
+            # we should be able to catch up to the ball if it is traveling
+            # in a vertical slope of 55 degrees or more
+            vx, vy = self.ball.velocity
+            self.follow_speed = sqrt(vx * vx + vy * vy) * self.follow_ratio
+
+        if self.predictive:
+            target = self.predictor.target_for(self.ball)
+
+            if target is None:
+                target = self.ball.center_x
+
+            self.player.center_x = step_towards(self.player.center_x, target,
+                                                self.follow_speed * dt)
+            return
+
+        if self.player.center_x > self.ball.center_x:
+            self.player.x -= self.follow_speed * dt
+
+        if self.player.center_x < self.ball.center_x:
+            self.player.x += self.follow_speed * dt
+
+    def predict_ball(self, ball):
+        '''
+            Where the ball's center_x will be when it comes down to the
+            top of the paddle, bouncing off the side walls on the way.
+            None while it is going up: it will almost always hit a brick
+            before it comes back down, and we can't tell where it goes
+            from there, so follow_ball() just tracks it until then.
+        '''
+        if ball.velocity_y >= 0.0:
+            return None
+
+        line = self.player.top
+        half = ball.width / 2.0
+        crossing = predict_crossing(ball.y, ball.center_x,
+                                    ball.velocity_y, ball.velocity_x,
+                                    line, half, self.width - half)
+
+        if crossing is None:
+            return None
+
+        return crossing[1]
+
+    def start_demo(self):
+        self.load_level()
+        self.serve_ball()
+
+    def start_game(self):
+        self.reset_game()
+        self.game_in_play = True
+        self.serve_ball()
+
+    def apply_input(self, kind, player, x, y):
+        '''
+            Apply a recorded input.  Everything the player can do to the
+            game goes through here when we replay a session.
+        '''
+        if kind == MOVE:
+            self.move_player(x)
+        elif kind == START:
+            self.start_game()
+        elif kind == SPAWN:
+            self.spawn_balls(int(x))
+
+    def move_player(self, move_to):
+        new_pos = self.player.center_x + move_to
+        self.player.center_x = clamp(new_pos,
+                                     self.player.width / 2.0,
+                                     self.width - self.player.width / 2.0)
+        self.player.save_position()
+
+    def game_is_over(self):
+        return self.player_lost()
+
+    def player_lost(self):
+        return self.player.missed_balls >= 3
+
+    def player_won(self):
+        return len(self.bricks) == 0
+
+    def setup(self):
+        '''
+            What we need, along with the seed, to set up the same game
+            again.
+        '''
+        return {'width': self.width,
+                'height': self.height,
+                'paddle_size': [self.player.width, self.player.height],
+                'ball_size': self.ball.width,
+                'levels': list(self.levels) if self.levels else None,
+                'level_width': self.level_width,
+                'level_height': self.level_height,
+                'swept': self.swept,
+                'serve_angles': list(self.serve_angles),
+                'follow_ratio': self.follow_ratio,
+                'predictive': self.predictive}
+
+    @classmethod
+    def from_setup(cls, setup, seed):
+        sim = cls(setup['width'], setup['height'],
+                  paddle_size=setup['paddle_size'],
+                  ball_size=setup['ball_size'], seed=seed)
+        sim.levels = setup.get('levels')
+        sim.level_width = setup['level_width']
+        sim.level_height = setup['level_height']
+        sim.swept = setup['swept']
+        sim.serve_angles = tuple(setup.get('serve_angles',
+                                           cls.serve_angles))
+        sim.follow_ratio = setup.get('follow_ratio', cls.follow_ratio)
+        sim.predictive = setup.get('predictive', cls.predictive)
+
+        return sim
+
+    def state_hash(self):
+        ball, player, bricks = self.ball, self.player, self.bricks
+        extra = self.extra_balls
+
+        return hash_values(self.ticks, self.levels_loaded, self.level_number,
+                           float(self.game_in_play),
+                           ball.x, ball.y, ball.velocity_x, ball.velocity_y,
+                           player.x, player.y,
+                           player.score, player.missed_balls,
+                           bytes(bricks.alive), bricks.hits.tobytes(),
+                           extra.x.tobytes(), extra.y.tobytes(),
+                           extra.vx.tobytes(), extra.vy.tobytes())
@@ -0,0 +1,72 @@
+'''
+    Checks of the level file parser and the layout in levels.py.  Run
+    them from this directory with:
+
+        > python -m pytest test_levels.py
+'''
+import pytest
+
+from levels import Level, lay_out
+
+
+LEVEL = '''
+# the first level
+brick a 1 0.0
+brick b 2 0.2
+brick c 5 0.4 2
+cccc
+bb
+a.a.
+'''
+
+
+def test_parse():
+    level = Level.parse(LEVEL, 'first')
+
+    assert level.kinds == [(1, 0.0, 1), (2, 0.2, 1), (5, 0.4, 2)]
+    assert (level.cols, level.rows) == (4, 3)
+
+    # row 0 is the bottom, and short rows are padded with empty cells
+    assert level.cells.tolist() == [[1, 0, 1, 0],
+                                    [2, 2, 0, 0],
+                                    [3, 3, 3, 3]]
+
+
+@pytest.mark.parametrize('text, error', [
+    ('brick a 1 0.0\n', 'no bricks'),
+    ('brick a 1 0.0\nab\n', "no brick line for 'b'"),
+    ('brick a 1\na\n', 'a brick line is'),
+    ('brick ab 1 0.0\na\n', 'a brick line is'),
+    ('brick . 1 0.0\n.\n', "'.' can't be a brick"),
+    ('brick a one 0.0\na\n', 'bad number'),
+    ('brick a 1 0.0 0\na\n', 'at least 1 hit'),
+    (u'brick a 1 0.0\naé\n', 'ASCII'),
+])
+def test_parse_errors(text, error):
+    with pytest.raises(ValueError) as e:
+        Level.parse(text, 'bad.level')
+
+    assert error in str(e.value)
+    assert str(e.value).startswith('bad.level')
+
+
+def test_parse_error_gives_the_line():
+    with pytest.raises(ValueError) as e:
+        Level.parse('# bricks\nbrick a 1 0.0\nbrick b 1\nab\n', 'x.level')
+
+    assert str(e.value).startswith('x.level:3:')
+
+
+def test_lay_out():
+    level = Level.parse(LEVEL)
+    bricks, grid = lay_out(level, 800, 600)
+
+    assert len(bricks) == 8
+    assert sorted(bricks.value) == [1, 1, 2, 2, 5, 5, 5, 5]
+
+    # every brick is in the top half, and the grid finds it there
+    for i in bricks.indices():
+        rect = bricks.rect(i)
+
+        assert rect.y >= 300
+        assert i in grid.query(rect)
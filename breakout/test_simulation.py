@@ -0,0 +1,94 @@
+'''
+    Checks of the game logic in simulation.py.  These don't
+    need Kivy, run them from this directory with:
+
+        > python -m pytest test_simulation.py
+'''
+from simulation import BreakoutSim, DEFAULT_DT
+from levels import Level, lay_out
+
+
+def make_gap_sim():
+    '''
+        A sim with two tough bricks and a gap between them, and the ball
+        in the gap.
+    '''
+    sim = BreakoutSim(800, 600, seed=0)
+    level = Level([[1, 0, 1]], [(1, 0.0, 1000)])
+    sim.bricks, sim.grid = lay_out(level, sim.width, sim.height)
+    sim.ball.center_x = sim.width / 2.0
+    sim.ball.center_y = sim.bricks.y[0] + sim.bricks.height[0] / 2.0
+
+    return sim
+
+
+def test_ball_stays_between_bricks_past_max_hits():
+    # Fast enough to bounce across the gap a dozen times a tick, so we
+    # run out of hits every tick.
+    sim = make_gap_sim()
+    sim.ball.velocity = (200000.0, 0.0)
+    left = sim.bricks.x[0] + sim.bricks.width[0]
+    right = sim.bricks.x[1]
+
+    for _i in range(20):
+        sim.move_ball(DEFAULT_DT)
+
+        assert left <= sim.ball.x + 1e-6
+        assert sim.ball.right <= right + 1e-6
+
+
+def test_ball_stops_at_contact_when_out_of_hits():
+    sim = make_gap_sim()
+    sim.max_hits_per_tick = 0
+    sim.ball.velocity = (200000.0, 0.0)
+    sim.move_ball(DEFAULT_DT)
+
+    assert abs(sim.ball.right - sim.bricks.x[1]) < 1e-6
+    assert sim.ball.velocity_x > 0
+
+    # and it bounces off at the start of the next tick
+    sim.max_hits_per_tick = 4
+    sim.move_ball(DEFAULT_DT)
+
+    assert sim.ball.right <= sim.bricks.x[1] + 1e-6
+
+
+def test_fast_ball_bounces_off_the_walls():
+    sim = BreakoutSim(800, 600, seed=0)
+
+    for velocity in ((-100000.0, 0.0), (100000.0, 0.0), (0.0, 100000.0),
+                     (70000.0, 90000.0)):
+        sim.ball.center_x, sim.ball.center_y = 400.0, 300.0
+        sim.ball.velocity = velocity
+
+        for _i in range(10):
+            sim.move_ball(DEFAULT_DT)
+
+            assert -1e-6 <= sim.ball.x
+            assert sim.ball.right <= sim.width + 1e-6
+            assert sim.ball.top <= sim.height + 1e-6
+
+
+def test_ball_past_a_wall_comes_back():
+    sim = BreakoutSim(800, 600, seed=0)
+    sim.ball.x = -5.0
+    sim.ball.center_y = 300.0
+    sim.ball.velocity = (-300.0, 0.0)
+    sim.move_ball(DEFAULT_DT)
+
+    assert sim.ball.velocity_x > 0
+
+
+def test_spawn_balls_stops_at_the_limit():
+    sim = BreakoutSim(800, 600, seed=0)
+    sim.max_extra_balls = 120
+    sim.serve_ball()
+
+    for _i in range(3):
+        sim.spawn_balls(50)
+
+    assert len(sim.extra_balls) == 120
+
+    sim.spawn_balls(50)
+
+    assert len(sim.extra_balls) == 120
@@ -0,0 +1,5 @@
+'''
+    The game directories each have a gamelib symlink, so skip those, or
+    we would collect gamelib's tests once for every game.
+'''
+collect_ignore_glob = ['*/gamelib']
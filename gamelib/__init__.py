@@ -0,0 +1,6 @@
+'''
+    Bits and pieces shared by the games in this repository.
+
+    Each game directory has a 'gamelib' symlink pointing here, so the
+    games can still be run (and packaged) from their own directory.
+'''
@@ -0,0 +1,114 @@
+'''
+    Helpers for the benchmark suite.
+
+    Each game's benchmarks.py has a suite() function that returns a flat
+    dict of benchmark names and their times in seconds, and saves it as
+    JSON when run with --json <file>.  run_benchmarks.py at the top of the
+    repo runs all of them, and compares the results against a saved
+    baseline.
+
+    A benchmark should also check() that the code it timed did the right
+    thing, so a change can't pass by getting faster at getting it wrong.
+'''
+import json
+from timeit import default_timer
+
+
+def best_of(func, repeat=5, number=1):
+    '''
+        The fastest time per call of func, over repeat runs of number
+        calls.  The fastest run is the one least disturbed by whatever
+        else the machine was doing.
+    '''
+    best = None
+
+    for _i in range(repeat):
+        start = default_timer()
+
+        for _j in range(number):
+            func()
+
+        elapsed = (default_timer() - start) / number
+
+        if best is None or elapsed < best:
+            best = elapsed
+
+    return best
+
+
+def median(values):
+    ordered = sorted(values)
+    middle = len(ordered) // 2
+
+    if len(ordered) % 2:
+        return ordered[middle]
+
+    return (ordered[middle - 1] + ordered[middle]) / 2.0
+
+
+def check(condition, message):
+    '''
+        Fail the benchmark run if condition is false.  Unlike assert, this
+        still works with python -O.
+    '''
+    if not condition:
+        raise AssertionError(message)
+
+
+def load_results(filename):
+    with open(filename) as f:
+        return json.load(f)
+
+
+def save_results(results, filename):
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+        f.write('\n')
+
+
+def compare(results, baseline, threshold=0.25, fast=1e-3,
+            fast_threshold=0.5):
+    '''
+        Compare the results against the baseline.  Returns a row of
+        (name, baseline, result, ratio, status) for every benchmark, where
+        status is 'slower' if it got slower by more than the threshold,
+        'faster' if it got faster by more than that, 'new' if it isn't in
+        the baseline, and '' otherwise.
+
+        Benchmarks that take less than fast seconds in the baseline are
+        at the mercy of the cache, the scheduler and the garbage
+        collector, so they get the looser fast_threshold instead.
+    '''
+    rows = []
+
+    for name in sorted(set(results) | set(baseline)):
+        old, new = baseline.get(name), results.get(name)
+
+        if old is None:
+            rows.append((name, None, new, None, 'new'))
+        elif new is None:
+            rows.append((name, old, None, None, 'missing'))
+        else:
+            ratio = new / old if old > 0 else 1.0
+            allowed = fast_threshold if old < fast else threshold
+
+            if ratio > 1.0 + allowed:
+                status = 'slower'
+            elif ratio < 1.0 / (1.0 + allowed):
+                status = 'faster'
+            else:
+                status = ''
+
+            rows.append((name, old, new, ratio, status))
+
+    return rows
+
+
+def format_time(seconds):
+    if seconds is None:
+        return '-'
+
+    if seconds >= 1e-3:
+        return '{:.3f} ms'.format(seconds * 1e3)
+
+    return '{:.3f} us'.format(seconds * 1e6)
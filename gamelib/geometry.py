@@ -0,0 +1,165 @@
+'''
+    Closest surface points, normals and reflections for boxes.
+
+    This is the math for bouncing a ball off a solid box, like a paddle
+    or a brick.  We find the point on the surface of the box closest to
+    the center of the ball, and the normal pointing from that point out
+    to the ball.  If the ball's center is inside the box, the normal is
+    flipped so it still points out of the nearest side.  The ball's
+    velocity is then reflected about that normal.
+
+    The scalar functions work on plain floats and return tuples, so
+    they don't allocate any Vectors.  The batch functions take NumPy
+    arrays of points and velocities (and either one box, or an array of
+    boxes), and do the same thing for all of them in one pass.
+
+    A box is given as left, bottom, right, top.
+'''
+from math import sqrt
+
+import numpy as np
+
+
+def clamp(x, lower, upper):
+    return max(lower, min(upper, x))
+
+
+def inside(left, bottom, right, top, x, y):
+    return left <= x <= right and bottom <= y <= top
+
+
+def surface_point(left, bottom, right, top, x, y):
+    '''
+        The point on the surface of the box that is closest to (x, y).
+        This needs to work even if the point is inside the box.
+    '''
+    pos_x = clamp(x, left, right)
+    pos_y = clamp(y, bottom, top)
+
+    d_left = abs(pos_x - left)
+    d_right = abs(pos_x - right)
+    d_top = abs(pos_y - top)
+    d_bot = abs(pos_y - bottom)
+    d_min = min(d_left, d_bot, d_right, d_top)
+
+    if d_left == d_min:
+        return left, pos_y
+    elif d_right == d_min:
+        return right, pos_y
+    elif d_top == d_min:
+        return pos_x, top
+    else:
+        return pos_x, bottom
+
+
+def end_point(left, bottom, right, top, start, x, y):
+    '''
+        The end of the line from the surface point start that points
+        out of the box.  Normally that is just (x, y), but if (x, y) is
+        inside the box we reverse it relative to start.
+    '''
+    if inside(left, bottom, right, top, x, y):
+        return start[0] + (start[0] - x), start[1] + (start[1] - y)
+
+    return x, y
+
+
+def surface_vector(left, bottom, right, top, x, y):
+    '''
+        A vector pointing outward and perpendicular to the surface
+        closest to (x, y).  It isn't normalized.
+    '''
+    start = surface_point(left, bottom, right, top, x, y)
+    end = end_point(left, bottom, right, top, start, x, y)
+
+    return end[0] - start[0], end[1] - start[1]
+
+
+def surface_normal(left, bottom, right, top, x, y):
+    '''
+        The unit surface_vector(), or (0, 0) if (x, y) is right on
+        the surface.
+    '''
+    n_x, n_y = surface_vector(left, bottom, right, top, x, y)
+    length = sqrt(n_x * n_x + n_y * n_y)
+
+    if length == 0.0:
+        return 0.0, 0.0
+
+    return n_x / length, n_y / length
+
+
+def reflect(v_x, v_y, n_x, n_y):
+    dot = v_x * n_x + v_y * n_y
+
+    return v_x - 2.0 * dot * n_x, v_y - 2.0 * dot * n_y
+
+
+def bounce_vector(left, bottom, right, top, x, y, v_x, v_y):
+    '''
+        The velocity of a ball centered at (x, y) after it bounces off
+        the box.  We assume it is coming toward the box.
+    '''
+    n_x, n_y = surface_normal(left, bottom, right, top, x, y)
+
+    return reflect(v_x, v_y, n_x, n_y)
+
+
+def surface_points(left, bottom, right, top, x, y):
+    '''
+        The batch version of surface_point().
+    '''
+    pos_x = np.clip(x, left, right)
+    pos_y = np.clip(y, bottom, top)
+
+    d_left = np.abs(pos_x - left)
+    d_right = np.abs(pos_x - right)
+    d_top = np.abs(pos_y - top)
+    d_bot = np.abs(pos_y - bottom)
+    d_min = np.minimum(np.minimum(d_left, d_bot), np.minimum(d_right, d_top))
+
+    # the same order of preference as surface_point()
+    on_left = d_left == d_min
+    on_right = ~on_left & (d_right == d_min)
+    on_top = ~on_left & ~on_right & (d_top == d_min)
+
+    s_x = np.where(on_left, left, np.where(on_right, right, pos_x))
+    s_y = np.where(on_left | on_right, pos_y,
+                   np.where(on_top, top, bottom))
+
+    return s_x, s_y
+
+
+def surface_normals(left, bottom, right, top, x, y):
+    '''
+        The batch version of surface_normal().
+    '''
+    s_x, s_y = surface_points(left, bottom, right, top, x, y)
+    is_inside = (left <= x) & (x <= right) & (bottom <= y) & (y <= top)
+
+    n_x = np.where(is_inside, s_x - x, x - s_x)
+    n_y = np.where(is_inside, s_y - y, y - s_y)
+    length = np.hypot(n_x, n_y)
+
+    # points right on the surface get a zero normal
+    length = np.where(length == 0.0, np.inf, length)
+
+    return n_x / length, n_y / length
+
+
+def reflections(v_x, v_y, n_x, n_y):
+    '''
+        The batch version of reflect().
+    '''
+    dot = v_x * n_x + v_y * n_y
+
+    return v_x - 2.0 * dot * n_x, v_y - 2.0 * dot * n_y
+
+
+def bounce_vectors(left, bottom, right, top, x, y, v_x, v_y):
+    '''
+        The batch version of bounce_vector().
+    '''
+    n_x, n_y = surface_normals(left, bottom, right, top, x, y)
+
+    return reflections(v_x, v_y, n_x, n_y)
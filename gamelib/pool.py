@@ -0,0 +1,74 @@
+'''
+    A simple object pool.
+
+    Creating and throwing away widgets is expensive in Kivy, and it
+    makes the garbage collector run at bad times, like right when a new
+    level starts.  So instead we keep the objects we're done with, and
+    hand them out again the next time one is needed.
+'''
+
+
+class Pool(object):
+    '''
+        Keep released objects around to be acquired again.
+
+            pool = Pool(Brick)
+            pool.prewarm(40)
+            brick = pool.acquire()
+            ...
+            pool.release(brick)
+
+        factory() creates a new object when the pool is empty, and
+        reset(obj), if given, is called on an object when it is released.
+        If max_size is given, objects released to a full pool are just
+        dropped.
+    '''
+    def __init__(self, factory, reset=None, max_size=None):
+        self.factory = factory
+        self.reset = reset
+        self.max_size = max_size
+        self.free = []
+
+        self.hits = 0
+        self.misses = 0
+        self.released = 0
+        self.dropped = 0
+
+    def __len__(self):
+        return len(self.free)
+
+    def prewarm(self, count):
+        '''
+            Create objects up front, so that the first acquires don't
+            have to.
+        '''
+        while len(self.free) < count:
+            if self.max_size is not None and len(self.free) >= self.max_size:
+                break
+
+            self.free.append(self.factory())
+
+    def acquire(self):
+        if self.free:
+            self.hits += 1
+            return self.free.pop()
+        else:
+            self.misses += 1
+            return self.factory()
+
+    def release(self, obj):
+        if self.reset is not None:
+            self.reset(obj)
+
+        if self.max_size is not None and len(self.free) >= self.max_size:
+            self.dropped += 1
+        else:
+            self.free.append(obj)
+            self.released += 1
+
+    def stats(self):
+        return {'free': len(self.free),
+                'hits': self.hits,
+                'misses': self.misses,
+                'released': self.released,
+                'dropped': self.dropped}
@@ -0,0 +1,80 @@
+'''
+    Predicting where a ball will be, for the demo AI.
+
+    Rather than chasing where the ball is now, an AI paddle can work out
+    where the ball will cross the paddle's line and go there.  Bounces
+    off the side walls don't need to be simulated: a ball bouncing
+    between two walls is in the same place as a ball going straight
+    through them, folded back into the space between the walls.  So the
+    crossing point is a closed form, and works at any ball speed.
+
+    The prediction only changes when the ball's velocity does, after a
+    bounce or a serve, so BallPredictor keeps the last answer, and most
+    ticks cost a comparison.
+'''
+
+
+def fold(position, lower, upper):
+    '''
+        Where a ball that would be at position, if there were no walls,
+        really is after bouncing between walls at lower and upper.
+    '''
+    span = upper - lower
+
+    if span <= 0.0:
+        return lower
+
+    offset = (position - lower) % (2.0 * span)
+
+    return lower + span - abs(offset - span)
+
+
+def predict_crossing(along, across, v_along, v_across, line, lower, upper):
+    '''
+        A ball at along (on the axis it crosses the line on) and across
+        (on the axis it bounces between lower and upper on) is moving at
+        (v_along, v_across).  Return the time until it reaches the line,
+        and its across position when it does.  None if it never will.
+    '''
+    if v_along == 0.0 or (line - along) * v_along < 0.0:
+        return None
+
+    t = (line - along) / v_along
+
+    return t, fold(across + v_across * t, lower, upper)
+
+
+def step_towards(position, target, max_step):
+    '''
+        Move position towards target, but no further than max_step,
+        so we don't jitter back and forth across the target.
+    '''
+    if position < target:
+        return min(position + max_step, target)
+
+    return max(position - max_step, target)
+
+
+class BallPredictor(object):
+    '''
+        Caches the result of solve(ball), and only calls it again when
+        the ball's velocity changes, or when we are told to with reset().
+    '''
+    def __init__(self, solve):
+        self.solve = solve
+        self.velocity = None
+        self.target = None
+        self.solves = 0
+
+    def reset(self):
+        self.velocity = None
+
+    def target_for(self, ball):
+        velocity = (ball.velocity_x, ball.velocity_y)
+
+        if velocity != self.velocity:
+            self.velocity = velocity
+            self.target = self.solve(ball)
+            self.solves += 1
+
+        return self.target
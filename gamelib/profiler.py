@@ -0,0 +1,203 @@
+'''
+    A lightweight profiler for the phases of a game's update.
+
+    The code being profiled calls begin() at the start of something,
+    like a tick, and then mark(name) at the end of each phase of it.
+    The time since the last mark goes to that phase.  We keep the last
+    few hundred samples of each phase, for rolling percentiles, and can
+    count other things like widget adds and removes, or add samples
+    timed some other way.  While it is running we also time the garbage
+    collector's pauses.
+
+    It is turned on with the GAME_PROFILE environment variable:
+
+        GAME_PROFILE=1              profile, and show the overlay
+        GAME_PROFILE=trace.csv      also write every sample to a CSV
+        GAME_PROFILE=trace.json     or to a Chrome trace (chrome://tracing)
+
+    When it is off the games use NULL_PROFILER, whose methods do
+    nothing, so profiling costs a no-op method call per phase.
+'''
+import csv
+import gc
+import json
+import os
+from collections import defaultdict, deque
+from timeit import default_timer
+
+
+class NullProfiler(object):
+    enabled = False
+
+    def begin(self):
+        pass
+
+    def mark(self, name):
+        pass
+
+    def count(self, name, n=1):
+        pass
+
+    def sample(self, name, seconds):
+        pass
+
+    def close(self):
+        pass
+
+
+NULL_PROFILER = NullProfiler()
+
+
+def percentile(ordered, fraction):
+    # nearest rank percentile of an already sorted list
+    if not ordered:
+        return 0.0
+
+    rank = int(round(fraction * (len(ordered) - 1)))
+
+    return ordered[rank]
+
+
+class FrameProfiler(object):
+    enabled = True
+
+    def __init__(self, window=600, trace_file=None):
+        self.window = window
+        self.samples = defaultdict(lambda: deque(maxlen=self.window))
+        self.counters = defaultdict(int)
+        self.started = self.last = default_timer()
+
+        self.gc_pauses = deque(maxlen=window)
+        self.gc_count = 0
+        self.gc_start = None
+        gc.callbacks.append(self.on_gc)
+
+        self.trace_file = trace_file
+        self.trace = [] if trace_file else None
+
+    def begin(self):
+        self.last = default_timer()
+
+    def mark(self, name):
+        now = default_timer()
+        self.samples[name].append(now - self.last)
+
+        if self.trace is not None:
+            self.trace.append((self.last - self.started, name,
+                               now - self.last))
+
+        self.last = now
+
+    def count(self, name, n=1):
+        self.counters[name] += n
+
+    def sample(self, name, seconds):
+        '''
+            Add a time measured some other way, like an input latency.
+        '''
+        self.samples[name].append(seconds)
+
+        if self.trace is not None:
+            self.trace.append((default_timer() - seconds - self.started,
+                               name, seconds))
+
+    def on_gc(self, phase, info):
+        if phase == 'start':
+            self.gc_start = default_timer()
+        elif self.gc_start is not None:
+            pause = default_timer() - self.gc_start
+            self.gc_pauses.append(pause)
+            self.gc_count += 1
+
+            if self.trace is not None:
+                self.trace.append((self.gc_start - self.started, 'gc',
+                                   pause))
+
+            self.gc_start = None
+
+    def stats(self):
+        '''
+            The mean and percentiles of each phase over the last window
+            samples, in seconds, and the counters.
+        '''
+        phases = {}
+
+        for name, samples in self.samples.items():
+            ordered = sorted(samples)
+            phases[name] = {'count': len(ordered),
+                            'mean': sum(ordered) / max(len(ordered), 1),
+                            'p50': percentile(ordered, 0.50),
+                            'p95': percentile(ordered, 0.95),
+                            'p99': percentile(ordered, 0.99)}
+
+        pauses = list(self.gc_pauses)
+
+        return {'phases': phases,
+                'counters': dict(self.counters),
+                'gc': {'count': self.gc_count,
+                       'max': max(pauses) if pauses else 0.0,
+                       'total': sum(pauses)}}
+
+    def report(self):
+        '''
+            A few lines of text for the overlay, times in milliseconds.
+        '''
+        stats = self.stats()
+        lines = ['{:<14} {:>7} {:>7} {:>7}'.format('phase', 'p50', 'p95',
+                                                   'p99')]
+
+        for name in sorted(stats['phases']):
+            phase = stats['phases'][name]
+            lines.append('{:<14} {:7.3f} {:7.3f} {:7.3f}'.format(
+                name, phase['p50'] * 1e3, phase['p95'] * 1e3,
+                phase['p99'] * 1e3))
+
+        for name in sorted(stats['counters']):
+            lines.append('{:<14} {:>7}'.format(name, stats['counters'][name]))
+
+        gc_stats = stats['gc']
+        lines.append('gc {} pauses, max {:.3f} ms'.format(
+            gc_stats['count'], gc_stats['max'] * 1e3))
+
+        return '\n'.join(lines)
+
+    def close(self):
+        '''
+            Stop timing the garbage collector, and write the trace.
+        '''
+        if self.on_gc in gc.callbacks:
+            gc.callbacks.remove(self.on_gc)
+
+        if self.trace_file:
+            self.write_trace(self.trace_file)
+
+    def write_trace(self, filename):
+        if filename.endswith('.json'):
+            # the Chrome trace event format, times in microseconds
+            events = [{'name': name, 'ph': 'X', 'pid': 0, 'tid': 0,
+                       'ts': start * 1e6, 'dur': duration * 1e6}
+                      for start, name, duration in self.trace]
+
+            with open(filename, 'w') as f:
+                json.dump({'traceEvents': events,
+                           'stats': self.stats()}, f)
+        else:
+            with open(filename, 'w') as f:
+                writer = csv.writer(f)
+                writer.writerow(['start_s', 'phase', 'duration_ms'])
+
+                for start, name, duration in self.trace:
+                    writer.writerow(['{:.6f}'.format(start), name,
+                                     '{:.4f}'.format(duration * 1e3)])
+
+
+def profiler_from_env(variable='GAME_PROFILE'):
+    setting = os.environ.get(variable, '')
+
+    if setting in ('', '0'):
+        return NULL_PROFILER
+
+    if setting.endswith(('.csv', '.json')):
+        return FrameProfiler(trace_file=setting)
+
+    return FrameProfiler()
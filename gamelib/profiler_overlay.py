@@ -0,0 +1,66 @@
+'''
+    An on-screen overlay of what a FrameProfiler has measured.
+
+    The overlay sits on top of the window, so it isn't one of the game's
+    widgets and doesn't show up in its widget counts.  Press the toggle
+    key (p by default) to show or hide it.
+'''
+from kivy.clock import Clock
+from kivy.core.window import Window
+from kivy.graphics import Color, Rectangle
+from kivy.uix.label import Label
+
+
+class ProfilerOverlay(Label):
+    def __init__(self, profiler, refresh_interval=0.5, toggle_key='p',
+                 **kwargs):
+        kwargs.setdefault('font_name', 'RobotoMono-Regular')
+        kwargs.setdefault('font_size', 14)
+        kwargs.setdefault('halign', 'left')
+        kwargs.setdefault('size_hint', (None, None))
+        super(ProfilerOverlay, self).__init__(**kwargs)
+
+        self.profiler = profiler
+        self.refresh_interval = refresh_interval
+        self.toggle_key = toggle_key
+        self.refresh_event = None
+
+        with self.canvas.before:
+            Color(0, 0, 0, 0.6)
+            self.background = Rectangle()
+
+        Window.bind(on_key_down=self.on_key_down)
+
+    def show(self):
+        if self.parent is None:
+            Window.add_widget(self)
+            self.refresh()
+            self.refresh_event = Clock.schedule_interval(
+                self.refresh, self.refresh_interval)
+
+    def hide(self):
+        if self.parent is not None:
+            Window.remove_widget(self)
+            self.refresh_event.cancel()
+            self.refresh_event = None
+
+    def toggle(self):
+        if self.parent is None:
+            self.show()
+        else:
+            self.hide()
+
+    def refresh(self, _dt=None):
+        self.text = self.profiler.report()
+        self.texture_update()
+        self.size = self.texture_size
+        self.pos = 10, Window.height - self.height - 10
+        self.background.pos = self.pos
+        self.background.size = self.size
+
+    def on_key_down(self, _window, _key, _scancode, codepoint, _modifiers):
+        if codepoint == self.toggle_key:
+            self.toggle()
+            return True
+
+        return False
@@ -0,0 +1,58 @@
+'''
+    A plain axis aligned box for headless game simulations.
+'''
+
+
+class Rect(object):
+    '''
+        A simple axis aligned box with the same position accessors as
+        a Kivy widget, so the collision code reads the same.
+        We also remember where the box was at the start of the last
+        physics step, so the renderer can interpolate between the two.
+    '''
+    def __init__(self, x=0.0, y=0.0, width=0.0, height=0.0):
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.prev_x = x
+        self.prev_y = y
+
+    @property
+    def right(self):
+        return self.x + self.width
+
+    @property
+    def top(self):
+        return self.y + self.height
+
+    @property
+    def center_x(self):
+        return self.x + self.width / 2.0
+
+    @center_x.setter
+    def center_x(self, value):
+        self.x = value - self.width / 2.0
+
+    @property
+    def center_y(self):
+        return self.y + self.height / 2.0
+
+    @center_y.setter
+    def center_y(self, value):
+        self.y = value - self.height / 2.0
+
+    def collide(self, other):
+        return not (self.right < other.x or self.x > other.right or
+                    self.top < other.y or self.y > other.top)
+
+    def save_position(self):
+        self.prev_x, self.prev_y = self.x, self.y
+
+    def lerp(self, alpha):
+        '''
+            Our position between the last step (alpha = 0) and
+            the current one (alpha = 1).
+        '''
+        return (self.prev_x + (self.x - self.prev_x) * alpha,
+                self.prev_y + (self.y - self.prev_y) * alpha)
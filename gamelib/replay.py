@@ -0,0 +1,148 @@
+'''
+    Recording and replaying game sessions.
+
+    A game simulation is deterministic given its random seed and the
+    inputs it gets at each tick.  So to reproduce a session we only need
+    to record the seed, the setup of the game, and a compact log of the
+    inputs.  A replay re-simulates the whole session without a window,
+    as fast as it can, and checks that it ends up in the same state.
+
+    The simulation is expected to have:
+
+        ticks               the number of ticks it has run
+        step(n, dt)         run up to n ticks, stopping at a game over
+        game_over           set when a game ends, and cleared by us
+        apply_input(kind, player, x, y)
+        state_hash()        a hash of all of the game state
+
+    A replay file is a small header, a JSON block with the seed and the
+    game setup, and then the events as packed arrays.
+'''
+import json
+import struct
+from array import array
+from hashlib import sha1
+
+
+MAGIC = b'RPLY'
+VERSION = 1
+HEADER = struct.Struct('<4sHI')
+
+# event kinds shared by the games
+MOVE, START, RESIZE, SPAWN = 1, 2, 3, 4
+
+
+class InputLog(object):
+    '''
+        The seed and setup of a game, and the inputs it got.
+        Each event is a tick, a kind, a player number and two values,
+        like a paddle movement or a new window size.
+    '''
+    def __init__(self, seed=0, setup=None):
+        self.seed = seed
+        self.setup = dict(setup or {})
+        self.end_tick = 0
+        self.final_hash = None
+
+        self.ticks = array('I')
+        self.kinds = array('B')
+        self.players = array('B')
+        self.xs = array('d')
+        self.ys = array('d')
+
+    def __len__(self):
+        return len(self.ticks)
+
+    def record(self, tick, kind, player=0, x=0.0, y=0.0):
+        self.ticks.append(tick)
+        self.kinds.append(kind)
+        self.players.append(player)
+        self.xs.append(x)
+        self.ys.append(y)
+
+    def events(self):
+        return zip(self.ticks, self.kinds, self.players, self.xs, self.ys)
+
+    def finish(self, sim):
+        '''
+            Note where the session ended, and the state it ended in.
+        '''
+        self.end_tick = sim.ticks
+        self.final_hash = sim.state_hash()
+
+    def save(self, filename):
+        meta = json.dumps({'seed': self.seed,
+                           'setup': self.setup,
+                           'end_tick': self.end_tick,
+                           'final_hash': self.final_hash}).encode('utf-8')
+
+        with open(filename, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, len(meta)))
+            f.write(meta)
+            f.write(struct.pack('<I', len(self)))
+
+            for values in (self.ticks, self.kinds, self.players,
+                           self.xs, self.ys):
+                values.tofile(f)
+
+    @classmethod
+    def load(cls, filename):
+        with open(filename, 'rb') as f:
+            magic, version, meta_size = HEADER.unpack(f.read(HEADER.size))
+
+            if magic != MAGIC or version != VERSION:
+                raise ValueError('{} is not a replay file we can read'
+                                 .format(filename))
+
+            meta = json.loads(f.read(meta_size).decode('utf-8'))
+            count, = struct.unpack('<I', f.read(4))
+
+            log = cls(meta['seed'], meta['setup'])
+            log.end_tick = meta['end_tick']
+            log.final_hash = meta['final_hash']
+
+            for values in (log.ticks, log.kinds, log.players,
+                           log.xs, log.ys):
+                values.fromfile(f, count)
+
+        return log
+
+
+def hash_values(*values):
+    '''
+        A hash of a bunch of numbers and byte strings, for state_hash().
+    '''
+    h = sha1()
+
+    for value in values:
+        if isinstance(value, (bytes, bytearray)):
+            h.update(value)
+        else:
+            h.update(struct.pack('<d', value))
+
+    return h.hexdigest()
+
+
+def run_to(sim, tick, dt):
+    '''
+        Run the simulation up to a tick.  Game overs don't stop us, the
+        game just carries on in demo mode, as it would on screen.
+    '''
+    while sim.ticks < tick:
+        sim.step(tick - sim.ticks, dt)
+        sim.game_over = False
+
+
+def replay(sim, log, dt):
+    '''
+        Feed the logged inputs to a freshly set up simulation at the
+        ticks they happened, and return the hash of the state it ends
+        in.  Compare that against log.final_hash.
+    '''
+    for tick, kind, player, x, y in log.events():
+        run_to(sim, tick, dt)
+        sim.apply_input(kind, player, x, y)
+
+    run_to(sim, log.end_tick, dt)
+
+    return sim.state_hash()
@@ -0,0 +1,170 @@
+'''
+    Runs a game's FixedTimestep from the Clock only as often as it needs.
+
+    A game that is running gets called every frame.  When it is idle,
+    like when the start modal is up over the demo, it is only called
+    idle_rate times a second, and only runs idle_steps physics steps
+    each time, so the demo carries on in slow motion for a fraction of
+    the CPU.  When it is suspended, like when the app is in the
+    background on Android, it isn't called at all.  The physics ticks it
+    would have run are counted as skipped, along with any the timestep
+    had to drop because it fell behind.
+
+    The game tells us when to idle, suspend and wake.  It can also let
+    us go idle on our own after idle_after seconds without any input,
+    for games where nothing moves unless you touch it.  Then any touch
+    or key press wakes us straight back up.  An idle_rate of 0 means
+    suspend instead of idling.
+'''
+from timeit import default_timer
+
+from kivy.clock import Clock
+
+from gamelib.profiler import NULL_PROFILER
+
+
+class TickScheduler(object):
+    '''
+        Use it in place of scheduling the timestep with the Clock:
+
+            scheduler = TickScheduler(FixedTimestep(game.update, game.render))
+            scheduler.start()
+    '''
+    RUNNING = 'running'
+    IDLE = 'idle'
+    SUSPENDED = 'suspended'
+
+    def __init__(self, timestep, idle_rate=10.0, idle_after=None,
+                 idle_steps=1):
+        self.timestep = timestep
+        self.idle_rate = idle_rate
+        self.idle_after = idle_after
+        self.idle_steps = idle_steps
+        self.max_steps = timestep.max_steps
+        self.profiler = NULL_PROFILER
+
+        self.state = None
+        self.event = None
+        # true when the game asked for the state we are in, so input
+        # doesn't wake us
+        self.held = False
+        self.last_input = default_timer()
+        self.suspended_at = None
+        self.suspended_ticks = 0
+
+    def start(self):
+        # Importing the Window makes it, so we leave that until we are
+        # started, or it would count as import time.
+        from kivy.core.window import Window
+
+        Window.bind(on_touch_down=self.on_input,
+                    on_touch_move=self.on_input,
+                    on_key_down=self.on_input)
+        self.wake()
+
+    def stop(self):
+        from kivy.core.window import Window
+
+        Window.unbind(on_touch_down=self.on_input,
+                      on_touch_move=self.on_input,
+                      on_key_down=self.on_input)
+
+        if self.state == self.SUSPENDED:
+            self.suspended_ticks += self.ticks_since(self.suspended_at)
+            self.suspended_at = None
+
+        self.schedule(None, None)
+
+    def wake(self):
+        '''
+            Back to full speed, from the next frame.
+        '''
+        self.held = False
+        self.last_input = default_timer()
+
+        if self.state == self.RUNNING:
+            return
+
+        if self.state == self.SUSPENDED:
+            skipped = self.ticks_since(self.suspended_at)
+            self.suspended_ticks += skipped
+            self.profiler.count('skipped_ticks', skipped)
+            self.suspended_at = None
+
+            # forget the time we were away, rather than catching up
+            self.timestep.reset()
+
+        self.timestep.max_steps = self.max_steps
+        self.schedule(self.RUNNING, 0)
+
+    def idle(self, hold=True):
+        if self.idle_rate <= 0:
+            self.suspend(hold)
+            return
+
+        self.held = hold
+
+        if self.state == self.SUSPENDED:
+            self.wake()
+            self.held = hold
+
+        if self.state != self.IDLE:
+            # The timestep drops the steps it doesn't get to, like it
+            # does when it falls behind.
+            self.timestep.max_steps = self.idle_steps
+            self.schedule(self.IDLE, 1.0 / self.idle_rate)
+
+    def suspend(self, hold=True):
+        self.held = hold
+
+        if self.state != self.SUSPENDED:
+            self.schedule(self.SUSPENDED, None)
+            self.suspended_at = default_timer()
+
+    def schedule(self, state, interval):
+        if self.event is not None:
+            self.event.cancel()
+            self.event = None
+
+        if interval is not None:
+            self.event = Clock.schedule_interval(self.tick, interval)
+
+        self.state = state
+
+    def tick(self, frame_dt):
+        if (self.state == self.RUNNING and self.idle_after is not None and
+                default_timer() - self.last_input > self.idle_after):
+            self.idle(hold=False)
+
+        timestep = self.timestep
+        timestep(frame_dt)
+
+        if timestep.last_dropped_time:
+            self.profiler.count('skipped_ticks', int(round(
+                timestep.last_dropped_time * timestep.rate)))
+
+    def on_input(self, *_args):
+        self.last_input = default_timer()
+
+        if self.state != self.RUNNING and not self.held:
+            self.wake()
+
+    def ticks_since(self, start):
+        return int((default_timer() - start) * self.timestep.rate)
+
+    @property
+    def skipped_ticks(self):
+        skipped = self.suspended_ticks + int(round(
+            self.timestep.dropped_time * self.timestep.rate))
+
+        if self.state == self.SUSPENDED:
+            skipped += self.ticks_since(self.suspended_at)
+
+        return skipped
+
+    def stats(self):
+        stats = self.timestep.stats()
+        stats['state'] = self.state
+        stats['skipped_ticks'] = self.skipped_ticks
+
+        return stats
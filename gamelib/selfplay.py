@@ -0,0 +1,159 @@
+'''
+    Run lots of headless games in parallel, for tuning the demo AI.
+
+    A game provides a play_game(params, seed) function that plays one
+    whole game without a window and returns a dict of results, with at
+    least:
+
+        won             did the player we're tuning win
+        paddle_hits     how many times the ball was hit
+        serves          how many times the ball was served
+        ticks           how long the game went on
+
+    sweep() plays the same set of seeds for every set of parameters, so
+    the parameters are compared on the same serves.  The games are
+    split into chunks and handed out to a pool of processes.  Each
+    chunk is a good number of games, and the only thing that comes back
+    from a worker is a small dict per game, so the pool spends nearly
+    all of its time simulating and the throughput goes up about
+    linearly with the number of cores.
+
+    play_game needs to be a module level function, so it can be sent
+    to the worker processes.
+'''
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+def play_games(play_game, params, seeds):
+    return [play_game(params, seed) for seed in seeds]
+
+
+def chunks(games, seed, chunk_size):
+    for start in range(0, games, chunk_size):
+        yield list(range(seed + start, seed + min(games, start + chunk_size)))
+
+
+def sweep(play_game, param_sets, games=1000, seed=0, workers=None,
+          chunk_size=50):
+    '''
+        Play games with each of the param_sets, and return a summary()
+        for each one, and the time it all took.  With workers=1 we don't
+        bother with a process pool.
+    '''
+    results = [[] for _params in param_sets]
+    start = time.time()
+
+    if workers == 1:
+        for i, params in enumerate(param_sets):
+            for seeds in chunks(games, seed, chunk_size):
+                results[i].extend(play_games(play_game, params, seeds))
+    else:
+        with ProcessPoolExecutor(workers) as executor:
+            futures = {}
+
+            for i, params in enumerate(param_sets):
+                for seeds in chunks(games, seed, chunk_size):
+                    future = executor.submit(play_games, play_game,
+                                             params, seeds)
+                    futures[future] = i
+
+            for future in as_completed(futures):
+                results[futures[future]].extend(future.result())
+
+    elapsed = time.time() - start
+
+    return ([summary(params, r) for params, r in zip(param_sets, results)],
+            elapsed)
+
+
+def summary(params, results):
+    games = len(results)
+    serves = sum(r['serves'] for r in results)
+
+    return {'params': params,
+            'games': games,
+            'win_rate': sum(1 for r in results if r['won']) / float(games),
+            'rally_length': (sum(r['paddle_hits'] for r in results) /
+                             float(max(serves, 1))),
+            'ticks': sum(r['ticks'] for r in results) / float(games)}
+
+
+def print_report(summaries, elapsed, workers=None):
+    names = sorted(summaries[0]['params'])
+
+    print(' '.join('{:>14}'.format(name) for name in names) +
+          '  {:>8} {:>8} {:>8}'.format('win rate', 'rally', 'ticks'))
+
+    for s in summaries:
+        print(' '.join('{:>14}'.format(s['params'][name]) for name in names) +
+              '  {:8.1%} {:8.2f} {:8.0f}'.format(s['win_rate'],
+                                                 s['rally_length'],
+                                                 s['ticks']))
+
+    games = sum(s['games'] for s in summaries)
+    print('{} games in {:.2f} s, {:.0f} games/s ({} workers)'.format(
+        games, elapsed, games / elapsed, workers or 'all'))
+
+
+def grid(**values):
+    '''
+        Every combination of the values, as a list of param dicts.
+
+            grid(a=[1, 2], b=[3]) == [{'a': 1, 'b': 3}, {'a': 2, 'b': 3}]
+    '''
+    param_sets = [{}]
+
+    for name in sorted(values):
+        param_sets = [dict(params, **{name: value})
+                      for params in param_sets
+                      for value in values[name]]
+
+    return param_sets
+
+
+def floats(text):
+    return [float(value) for value in text.split(',')]
+
+
+def names(text):
+    return text.split(',')
+
+
+def add_arguments(parser):
+    '''
+        The command line options every self-play runner has.
+    '''
+    parser.add_argument('--games', type=int, default=1000,
+                        help='games per set of parameters')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the first game')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='worker processes (default: one per core)')
+    parser.add_argument('--scaling', action='store_true',
+                        help='time the sweep with 1, 2, 4... workers')
+
+
+def run(args, play_game, param_sets):
+    if not args.scaling:
+        summaries, elapsed = sweep(play_game, param_sets, args.games,
+                                   args.seed, args.workers)
+        print_report(summaries, elapsed, args.workers)
+        return
+
+    games = args.games * len(param_sets)
+    max_workers = args.workers or os.cpu_count() or 1
+    workers, base = 1, None
+
+    while True:
+        _summaries, elapsed = sweep(play_game, param_sets, args.games,
+                                    args.seed, workers)
+        base = base or elapsed
+        print('{:3} workers: {:8.0f} games/s, {:5.2f}x'.format(
+            workers, games / elapsed, base / elapsed))
+
+        if workers >= max_workers:
+            break
+
+        workers = min(workers * 2, max_workers)
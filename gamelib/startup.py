@@ -0,0 +1,128 @@
+'''
+    Timing how long a game takes to start, up to its first frame.
+
+    The clock starts when this module is imported, so a game imports it
+    before anything else, even Kivy.  An App that mixes in TimedStartup
+    then marks the end of each phase of its startup:
+
+        import       importing everything and making the App
+        kv           parsing the App's kv file
+        window       creating the window
+        build        building the game, up to on_start
+        first_frame  drawing the first frame and showing it
+
+    The times are always kept, in app.startup.  They are logged when the
+    first frame is up if the GAME_STARTUP environment variable is set:
+
+        GAME_STARTUP=1              log the times
+        GAME_STARTUP=startup.json   and save them to a JSON file
+
+    With GAME_STARTUP_EXIT=1 as well, the game quits right after its
+    first frame, which is how run_startup.py times the games.
+'''
+import json
+import os
+from collections import OrderedDict
+from timeit import default_timer
+
+
+STARTED = default_timer()
+
+
+class StartupTimer(object):
+    '''
+        Call mark(name) at the end of each phase.  The time since the
+        last mark (or since we were imported) goes to that phase.
+    '''
+    def __init__(self, started=STARTED):
+        self.started = started
+        self.last = started
+        self.phases = OrderedDict()
+
+    def mark(self, name):
+        now = default_timer()
+        self.phases[name] = self.phases.get(name, 0.0) + now - self.last
+        self.last = now
+
+    @property
+    def total(self):
+        return self.last - self.started
+
+    def results(self):
+        results = OrderedDict(self.phases)
+        results['total'] = self.total
+
+        return results
+
+    def report(self):
+        return '\n'.join('{:>12} {:8.1f} ms'.format(name, seconds * 1e3)
+                         for name, seconds in self.results().items())
+
+    def save(self, filename):
+        with open(filename, 'w') as f:
+            json.dump(self.results(), f, indent=2)
+
+
+def on_first_frame(callback):
+    '''
+        Call callback() once, right after the next frame is drawn and
+        shown.  Work that can wait until the game is on the screen can
+        go here.
+    '''
+    from kivy.core.window import Window
+
+    def flipped(*_args):
+        Window.unbind(on_flip=flipped)
+        callback()
+
+    Window.bind(on_flip=flipped)
+
+
+class TimedStartup(object):
+    '''
+        Mixin for an App, to time its startup.  It has to come before
+        App in the bases:
+
+            class BreakoutApp(TimedStartup, App):
+    '''
+    startup = None
+
+    def load_kv(self, *args, **kwargs):
+        from kivy.base import EventLoop
+
+        self.startup = StartupTimer()
+        self.startup.mark('import')
+        loaded = super(TimedStartup, self).load_kv(*args, **kwargs)
+        self.startup.mark('kv')
+
+        # The App would make the window after build(), but making it
+        # here lets us time it on its own.
+        EventLoop.ensure_window()
+        self.startup.mark('window')
+
+        return loaded
+
+    def on_start(self):
+        self.startup.mark('build')
+        on_first_frame(self.first_frame_shown)
+
+        super(TimedStartup, self).on_start()
+
+    def first_frame_shown(self):
+        from kivy.clock import Clock
+        from kivy.logger import Logger
+
+        self.startup.mark('first_frame')
+        setting = os.environ.get('GAME_STARTUP', '')
+
+        if setting not in ('', '0'):
+            Logger.info('Startup: time to first frame\n' +
+                        self.startup.report())
+
+            if setting.endswith('.json'):
+                self.startup.save(setting)
+
+        if os.environ.get('GAME_STARTUP_EXIT', '') not in ('', '0'):
+            # on the next frame, after anything else that was waiting
+            # for the first one
+            Clock.schedule_once(self.stop)
@@ -0,0 +1,80 @@
+'''
+    Checks of the box math in geometry.py, and that the batch functions
+    agree with the scalar ones.  Run them from the top of the repository
+    with:
+
+        > python -m pytest gamelib/test_geometry.py
+'''
+import numpy as np
+import pytest
+
+from gamelib.geometry import (bounce_vector, bounce_vectors, surface_normal,
+                              surface_normals, surface_point, surface_points)
+
+
+BOX = (10.0, 20.0, 30.0, 25.0)
+
+
+def sample_points(count=500, seed=0):
+    # around and inside the box, plus the corners, edges and center
+    rng = np.random.RandomState(seed)
+    xs = np.concatenate([rng.uniform(0.0, 40.0, count),
+                         [10.0, 30.0, 20.0, 10.0, 20.0]])
+    ys = np.concatenate([rng.uniform(10.0, 35.0, count),
+                         [20.0, 25.0, 22.5, 22.0, 25.0]])
+
+    return xs, ys
+
+
+def test_surface_point():
+    # outside, the closest point; inside, the point on the nearest side
+    assert surface_point(*BOX, x=5.0, y=22.0) == (10.0, 22.0)
+    assert surface_point(*BOX, x=35.0, y=30.0) == (30.0, 25.0)
+    assert surface_point(*BOX, x=20.0, y=24.0) == (20.0, 25.0)
+
+
+def test_surface_normal_points_out():
+    assert surface_normal(*BOX, x=5.0, y=22.0) == (-1.0, 0.0)
+    assert surface_normal(*BOX, x=20.0, y=21.0) == (0.0, -1.0)
+    assert surface_normal(*BOX, x=20.0, y=25.0) == (0.0, 0.0)
+
+
+def test_bounce_vector():
+    # off the top, and square into a corner
+    assert bounce_vector(*BOX, x=20.0, y=26.0,
+                         v_x=3.0, v_y=-4.0) == pytest.approx((3.0, 4.0))
+    assert bounce_vector(*BOX, x=9.0, y=19.0,
+                         v_x=1.0, v_y=1.0) == pytest.approx((-1.0, -1.0))
+
+
+def test_batch_matches_scalar():
+    xs, ys = sample_points()
+    vxs = np.linspace(-5.0, 5.0, len(xs))
+    vys = np.linspace(4.0, -6.0, len(xs))
+
+    s_x, s_y = surface_points(*BOX, x=xs, y=ys)
+    n_x, n_y = surface_normals(*BOX, x=xs, y=ys)
+    b_x, b_y = bounce_vectors(*BOX, x=xs, y=ys, v_x=vxs, v_y=vys)
+
+    for i in range(len(xs)):
+        args = BOX + (xs[i], ys[i])
+
+        assert (s_x[i], s_y[i]) == surface_point(*args)
+        assert (n_x[i], n_y[i]) == pytest.approx(surface_normal(*args))
+        assert (b_x[i], b_y[i]) == pytest.approx(
+            bounce_vector(*args, v_x=vxs[i], v_y=vys[i]))
+
+
+def test_batch_of_boxes():
+    xs, ys = sample_points(50)
+    lefts = np.linspace(0.0, 20.0, len(xs))
+    bottoms = np.full(len(xs), 15.0)
+    boxes = (lefts, bottoms, lefts + 8.0, bottoms + 15.0)
+
+    n_x, n_y = surface_normals(*boxes, x=xs, y=ys)
+
+    for i in range(len(xs)):
+        box = tuple(float(side[i]) for side in boxes)
+
+        assert (n_x[i], n_y[i]) == pytest.approx(
+            surface_normal(*box, x=xs[i], y=ys[i]))
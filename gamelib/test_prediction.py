@@ -0,0 +1,74 @@
+'''
+    Checks of the ball prediction in prediction.py.  Run them from the
+    top of the repository with:
+
+        > python -m pytest gamelib/test_prediction.py
+'''
+from collections import namedtuple
+
+import pytest
+
+from gamelib.prediction import (BallPredictor, fold, predict_crossing,
+                                step_towards)
+
+
+Ball = namedtuple('Ball', 'velocity_x velocity_y')
+
+
+@pytest.mark.parametrize('position, expected', [
+    (5.0, 5.0),         # between the walls
+    (12.0, 8.0),        # off the upper wall
+    (-3.0, 3.0),        # off the lower wall
+    (25.0, 5.0),        # off both, and back again
+    (-17.0, 3.0),
+    (10.0, 10.0),
+])
+def test_fold(position, expected):
+    assert fold(position, 0.0, 10.0) == pytest.approx(expected)
+
+
+def test_fold_with_no_room():
+    assert fold(7.0, 3.0, 3.0) == 3.0
+
+
+def test_predict_crossing():
+    # 10 along to the line at 2 a second, drifting 3 a second across
+    # between walls at 0 and 10, so 15 across folds back to 5
+    t, across = predict_crossing(0.0, 0.0, 2.0, 3.0, 10.0, 0.0, 10.0)
+
+    assert t == pytest.approx(5.0)
+    assert across == pytest.approx(5.0)
+
+    # the same coming the other way
+    t, across = predict_crossing(10.0, 0.0, -2.0, 3.0, 0.0, 0.0, 10.0)
+
+    assert t == pytest.approx(5.0)
+    assert across == pytest.approx(5.0)
+
+
+def test_predict_crossing_never():
+    # moving away from the line, and not moving towards it at all
+    assert predict_crossing(0.0, 5.0, -1.0, 1.0, 10.0, 0.0, 10.0) is None
+    assert predict_crossing(0.0, 5.0, 0.0, 1.0, 10.0, 0.0, 10.0) is None
+
+
+def test_step_towards():
+    assert step_towards(0.0, 10.0, 3.0) == 3.0
+    assert step_towards(9.0, 10.0, 3.0) == 10.0
+    assert step_towards(10.0, 0.0, 3.0) == 7.0
+    assert step_towards(1.0, 0.0, 3.0) == 0.0
+
+
+def test_predictor_only_solves_when_the_velocity_changes():
+    predictor = BallPredictor(lambda ball: ball.velocity_x * 2)
+
+    assert predictor.target_for(Ball(1.0, 2.0)) == 2.0
+    assert predictor.target_for(Ball(1.0, 2.0)) == 2.0
+    assert predictor.solves == 1
+
+    assert predictor.target_for(Ball(3.0, 2.0)) == 6.0
+    assert predictor.solves == 2
+
+    predictor.reset()
+    predictor.target_for(Ball(3.0, 2.0))
+    assert predictor.solves == 3
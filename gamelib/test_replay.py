@@ -0,0 +1,85 @@
+'''
+    Checks of the replay files in replay.py.  Run them from the top of
+    the repository with:
+
+        > python -m pytest gamelib/test_replay.py
+'''
+import pytest
+
+from gamelib.replay import (HEADER, MAGIC, MOVE, RESIZE, InputLog,
+                            hash_values, replay)
+
+
+class CounterSim(object):
+    '''
+        A tiny deterministic simulation: a total that every input moves,
+        and that grows by the player number each tick.
+    '''
+    def __init__(self):
+        self.ticks = 0
+        self.game_over = False
+        self.player = 1
+        self.total = 0.0
+
+    def step(self, n, dt):
+        for _ in range(n):
+            self.total += self.player * dt
+            self.ticks += 1
+
+    def apply_input(self, kind, player, x, y):
+        self.player = player
+        self.total += kind * x - y
+
+    def state_hash(self):
+        return hash_values(self.ticks, self.total)
+
+
+def test_save_and_load(tmp_path):
+    filename = str(tmp_path / 'game.rply')
+    log = InputLog(7, {'width': 800, 'predictive': True})
+    log.record(3, MOVE, 1, 120.5, 0.25)
+    log.record(9, RESIZE, 0, 640.0, 480.0)
+    log.end_tick = 20
+    log.final_hash = 'abc'
+    log.save(filename)
+
+    loaded = InputLog.load(filename)
+
+    assert loaded.seed == 7
+    assert loaded.setup == {'width': 800, 'predictive': True}
+    assert (loaded.end_tick, loaded.final_hash) == (20, 'abc')
+    assert list(loaded.events()) == list(log.events())
+    assert len(loaded) == 2
+
+
+def test_load_rejects_other_files(tmp_path):
+    filename = str(tmp_path / 'game.rply')
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, 99, 0))
+
+    with pytest.raises(ValueError):
+        InputLog.load(filename)
+
+
+def test_replay_ends_in_the_same_state():
+    log = InputLog()
+    sim = CounterSim()
+
+    for tick, player, x in [(2, 2, 1.5), (5, 3, -4.0), (5, 1, 2.0)]:
+        sim.step(tick - sim.ticks, 0.5)
+        log.record(tick, MOVE, player, x)
+        sim.apply_input(MOVE, player, x, 0.0)
+
+    sim.step(4, 0.5)
+    log.finish(sim)
+
+    assert log.end_tick == 9
+    assert replay(CounterSim(), log, 0.5) == log.final_hash
+    assert replay(CounterSim(), log, 0.25) != log.final_hash
+
+
+def test_hash_values():
+    assert hash_values(1, 2.0, b'ab') == hash_values(1.0, 2, b'ab')
+    assert hash_values(1, 2) != hash_values(2, 1)
+    assert hash_values(b'ab') != hash_values(b'ba')
@@ -0,0 +1,88 @@
+'''
+    A fixed timestep game loop driver.
+
+    Kivy calls us every frame with however much time has passed, and we
+    run the physics in fixed steps of 1/rate seconds to catch up.  So the
+    game runs at the same speed no matter what the frame rate is.
+    Whatever time is left over that doesn't make a whole step is used to
+    interpolate the rendered positions between the last two steps.
+'''
+
+
+class FixedTimestep(object):
+    '''
+        Use an instance as the Clock callback:
+
+            timestep = FixedTimestep(game.step, game.render, rate=60.0)
+            Clock.schedule_interval(timestep, 0)
+
+        step(dt) is called zero or more times per frame with the fixed
+        dt, and then render(alpha) once, with alpha in [0, 1) telling how
+        far we are between the previous step and the current one.
+    '''
+    def __init__(self, step, render=None, rate=60.0, max_steps=5):
+        self.step = step
+        self.render = render
+        self.rate = rate
+        self.max_steps = max_steps
+        self.accumulator = 0.0
+        self.reset_stats()
+
+    @property
+    def rate(self):
+        return 1.0 / self.dt
+
+    @rate.setter
+    def rate(self, value):
+        self.dt = 1.0 / value
+
+    def reset_stats(self):
+        self.frames = 0
+        self.steps = 0
+        self.last_steps = 0
+        self.capped_frames = 0
+        self.dropped_time = 0.0
+        self.last_dropped_time = 0.0
+
+    def reset(self):
+        '''
+            Forget any time we haven't simulated yet, like after a pause.
+        '''
+        self.accumulator = 0.0
+
+    def __call__(self, frame_dt):
+        self.accumulator += frame_dt
+        steps = 0
+
+        while self.accumulator >= self.dt and steps < self.max_steps:
+            self.step(self.dt)
+            self.accumulator -= self.dt
+            steps += 1
+
+        dropped = 0.0
+        if self.accumulator >= self.dt:
+            # We can't catch up within our budget of steps.  Rather than
+            # spiral further behind each frame, we let the game slow down
+            # and throw the whole steps away.
+            dropped = self.accumulator - self.accumulator % self.dt
+            self.accumulator -= dropped
+            self.capped_frames += 1
+
+        self.frames += 1
+        self.steps += steps
+        self.last_steps = steps
+        self.dropped_time += dropped
+        self.last_dropped_time = dropped
+
+        if self.render is not None:
+            self.render(self.accumulator / self.dt)
+
+    def stats(self):
+        return {'frames': self.frames,
+                'steps': self.steps,
+                'last_steps': self.last_steps,
+                'steps_per_frame': (float(self.steps) / self.frames
+                                    if self.frames else 0.0),
+                'capped_frames': self.capped_frames,
+                'dropped_time': self.dropped_time,
+                'last_dropped_time': self.last_dropped_time}
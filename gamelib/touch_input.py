@@ -0,0 +1,113 @@
+'''
+    Touch moves, coalesced into one move per physics tick.
+
+    Touch panels can send motion events several times a frame.  Instead
+    of moving a paddle on every one of them, we keep the last position
+    of each touch and add up how far it moved, per target (like a
+    paddle), until the next physics tick takes the net move all at once.
+
+    We also time how long every motion event waited before the physics
+    saw it, in a LatencyHistogram.
+'''
+from bisect import bisect_left
+from collections import OrderedDict
+from timeit import default_timer
+
+from gamelib.profiler import NULL_PROFILER
+
+
+class LatencyHistogram(object):
+    '''
+        Counts of latencies in buckets, with upper edges in milliseconds.
+        The last bucket is for everything longer than the last edge.
+    '''
+    edges = (1, 2, 4, 8, 16, 33, 66, 100)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.edges) + 1)
+        self.total = 0.0
+        self.worst = 0.0
+
+    def add(self, seconds):
+        self.counts[bisect_left(self.edges, seconds * 1e3)] += 1
+        self.total += seconds
+        self.worst = max(self.worst, seconds)
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def report(self):
+        labels = ['<= {} ms'.format(edge) for edge in self.edges]
+        labels.append('> {} ms'.format(self.edges[-1]))
+        lines = ['{:>10} {:>7}'.format(label, count)
+                 for label, count in zip(labels, self.counts)]
+
+        if self.count:
+            lines.append('mean {:.2f} ms, worst {:.2f} ms'.format(
+                self.total / self.count * 1e3, self.worst * 1e3))
+
+        return '\n'.join(lines)
+
+
+class TouchCoalescer(object):
+    '''
+        Feed it the touches, with down(), move() and up(), and call
+        pop_moves() once per physics tick to get the net move of each
+        target since the last tick.  A target can be anything hashable,
+        like the paddle a touch is steering.
+    '''
+    def __init__(self):
+        self.positions = {}
+        # target -> [net move, times of the moves]
+        self.pending = OrderedDict()
+        self.latency = LatencyHistogram()
+        self.profiler = NULL_PROFILER
+
+    def down(self, touch_id, position):
+        self.positions[touch_id] = position
+
+    def move(self, touch_id, position, target=None):
+        '''
+            The touch moved to position.  If it is steering a target, the
+            move is added to that target's.  We always keep the position,
+            so a touch that wanders into a target's area only moves it by
+            what it moved since.
+        '''
+        last = self.positions.get(touch_id, position)
+        self.positions[touch_id] = position
+
+        if target is None:
+            return
+
+        if target not in self.pending:
+            self.pending[target] = [0.0, []]
+
+        pending = self.pending[target]
+        pending[0] += position - last
+        pending[1].append(default_timer())
+
+    def up(self, touch_id):
+        self.positions.pop(touch_id, None)
+
+    def pop_moves(self):
+        '''
+            A list of (target, net move) since the last call, and clear
+            them out.
+        '''
+        if not self.pending:
+            return []
+
+        now = default_timer()
+        moves = []
+
+        for target, (move, times) in self.pending.items():
+            for moved_at in times:
+                self.latency.add(now - moved_at)
+                self.profiler.sample('input_latency', now - moved_at)
+
+            moves.append((target, move))
+
+        self.pending.clear()
+
+        return moves
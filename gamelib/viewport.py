@@ -0,0 +1,69 @@
+'''
+    A fixed size game area, scaled to fit whatever size the window is.
+
+    The game is laid out and simulated in its own coordinates, say 800
+    by 600, whatever the resolution of the screen.  A Viewport puts a
+    translate and a scale in front of a widget's canvas, so everything
+    drawn in it is in game coordinates, and keeps them fitted to the
+    widget as it is resized or the phone is rotated.  The game area keeps
+    its shape, centered with bars on the sides that are left over.
+
+    So a resize only changes the transform.  Nothing in the game is laid
+    out again, and the physics plays out the same at any resolution.
+    Touches still come in window coordinates, to_game() converts them.
+'''
+from kivy.graphics import PopMatrix, PushMatrix, Scale, Translate
+
+
+class Viewport(object):
+    '''
+        Attach it to the widget the game is drawn in:
+
+            viewport = Viewport(800, 600)
+            viewport.attach(game)
+    '''
+    def __init__(self, width, height):
+        self.width = float(width)
+        self.height = float(height)
+        self.scale = 1.0
+        self.offset = (0.0, 0.0)
+        self.fits = 0
+
+        self.translation = Translate()
+        self.scaling = Scale(1.0, 1.0, 1.0)
+
+    def attach(self, widget):
+        widget.canvas.before.add(PushMatrix())
+        widget.canvas.before.add(self.translation)
+        widget.canvas.before.add(self.scaling)
+        widget.canvas.after.add(PopMatrix())
+
+        widget.bind(pos=self.fit, size=self.fit)
+        self.fit(widget)
+
+    def fit(self, widget, *_args):
+        '''
+            Fit the game area to the widget, which is all a resize costs.
+        '''
+        scale = min(widget.width / self.width, widget.height / self.height)
+
+        if scale <= 0:
+            return
+
+        self.scale = scale
+        self.offset = (widget.x + (widget.width - self.width * scale) / 2.0,
+                       widget.y + (widget.height - self.height * scale) / 2.0)
+        self.translation.xy = self.offset
+        self.scaling.xyz = (scale, scale, 1.0)
+        self.fits += 1
+
+    def to_game(self, x, y):
+        '''
+            A point in window coordinates, in game coordinates.
+        '''
+        return ((x - self.offset[0]) / self.scale,
+                (y - self.offset[1]) / self.scale)
+
+    def to_window(self, x, y):
+        return (x * self.scale + self.offset[0],
+                y * self.scale + self.offset[1])
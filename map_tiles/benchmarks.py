@@ -0,0 +1,325 @@
+'''
+    Some simple benchmarks for the tile map code.
+    These don't need a window, so they can be run anywhere:
+
+        > python benchmarks.py
+
+    Building the map's chunks and flushing sprite batches need a GL
+    context, so they are only timed with the --render option.  SDL can
+    give us an offscreen window:
+
+        > SDL_VIDEODRIVER=offscreen python benchmarks.py --render
+
+    With --json <file>, the results are saved for run_benchmarks.py
+    instead of printed.
+
+    Every benchmark also checks the results of what it timed, and stops
+    with an AssertionError if they are wrong.
+'''
+import os
+import sys
+from random import Random
+from timeit import default_timer
+
+import numpy as np
+
+from gamelib.benchmark import best_of, check, save_results
+
+import map_tiles
+from navigation import Navigator, UNREACHABLE
+from tile_collision import (DOWN, EDGE_INSET, LEFT, RIGHT, UP,
+                            TileCollider)
+from tile_grid import TileGrid
+
+
+AGENT_COUNTS = (10, 100, 1000, 10000)
+SPRITE_COUNTS = (10, 100, 1000, 10000)
+
+# Kivy would otherwise try to parse our options as its own.
+os.environ.setdefault('KIVY_NO_ARGS', '1')
+
+
+def make_maze(width, height, seed=0):
+    '''
+        A big grid of corridors, with walls (tile 1) in between that
+        have random gaps in them.
+    '''
+    rng = np.random.RandomState(seed)
+    cells = np.ones((height, width), dtype=np.uint8)
+    cells[1::2, :] = 0
+    cells[:, 1::2] = 0
+    cells[rng.random_sample((height, width)) < 0.2] = 0
+
+    return TileGrid(cells)
+
+
+def walkable_cells(navigator, count, seed=0):
+    ys, xs = np.nonzero(navigator.walkable[1:-1, 1:-1])
+    picks = Random(seed).sample(range(len(xs)), min(count, len(xs)))
+
+    return xs[picks], ys[picks]
+
+
+def check_flow_field(field):
+    # Every reachable cell but the target is a step from a cell one
+    # closer to the target.
+    distance = field.distance
+    ys, xs = np.nonzero((distance > 0) & (distance < UNREACHABLE))
+    steps = field.steps(xs, ys)
+
+    check(distance[field.target[1], field.target[0]] == 0,
+          'the flow field to {} is not 0 at the target'.format(
+              field.target))
+    check(np.all(distance[ys + steps[:, 1], xs + steps[:, 0]] ==
+                 distance[ys, xs] - 1),
+          'the flow field to {} steps the wrong way'.format(field.target))
+
+
+def bench_flow_field(grids):
+    '''
+        Time to build one flow field from scratch.
+    '''
+    results = []
+
+    for name, grid in grids:
+        navigator = Navigator(grid)
+        xs, ys = walkable_cells(navigator, 5)
+        fields = []
+
+        start = default_timer()
+        for target in zip(xs, ys):
+            fields.append(navigator.build_flow_field((int(target[0]),
+                                                      int(target[1]))))
+
+        results.append((name, (default_timer() - start) / len(xs)))
+
+        for field in fields:
+            check_flow_field(field)
+
+    return results
+
+
+def bench_agents(grid, agent_counts=AGENT_COUNTS, targets=4, frames=20):
+    '''
+        Frame cost of moving agents that chase one of a few targets, with
+        the targets moving to a new cell every frame.  The fields for
+        the targets' cells are already cached, so the cost is the lookups.
+    '''
+    navigator = Navigator(grid, max_fields=64)
+    target_xs, target_ys = walkable_cells(navigator, 16, seed=1)
+    results = []
+
+    for target in zip(target_xs, target_ys):
+        navigator.flow_field((int(target[0]), int(target[1])))
+
+    for count in agent_counts:
+        xs, ys = walkable_cells(navigator, count, seed=2)
+        chasing = np.arange(len(xs)) % targets
+
+        start = default_timer()
+
+        for frame in range(frames):
+            for t in range(targets):
+                i = (frame + t) % len(target_xs)
+                field = navigator.flow_field((int(target_xs[i]),
+                                              int(target_ys[i])))
+                mine = chasing == t
+                steps = field.steps(xs[mine], ys[mine])
+                xs[mine] += steps[:, 0]
+                ys[mine] += steps[:, 1]
+
+        results.append((len(xs), (default_timer() - start) / frames))
+
+        check(np.all(navigator.walkable[ys + 1, xs + 1]),
+              'some agents walked into a wall')
+
+    return results
+
+
+def bench_box_collision(grid, sprite_counts=SPRITE_COUNTS, repeat=20):
+    '''
+        Cost of checking an array of tile sized sprites against the
+        walls in one call.
+    '''
+    tile_size = (16, 16)
+    collider = TileCollider(grid, range(1, 256), tile_size)
+    rng = np.random.RandomState(0)
+    results = []
+
+    for count in sprite_counts:
+        xs = rng.uniform(0, grid.width * tile_size[0], count)
+        ys = rng.uniform(0, grid.height * tile_size[1], count)
+        start = default_timer()
+
+        for _i in range(repeat):
+            blocked, pushes = collider.boxes(xs, ys, 14, 14)
+
+        results.append((count, (default_timer() - start) / repeat))
+
+        # A box with a corner in a wall is blocked.  One with walls all
+        # around it (including where boxes() looks just outside the
+        # left and bottom) is stuck, so it is blocked every way and not
+        # pushed at all.
+        corners = [collider.points(xs + dx, ys + dy)
+                   for dx in (EDGE_INSET, 14 - EDGE_INSET)
+                   for dy in (EDGE_INSET, 14 - EDGE_INSET)]
+        around = [collider.points(xs + dx, ys + dy)
+                  for dx in (-EDGE_INSET, 14) for dy in (-EDGE_INSET, 14)]
+        stuck = np.all(around, axis=0)
+        check(np.all(blocked[np.any(corners, axis=0)] != 0),
+              'boxes() missed a box in a wall')
+        check(np.all(blocked[stuck] == RIGHT | UP | LEFT | DOWN) and
+              not pushes[stuck].any(), 'boxes() moved a stuck box')
+
+    return results
+
+
+def bench_create_map_tiles(grids, view_size=(448, 576), repeat=3):
+    '''
+        Time to show a fresh map, which builds every chunk in view.
+        Bigger maps shouldn't cost more, only the view size should.
+    '''
+    from kivy.base import EventLoop
+    from main import TileMap
+
+    EventLoop.ensure_window()
+    results = []
+
+    for name, grid in grids:
+        best = None
+
+        for _i in range(repeat):
+            tile_map = TileMap(atlas_file='map_tiles.atlas',
+                               tile_grid=grid, size=view_size)
+            start = default_timer()
+            tile_map.create_map_tiles((0, 0))
+            elapsed = default_timer() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        check(list(tile_map.chunks) == tile_map.visible_chunks(),
+              'create_map_tiles() built the wrong chunks')
+        results.append((name, best))
+
+    return results
+
+
+def bench_sprite_batch(sprite_counts=SPRITE_COUNTS, moving=0.1,
+                       repeat=20):
+    '''
+        Frame cost of moving sprites and flushing their batch, with only
+        a fraction of them moving (so only those are dirty), and with
+        all of them moving.
+    '''
+    from kivy.atlas import Atlas
+    from kivy.base import EventLoop
+    from sprite_batch import SpriteBatch
+    from tile_layer import UVTable
+
+    EventLoop.ensure_window()
+    uv_table = UVTable(Atlas('map_tiles.atlas'))
+    rng = np.random.RandomState(0)
+    results = []
+
+    for count in sprite_counts:
+        batch = SpriteBatch(uv_table, capacity=count)
+        for x, y in rng.uniform(0, 448, (count, 2)):
+            batch.add(x, y, frame=29)
+        batch.flush()
+
+        some = rng.choice(count, max(1, int(count * moving)), replace=False)
+        every = np.arange(count)
+
+        def run(indices):
+            xs = batch.pos[indices, 0] + 1
+            batch.move(indices, xs, batch.pos[indices, 1])
+            batch.flush()
+
+        results.append((count, best_of(lambda: run(some), repeat),
+                        best_of(lambda: run(every), repeat)))
+
+        # the first corner of every quad is at its sprite's position
+        quads = batch.vertices.reshape(count, 4, -1)
+        check(not batch.dirty.any() and
+              np.array_equal(quads[:, 0, :2], batch.pos),
+              'flush() left sprites out of place')
+
+    return results
+
+
+def make_grids():
+    return [('28x36 map', TileGrid.from_rows(map_tiles.map_array)),
+            ('256x256 maze', make_maze(256, 256)),
+            ('1024x1024 maze', make_maze(1024, 1024))]
+
+
+def suite(render=False):
+    '''
+        All of the benchmarks as a flat dict of times in seconds.
+    '''
+    grids = make_grids()
+    results = {}
+
+    def key(name):
+        return name.split()[0]
+
+    for name, seconds in bench_flow_field(grids):
+        results['flow_field.' + key(name)] = seconds
+
+    for count, seconds in bench_agents(grids[1][1]):
+        results['agents.{}'.format(count)] = seconds
+
+    for count, seconds in bench_box_collision(grids[1][1]):
+        results['box_collision.{}'.format(count)] = seconds
+
+    if render:
+        for name, seconds in bench_create_map_tiles(grids):
+            results['create_map_tiles.' + key(name)] = seconds
+
+        for count, some, every in bench_sprite_batch():
+            results['sprite_batch.dirty.{}'.format(count)] = some
+            results['sprite_batch.all.{}'.format(count)] = every
+
+    return results
+
+
+def main():
+    if '--json' in sys.argv:
+        filename = sys.argv[sys.argv.index('--json') + 1]
+        save_results(suite('--render' in sys.argv), filename)
+        return
+
+    grids = make_grids()
+
+    print('flow field build (milliseconds)')
+    for name, seconds in bench_flow_field(grids):
+        print('{:>16} {:>10.2f}'.format(name, seconds * 1e3))
+
+    print('')
+    print('agents chasing 4 targets on the 256x256 maze, per frame')
+    print('{:>10} {:>12}'.format('agents', 'ms'))
+    for count, seconds in bench_agents(grids[1][1]):
+        print('{:>10} {:>12.3f}'.format(count, seconds * 1e3))
+
+    print('')
+    print('sprite boxes checked against the walls, per call')
+    print('{:>10} {:>12}'.format('sprites', 'ms'))
+    for count, seconds in bench_box_collision(grids[1][1]):
+        print('{:>10} {:>12.3f}'.format(count, seconds * 1e3))
+
+    if '--render' in sys.argv:
+        print('')
+        print('create_map_tiles on a fresh map (milliseconds)')
+        for name, seconds in bench_create_map_tiles(grids):
+            print('{:>16} {:>10.2f}'.format(name, seconds * 1e3))
+
+        print('')
+        print('sprite batch move and flush, per frame (milliseconds)')
+        print('{:>10} {:>12} {:>12}'.format('sprites', '10% moving',
+                                            'all moving'))
+        for count, some, every in bench_sprite_batch():
+            print('{:>10} {:>12.3f} {:>12.3f}'.format(count, some * 1e3,
+                                                      every * 1e3))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,11 @@
+# This comes first, so that the startup timing covers the imports.
+from gamelib.startup import TimedStartup
+
+from collections import OrderedDict
+from colorsys import hsv_to_rgb
+
+import numpy as np
+
 import kivy
 kivy.require('1.10.0')  # replace with your current kivy version !
 
@@ -5,79 +13,417 @@ from kivy.base import EventLoop
 from kivy.app import App
 from kivy.clock import Clock
 
-from kivy.properties import ObjectProperty
+from kivy.properties import ObjectProperty, NumericProperty
 
 from kivy.uix.widget import Widget
 
-from kivy.graphics import Rectangle
+from kivy.graphics import (Rectangle, InstructionGroup, Translate, Color,
+                           Fbo, ClearColor, ClearBuffers,
+                           PushMatrix, PopMatrix)
 from kivy.atlas import Atlas
 
+from gamelib.scheduler import TickScheduler
+from gamelib.timestep import FixedTimestep
+
 import map_tiles
+from navigation import Navigator, UNREACHABLE
+from sprite_batch import SpriteBatch
+from tile_collision import TileCollider
+from tile_grid import TileGrid
+from tile_layer import UVTable, TileChunk
 
 
 class TileMap(Widget):
+    '''
+        A scrollable tiled map.
+
+        The map is split into square chunks of tiles.  A chunk is only
+        built when it scrolls into view, and the chunks that have been
+        out of view the longest are thrown away once we have more than
+        max_chunks of them.  So the cost of the map depends on the size
+        of the view, not on the size of the map.
+
+        The chunks are drawn into an Fbo, and the Fbo texture is what
+        we show.  The Fbo is only redrawn when we scroll or a tile
+        changes, so an unchanged frame is a single textured quad.
+        Changing a tile with set_value() only patches that tile's
+        vertices, on the next frame.
+    '''
     atlas = None
-    tiles = []
+    tile_size = (8, 8)
+    tile_scale = 2
+    chunk_size = 64  # in tiles
+    max_chunks = 64
+
+    # Build each chunk as a single Mesh, instead of a Rectangle per tile.
+    use_tile_mesh = True
+
+    # a Navigator and TileCollider over our tile grid, if anybody
+    # needs them
+    navigator = None
+    collider = None
+
+    scroll_x = NumericProperty(0)
+    scroll_y = NumericProperty(0)
 
     def __init__(self, **kwargs):
         atlas_file = kwargs.pop('atlas_file')
         self.atlas = Atlas(atlas_file)
-        self.map_array = kwargs.pop('map_array')
-        self.map_array.reverse()
+        tile_grid = kwargs.pop('tile_grid', None)
+
+        if tile_grid is None:
+            tile_grid = TileGrid.from_rows(kwargs.pop('map_array'))
+
+        self.tile_grid = tile_grid
+        self.uv_table = UVTable(self.atlas)
 
         super(TileMap, self).__init__(**kwargs)
 
-    def create_map_tiles(self, tile_pos):
+        self.chunks = OrderedDict()
+        self.chunks_built = 0
+        self.chunks_evicted = 0
+        self.dirty_chunks = set()
+        self.flush_trigger = Clock.create_trigger(self.flush_tiles)
+
+        self.fbo = Fbo(size=self.size)
+
+        with self.fbo:
+            ClearColor(0, 0, 0, 0)
+            ClearBuffers()
+            self.scroll_translate = Translate()
+            self.chunk_layer = InstructionGroup()
+
+        self.canvas.add(self.fbo)
+
         with self.canvas:
-            tile_size = [d * 2 for d in (8, 8)]
+            Color(1, 1, 1, 1)
+            self.fbo_rect = Rectangle(pos=self.pos, size=self.size,
+                                      texture=self.fbo.texture)
+
+            # sprite batches are drawn live over the map
+            PushMatrix()
+            self.sprite_translate = Translate()
+            self.sprite_layer = InstructionGroup()
+            PopMatrix()
+
+        self.bind(pos=self.update_viewport,
+                  size=self.update_fbo_size,
+                  scroll_x=self.update_viewport,
+                  scroll_y=self.update_viewport)
+
+    @property
+    def map_size(self):
+        ''' the size of the whole map in tiles '''
+        return self.tile_grid.size
+
+    @property
+    def tiles(self):
+        return self.tile_grid.cells
+
+    @property
+    def tile_pixels(self):
+        return [d * self.tile_scale for d in self.tile_size]
+
+    def create_map_tiles(self, tile_pos):
+        '''
+            Show the map with tile_pos (in tiles) at the bottom left of
+            our view.  Only the chunks that are in view get built.
+        '''
+        tile_w, tile_h = self.tile_pixels
+        self.scroll_to(tile_pos[0] * tile_w, tile_pos[1] * tile_h)
+        self.update_viewport()
+
+    def scroll_to(self, x, y):
+        tile_w, tile_h = self.tile_pixels
+        map_w, map_h = self.map_size
+
+        self.scroll_x = max(0, min(x, map_w * tile_w - self.width))
+        self.scroll_y = max(0, min(y, map_h * tile_h - self.height))
+
+    def on_touch_move(self, touch):
+        if self.collide_point(*touch.pos):
+            self.scroll_to(self.scroll_x - touch.dx,
+                           self.scroll_y - touch.dy)
+            return True
+
+        return super(TileMap, self).on_touch_move(touch)
+
+    def visible_chunks(self):
+        tile_w, tile_h = self.tile_pixels
+        chunk_w = tile_w * self.chunk_size
+        chunk_h = tile_h * self.chunk_size
+        map_w, map_h = self.map_size
+
+        cols = (map_w + self.chunk_size - 1) // self.chunk_size
+        rows = (map_h + self.chunk_size - 1) // self.chunk_size
+
+        col0 = max(0, int(self.scroll_x // chunk_w))
+        row0 = max(0, int(self.scroll_y // chunk_h))
+        col1 = min(cols, int((self.scroll_x + self.width) // chunk_w) + 1)
+        row1 = min(rows, int((self.scroll_y + self.height) // chunk_h) + 1)
+
+        return [(col, row)
+                for row in range(row0, row1)
+                for col in range(col0, col1)]
+
+    def update_fbo_size(self, *_args):
+        self.fbo.size = self.size
+        self.fbo_rect.texture = self.fbo.texture
+        self.fbo_rect.size = self.size
+        self.update_viewport()
+
+    def update_viewport(self, *_args):
+        self.fbo_rect.pos = self.pos
+        self.scroll_translate.xy = (-self.scroll_x, -self.scroll_y)
+        self.sprite_translate.xy = (self.x - self.scroll_x,
+                                    self.y - self.scroll_y)
+
+        visible = self.visible_chunks()
+
+        for key in visible:
+            if key in self.chunks:
+                # mark it as the most recently seen
+                self.chunks[key] = self.chunks.pop(key)
+            else:
+                self.chunks[key] = self.build_chunk(*key)
+                self.chunk_layer.add(chunk_instruction(self.chunks[key]))
+
+        # Drop the least recently seen chunks, but never one in view.
+        while len(self.chunks) > max(self.max_chunks, len(visible)):
+            key, chunk = self.chunks.popitem(last=False)
+            self.chunk_layer.remove(chunk_instruction(chunk))
+            self.dirty_chunks.discard(key)
+            self.chunks_evicted += 1
+
+    def build_chunk(self, col, row):
+        tile_w, tile_h = self.tile_pixels
+        map_w, map_h = self.map_size
+        x0, y0 = col * self.chunk_size, row * self.chunk_size
+        self.chunks_built += 1
 
-            for x in range(len(self.map_array[0])):
-                for y in range(len(self.map_array)):
-                    tile_pos = (x * 2 * 8, y * 2 * 8)
+        if self.use_tile_mesh:
+            return TileChunk(self.tiles[y0:y0 + self.chunk_size,
+                                        x0:x0 + self.chunk_size],
+                             self.uv_table, (tile_w, tile_h),
+                             origin=(x0, y0))
 
-                    try:
-                        texture = self.atlas[str(self.map_array[y][x])]
-                        Rectangle(pos=tile_pos, size=tile_size,
-                                  texture=texture)
-                    except KeyError:
-                        pass
+        chunk = InstructionGroup()
+
+        for y in range(y0, min(y0 + self.chunk_size, map_h)):
+            for x in range(x0, min(x0 + self.chunk_size, map_w)):
+                try:
+                    texture = self.atlas[str(self.tiles[y, x])]
+                    chunk.add(Rectangle(pos=(x * tile_w, y * tile_h),
+                                        size=(tile_w, tile_h),
+                                        texture=texture))
+                except KeyError:
+                    pass
+
+        return chunk
+
+    def add_sprite_batch(self, sprite_batch):
+        '''
+            Draw a SpriteBatch over the map.  The sprite positions are in
+            map pixels, so they scroll along with the map.
+        '''
+        self.sprite_layer.add(sprite_batch.context)
+
+    def remove_sprite_batch(self, sprite_batch):
+        self.sprite_layer.remove(sprite_batch.context)
+
+    def create_collider(self):
+        '''
+            Make a TileCollider that treats every tile in our atlas as a
+            wall, with positions in the pixels we draw the map at.
+        '''
+        self.collider = TileCollider.from_uv_table(self.tile_grid,
+                                                   self.uv_table,
+                                                   self.tile_pixels)
+        return self.collider
+
+    def create_navigator(self, **kwargs):
+        '''
+            Make a Navigator that walks on every tile that isn't in our
+            atlas.  Its flow fields are in tiles, not pixels.
+        '''
+        self.navigator = Navigator.from_uv_table(self.tile_grid,
+                                                 self.uv_table, **kwargs)
+        return self.navigator
 
     def map_value(self, coord):
-        try:
-            x, y = coord
-            if x < 0 or y < 0:
-                # off map, and we don't wrap
-                return 0
+        return self.tile_grid.map_value(coord)
+
+    def set_value(self, coord, value):
+        '''
+            Change the tile at coord.  If its chunk has been built, the
+            tile is marked dirty and redrawn on the next frame.
+        '''
+        self.tile_grid.set_value(coord, value)
+
+        if self.navigator is not None:
+            self.navigator.tile_changed(coord)
+
+        if self.collider is not None:
+            self.collider.tile_changed(coord)
 
-            return self.map[x][y]
-        except Exception:
-            return 0
+        x, y = coord
+        key = (x // self.chunk_size, y // self.chunk_size)
+        chunk = self.chunks.get(key)
+
+        if chunk is None:
+            # not built, so it will pick up the new tile when it is
+            return
+
+        if self.use_tile_mesh:
+            chunk.set_tile(x - key[0] * self.chunk_size,
+                           y - key[1] * self.chunk_size, value)
+
+        self.dirty_chunks.add(key)
+        self.flush_trigger()
+
+    def flush_tiles(self, *_args):
+        for key in self.dirty_chunks:
+            chunk = self.chunks[key]
+
+            if self.use_tile_mesh:
+                chunk.flush()
+            else:
+                # Rectangle chunks are just rebuilt
+                index = self.chunk_layer.indexof(chunk)
+                self.chunk_layer.remove(chunk)
+                self.chunks[key] = self.build_chunk(*key)
+                self.chunk_layer.insert(index, self.chunks[key])
+
+        self.dirty_chunks.clear()
+
+
+def chunk_instruction(chunk):
+    # the canvas instruction that draws a chunk
+    return getattr(chunk, 'mesh', chunk)
 
 
 class TileMapGame(Widget):
+    '''
+        A crowd of critters, all drawn by one SpriteBatch, that run
+        through the maze to wherever you touch, following the flow field
+        of a Navigator.
+    '''
     app = ObjectProperty(None)
 
     tile_map = None
+    critters = None
+
+    critter_count = 2000
+    critter_frame = 29
+    # physics ticks to walk from one tile to the next
+    ticks_per_tile = 8
 
     def update(self, _dt):
         if self.tile_map is None:
-            self.tile_map = TileMap(atlas_file='map_tiles.atlas',
-                                    map_array=map_tiles.map_array)
-            self.add_widget(self.tile_map)
-            self.tile_map.create_map_tiles((0, 0))
+            self.build_map()
 
+        self.move_critters()
 
-class TileMapApp(App):
+    def build_map(self):
+        self.tile_map = TileMap(atlas_file='map_tiles.atlas',
+                                map_array=map_tiles.map_array,
+                                size=self.size)
+        self.bind(size=self.tile_map.setter('size'))
+        self.add_widget(self.tile_map)
+        self.tile_map.create_map_tiles((0, 0))
+
+        navigator = self.tile_map.create_navigator()
+        rng = np.random.RandomState()
+        ys, xs = np.nonzero(navigator.walkable[1:-1, 1:-1])
+        target = rng.randint(len(xs))
+        self.field = navigator.flow_field((int(xs[target]),
+                                           int(ys[target])))
+
+        # The critters start anywhere they can get to the first target
+        # from, since parts of the map are cut off from the maze.
+        ys, xs = np.nonzero(self.field.distance < UNREACHABLE)
+        picks = rng.randint(len(xs), size=self.critter_count)
+        self.cell_xs, self.cell_ys = xs[picks], ys[picks]
+        self.steps = np.zeros((self.critter_count, 2), dtype=np.int32)
+        self.ticks = 0
+
+        self.critters = SpriteBatch(self.tile_map.uv_table,
+                                    capacity=self.critter_count,
+                                    sprite_size=self.tile_map.tile_pixels)
+
+        # the atlas is blue, so we keep to tints with some blue in them
+        for hue in rng.uniform(0.45, 0.85, self.critter_count):
+            self.critters.add(0, 0, self.critter_frame,
+                              hsv_to_rgb(hue, 0.7, 1.0) + (1.0,))
+
+        self.tile_map.add_sprite_batch(self.critters)
+
+    def move_critters(self):
+        '''
+            Every critter walks a tile every ticks_per_tile ticks, and
+            we move the sprites smoothly in between.
+        '''
+        phase = self.ticks % self.ticks_per_tile
+        self.ticks += 1
+
+        if phase == 0:
+            self.cell_xs += self.steps[:, 0]
+            self.cell_ys += self.steps[:, 1]
+            self.steps = self.field.steps(self.cell_xs, self.cell_ys)
+
+            if not self.steps.any():
+                # Everybody is there, or can't get there, so there's
+                # nothing to do until the next touch.
+                self.app.scheduler.suspend(hold=False)
+
+        tile_w, tile_h = self.tile_map.tile_pixels
+        part = float(phase) / self.ticks_per_tile
+        self.critters.move(slice(None),
+                           (self.cell_xs + self.steps[:, 0] * part) * tile_w,
+                           (self.cell_ys + self.steps[:, 1] * part) * tile_h)
+        self.critters.flush()
+
+    def on_touch_down(self, touch):
+        tile_map = self.tile_map
+
+        if tile_map is not None and tile_map.collide_point(*touch.pos):
+            tile_w, tile_h = tile_map.tile_pixels
+            target = (int((touch.x - tile_map.x + tile_map.scroll_x) //
+                          tile_w),
+                      int((touch.y - tile_map.y + tile_map.scroll_y) //
+                          tile_h))
+
+            if tile_map.navigator.is_walkable(target):
+                self.field = tile_map.navigator.flow_field(target)
+
+        return super(TileMapGame, self).on_touch_down(touch)
+
+
+class TileMapApp(TimedStartup, App):
     def build(self):
-        EventLoop.ensure_window()
+        # TimedStartup has made the window by now
         self.window = EventLoop.window
         self.window.size = [d * 2 for d in (224, 288)]
         game = TileMapGame(app=self)
 
-        Clock.schedule_interval(game.update, 1.0 / 60.0)
+        # The game stops ticking by itself once the critters have got
+        # where they are going, and any touch starts it again.
+        self.timestep = FixedTimestep(game.update, rate=60.0)
+        self.scheduler = TickScheduler(self.timestep, idle_rate=0)
+        self.scheduler.start()
 
         return game
 
+    def on_pause(self):
+        self.scheduler.suspend()
+        return True
+
+    def on_resume(self):
+        self.scheduler.wake()
+
+    def on_stop(self):
+        self.scheduler.stop()
+
 
 if __name__ == '__main__':
     TileMapApp().run()
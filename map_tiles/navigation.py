@@ -0,0 +1,215 @@
+'''
+    Flow field navigation over a TileGrid.
+
+    Rather than having every agent search for a path every frame, we do
+    a single breadth first search out from a target cell, which gives the
+    distance to the target from every cell of the map.  From that we get
+    a flow field: the direction to step from each cell to get closer to
+    the target.  Any number of agents chasing the same target can then
+    look up their next step in O(1).
+
+    Flow fields are cached by target cell, and the least recently used
+    ones are dropped when there are too many.
+'''
+from collections import OrderedDict
+
+import numpy as np
+
+
+UNREACHABLE = np.iinfo(np.int32).max
+
+# direction codes, and the (dx, dy) step for each one
+NONE, RIGHT, UP, LEFT, DOWN = range(5)
+STEPS = np.array([(0, 0), (1, 0), (0, 1), (-1, 0), (0, -1)], dtype=np.int32)
+
+
+class FlowField(object):
+    '''
+        The distance to a target from every cell, and the direction to
+        step to get closer.  Both are 2D arrays indexed [y][x].
+    '''
+    def __init__(self, target, distance, direction):
+        self.target = target
+        self.distance = distance
+        self.direction = direction
+
+    def on_map(self, xs, ys):
+        height, width = self.direction.shape
+        return (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+
+    def step(self, coord):
+        '''
+            The (dx, dy) to move from coord towards the target.
+            (0, 0) if we're there, the target can't be reached, or
+            coord is off the map.
+        '''
+        x, y = coord
+
+        if not self.on_map(x, y):
+            return 0, 0
+
+        dx, dy = STEPS[self.direction[y, x]]
+
+        return int(dx), int(dy)
+
+    def steps(self, xs, ys):
+        '''
+            The steps for a whole array of agents at once.
+            Returns an array of (dx, dy) rows, (0, 0) for any agents
+            that are off the map.
+        '''
+        xs, ys = np.asarray(xs), np.asarray(ys)
+        on_map = self.on_map(xs, ys)
+        directions = np.full(on_map.shape, NONE, dtype=np.uint8)
+        directions[on_map] = self.direction[ys[on_map], xs[on_map]]
+
+        return STEPS[directions]
+
+    def distance_to_target(self, coord):
+        '''
+            How many steps coord is from the target, or UNREACHABLE.
+        '''
+        x, y = coord
+
+        if not self.on_map(x, y):
+            return UNREACHABLE
+
+        return int(self.distance[y, x])
+
+
+class Navigator(object):
+    '''
+        Builds and caches flow fields over a TileGrid.
+
+        Tiles with a number in walkable_ids can be walked on, everything
+        else is a wall.
+    '''
+    def __init__(self, tile_grid, walkable_ids=(0,), max_fields=32):
+        self.tile_grid = tile_grid
+        self.walkable_ids = np.array(sorted(walkable_ids))
+        self.max_fields = max_fields
+        self.fields = OrderedDict()
+
+        self.fields_built = 0
+        self.fields_evicted = 0
+
+        self.refresh()
+
+    @classmethod
+    def from_uv_table(cls, tile_grid, uv_table, **kwargs):
+        '''
+            Walk on every tile that doesn't have an image in the atlas,
+            the opposite of TileCollider.from_uv_table().
+        '''
+        size = max(len(uv_table.valid), int(tile_grid.cells.max()) + 1, 256)
+        walkable_ids = np.nonzero(~uv_table.is_drawn(np.arange(size)))[0]
+
+        return cls(tile_grid, walkable_ids, **kwargs)
+
+    def refresh(self):
+        '''
+            Rebuild the walkable map from the tile grid, and forget
+            all of our flow fields.
+        '''
+        height, width = self.tile_grid.cells.shape
+
+        # We pad the map with a border of walls, so we can step to the
+        # neighbors of a cell in the flattened array without wrapping
+        # around to the other side of the map.
+        self.walkable = np.zeros((height + 2, width + 2), dtype=bool)
+        self.walkable[1:-1, 1:-1] = np.isin(self.tile_grid.cells,
+                                            self.walkable_ids)
+        self.offsets = np.array([1, width + 2, -1, -(width + 2)])
+
+        self.fields.clear()
+
+    def tile_changed(self, coord):
+        '''
+            Let us know a tile changed.  If that changes where we can
+            walk, the cached flow fields are no longer right.
+        '''
+        x, y = coord
+        walkable = bool(np.isin(self.tile_grid.cells[y, x],
+                                self.walkable_ids))
+
+        if self.walkable[y + 1, x + 1] != walkable:
+            self.walkable[y + 1, x + 1] = walkable
+            self.fields.clear()
+
+    def is_walkable(self, coord):
+        x, y = coord
+
+        if not self.tile_grid.in_bounds(coord):
+            return False
+
+        return bool(self.walkable[y + 1, x + 1])
+
+    def flow_field(self, target):
+        '''
+            The flow field towards target, from the cache if we can.
+        '''
+        target = tuple(target)
+        field = self.fields.get(target)
+
+        if field is None:
+            field = self.build_flow_field(target)
+            self.fields[target] = field
+
+            while len(self.fields) > self.max_fields:
+                self.fields.popitem(last=False)
+                self.fields_evicted += 1
+        else:
+            # mark it as the most recently used
+            self.fields[target] = self.fields.pop(target)
+
+        return field
+
+    def build_flow_field(self, target):
+        '''
+            Breadth first search out from the target.  Each pass expands
+            the whole frontier at once with array operations, so the
+            cost is a handful of NumPy calls per unit of distance.
+        '''
+        padded_w = self.walkable.shape[1]
+        walkable = self.walkable.ravel()
+        distance = np.full(walkable.shape, UNREACHABLE, dtype=np.int32)
+
+        x, y = target
+        start = (y + 1) * padded_w + (x + 1)
+
+        if self.tile_grid.in_bounds(target) and walkable[start]:
+            distance[start] = 0
+            frontier = np.array([start])
+            d = 0
+
+            while frontier.size:
+                d += 1
+                neighbors = (frontier[:, None] + self.offsets).ravel()
+                neighbors = neighbors[walkable[neighbors] &
+                                      (distance[neighbors] == UNREACHABLE)]
+                frontier = np.unique(neighbors)
+                distance[frontier] = d
+
+        distance = distance.reshape(self.walkable.shape)
+        direction = self.directions_from(distance)
+        self.fields_built += 1
+
+        return FlowField(target, distance[1:-1, 1:-1], direction)
+
+    def directions_from(self, distance):
+        '''
+            For each cell, the direction of the neighbor closest to the
+            target.  Cells with no closer neighbor, and walls and cells
+            that can't reach the target, get NONE.
+        '''
+        inner = distance[1:-1, 1:-1]
+        neighbors = np.stack([inner,                    # NONE
+                              distance[1:-1, 2:],       # RIGHT
+                              distance[2:, 1:-1],       # UP
+                              distance[1:-1, :-2],      # LEFT
+                              distance[:-2, 1:-1]])     # DOWN
+
+        direction = np.argmin(neighbors, axis=0).astype(np.uint8)
+        direction[inner == UNREACHABLE] = NONE
+
+        return direction
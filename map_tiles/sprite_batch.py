@@ -0,0 +1,160 @@
+'''
+    Draw lots of moving sprites with a single Mesh.
+
+    The position, atlas frame and tint of every sprite are kept in NumPy
+    arrays.  Changing them only marks those sprites dirty, and flush()
+    rewrites the vertices of just the dirty sprites before handing the
+    buffer to the mesh, once per frame.
+
+    The default Kivy shader has no per-vertex color, so the batch is
+    drawn in its own RenderContext with a shader that has one.
+'''
+import numpy as np
+
+from kivy.graphics import RenderContext, Mesh, Color
+
+
+VERTEX_SHADER = '''
+$HEADER$
+
+attribute vec2 v_pos;
+attribute vec2 v_tc;
+attribute vec4 v_color;
+
+void main(void) {
+    frag_color = v_color * color;
+    tex_coord0 = v_tc;
+    gl_Position = projection_mat * modelview_mat * vec4(v_pos, 0.0, 1.0);
+}
+'''
+
+FRAGMENT_SHADER = '''
+$HEADER$
+
+void main(void) {
+    gl_FragColor = frag_color * texture2D(texture0, tex_coord0);
+}
+'''
+
+VERTEX_FORMAT = [(b'v_pos', 2, 'float'),
+                 (b'v_tc', 2, 'float'),
+                 (b'v_color', 4, 'float')]
+FLOATS_PER_VERTEX = 8
+
+# corners of a sprite quad, in the same order as Texture.tex_coords
+CORNERS_X = np.array([0, 1, 1, 0], dtype=np.float32)
+CORNERS_Y = np.array([0, 0, 1, 1], dtype=np.float32)
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+# A mesh can't have more than 65535 indices
+MAX_SPRITES = 65535 // 6
+
+
+class SpriteBatch(object):
+    '''
+        A fixed number of sprite slots, drawn with frames from the same
+        atlas as a UVTable.  Add self.context to a canvas to draw them.
+
+            batch = SpriteBatch(uv_table, capacity=1000)
+            ghost = batch.add(10, 20, frame=29)
+            batch.move([ghost], [12], [20])
+            batch.flush()
+    '''
+    def __init__(self, uv_table, capacity=1024, sprite_size=(16, 16)):
+        if capacity > MAX_SPRITES:
+            raise ValueError('a sprite batch can hold at most {} sprites'
+                             .format(MAX_SPRITES))
+
+        self.uv_table = uv_table
+        self.capacity = capacity
+        self.sprite_size = sprite_size
+
+        self.pos = np.zeros((capacity, 2), dtype=np.float32)
+        self.frame = np.zeros(capacity, dtype=np.uint16)
+        self.tint = np.ones((capacity, 4), dtype=np.float32)
+        self.active = np.zeros(capacity, dtype=bool)
+        self.dirty = np.zeros(capacity, dtype=bool)
+        self.free = list(range(capacity - 1, -1, -1))
+
+        self.vertices = np.zeros(capacity * 4 * FLOATS_PER_VERTEX,
+                                 dtype=np.float32)
+        indices = (np.arange(capacity, dtype=np.uint32)[:, None] * 4 +
+                   QUAD_INDICES).astype(np.uint16)
+
+        self.context = RenderContext(use_parent_projection=True,
+                                     use_parent_modelview=True)
+        self.context.shader.vs = VERTEX_SHADER
+        self.context.shader.fs = FRAGMENT_SHADER
+
+        with self.context:
+            Color(1, 1, 1, 1)
+            self.mesh = Mesh(vertices=self.vertices,
+                             indices=indices.ravel(),
+                             fmt=VERTEX_FORMAT, mode='triangles',
+                             texture=uv_table.texture)
+
+    def __len__(self):
+        return self.capacity - len(self.free)
+
+    def add(self, x, y, frame, tint=(1, 1, 1, 1)):
+        '''
+            Put a new sprite in a free slot, and return its index.
+        '''
+        if not self.free:
+            raise IndexError('sprite batch is full')
+
+        i = self.free.pop()
+        self.pos[i] = x, y
+        self.frame[i] = frame
+        self.tint[i] = tint
+        self.active[i] = True
+        self.dirty[i] = True
+
+        return i
+
+    def remove(self, i):
+        if self.active[i]:
+            self.active[i] = False
+            self.dirty[i] = True
+            self.free.append(i)
+
+    def move(self, indices, xs, ys):
+        self.pos[indices, 0] = xs
+        self.pos[indices, 1] = ys
+        self.dirty[indices] = True
+
+    def set_frames(self, indices, frames):
+        self.frame[indices] = frames
+        self.dirty[indices] = True
+
+    def set_tints(self, indices, tints):
+        self.tint[indices] = tints
+        self.dirty[indices] = True
+
+    def flush(self):
+        '''
+            Rewrite the vertices of the sprites that changed, and give
+            the mesh the new buffer.  Returns how many sprites changed.
+        '''
+        changed = np.nonzero(self.dirty)[0]
+
+        if changed.size == 0:
+            return 0
+
+        count = changed.size
+        width, height = self.sprite_size
+        shown = self.active[changed].astype(np.float32)[:, None]
+        x = self.pos[changed, 0][:, None]
+        y = self.pos[changed, 1][:, None]
+
+        quads = self.vertices.reshape(self.capacity, 4, FLOATS_PER_VERTEX)
+        quads[changed, :, 0] = x + CORNERS_X * width * shown
+        quads[changed, :, 1] = y + CORNERS_Y * height * shown
+        quads[changed, :, 2:4] = self.uv_table.tex_coords[
+            self.frame[changed]].reshape(count, 4, 2)
+        quads[changed, :, 4:8] = self.tint[changed][:, None, :]
+
+        self.dirty[changed] = False
+        self.mesh.vertices = self.vertices
+
+        return count
@@ -0,0 +1,119 @@
+'''
+    Checks of the flow fields in navigation.py.  These don't need Kivy,
+    run them from this directory with:
+
+        > python -m pytest test_navigation.py
+'''
+import numpy as np
+
+from navigation import NONE, UNREACHABLE, Navigator
+from tile_grid import TileGrid
+
+
+def make_navigator():
+    # 0 is floor, 1 is wall, and the bottom right cell is walled in
+    grid = TileGrid.from_rows([[0, 0, 0, 0, 0],
+                               [1, 1, 1, 0, 1],
+                               [0, 0, 0, 0, 1],
+                               [0, 0, 0, 1, 0]])
+    return Navigator(grid, walkable_ids=(0,))
+
+
+def test_distance_from_the_target():
+    field = make_navigator().flow_field((0, 0))
+
+    assert field.distance_to_target((0, 0)) == 0
+    assert field.step((0, 0)) == (0, 0)
+    assert field.distance_to_target((2, 0)) == 2
+    assert field.distance_to_target((0, 3)) == 9
+    assert field.distance_to_target((3, 0)) == UNREACHABLE
+    assert field.distance_to_target((4, 0)) == UNREACHABLE
+
+
+def test_steps_lead_to_the_target():
+    navigator = make_navigator()
+    field = navigator.flow_field((0, 0))
+    width, height = navigator.tile_grid.size
+
+    for y in range(height):
+        for x in range(width):
+            coord = (x, y)
+            distance = field.distance_to_target(coord)
+
+            if distance == UNREACHABLE:
+                assert field.step(coord) == (0, 0)
+                continue
+
+            # every step gets us one closer, over walkable cells
+            while distance:
+                dx, dy = field.step(coord)
+                coord = (coord[0] + dx, coord[1] + dy)
+
+                assert navigator.is_walkable(coord)
+                assert field.distance_to_target(coord) == distance - 1
+                distance -= 1
+
+            assert coord == (0, 0)
+
+
+def test_off_the_map():
+    field = make_navigator().flow_field((0, 0))
+
+    assert field.step((-1, 0)) == (0, 0)
+    assert field.step((0, 4)) == (0, 0)
+    assert field.distance_to_target((5, 0)) == UNREACHABLE
+
+
+def test_steps_match_step():
+    field = make_navigator().flow_field((0, 0))
+    xs = np.array([0, 1, 2, 0, 4, -1, 9])
+    ys = np.array([0, 0, 2, 3, 3, 0, 0])
+
+    steps = field.steps(xs, ys)
+
+    assert [tuple(s) for s in steps] == [field.step(c)
+                                         for c in zip(xs, ys)]
+    assert tuple(steps[-1]) == (0, 0)
+
+
+def test_target_in_a_wall():
+    field = make_navigator().flow_field((0, 2))
+
+    assert field.distance_to_target((0, 2)) == UNREACHABLE
+    assert (field.direction == NONE).all()
+
+
+def test_fields_are_cached():
+    navigator = make_navigator()
+    navigator.max_fields = 2
+
+    field = navigator.flow_field((0, 0))
+    assert navigator.flow_field((0, 0)) is field
+
+    navigator.flow_field((1, 0))
+    navigator.flow_field((0, 0))
+    navigator.flow_field((2, 0))
+
+    # (1, 0) was the least recently used
+    assert list(navigator.fields) == [(0, 0), (2, 0)]
+    assert navigator.fields_built == 3
+    assert navigator.fields_evicted == 1
+
+
+def test_tile_changed_forgets_the_fields():
+    navigator = make_navigator()
+    navigator.flow_field((0, 0))
+
+    # a tile that doesn't change where we can walk keeps the fields
+    navigator.tile_grid.set_value((0, 2), 2)
+    navigator.tile_changed((0, 2))
+    assert navigator.fields
+
+    # opening up the wall gives a shorter way round
+    navigator.tile_grid.set_value((3, 0), 0)
+    navigator.tile_changed((3, 0))
+    assert not navigator.fields
+
+    field = navigator.flow_field((0, 0))
+    assert field.distance_to_target((3, 0)) == 3
+    assert field.distance_to_target((4, 0)) == 4
@@ -0,0 +1,77 @@
+'''
+    Checks of the wall queries in tile_collision.py.  These don't need
+    Kivy, run them from this directory with:
+
+        > python -m pytest test_tile_collision.py
+'''
+import numpy as np
+
+from tile_collision import DOWN, LEFT, RIGHT, UP, TileCollider
+from tile_grid import TileGrid
+
+
+def make_collider(**kwargs):
+    # one wall, in the top right of a 3x3 map of 10 pixel tiles
+    grid = TileGrid.from_rows([[0, 0, 1],
+                               [0, 0, 0],
+                               [0, 0, 0]])
+    return TileCollider(grid, (1,), (10, 10), **kwargs)
+
+
+def test_points():
+    collider = make_collider()
+    xs = [5, 25, 20, 19.9, -1, 31]
+    ys = [5, 25, 20, 25, 5, 5]
+
+    assert collider.points(xs, ys).tolist() == [False, True, True,
+                                                False, True, True]
+
+
+def test_points_off_the_map_can_be_open():
+    collider = make_collider(off_map_solid=False)
+
+    assert collider.points([-1, 5, 5], [5, 31, -0.5]).tolist() == [
+        False, False, False]
+
+
+def test_boxes():
+    collider = make_collider()
+    xs = [2, 16, 22, 10, 0]
+    ys = [2, 22, 16, 10, 0]
+
+    blocked, push = collider.boxes(xs, ys, [6] * 5, [6] * 5)
+
+    # In the open, into the wall from the left, into the wall from
+    # below, in the open again, and touching the edges of the map.  A
+    # corner in the wall blocks all three sides that reach it, but we
+    # are only pushed back the way we came in.
+    assert blocked.tolist() == [0, RIGHT | UP | DOWN, UP | RIGHT | LEFT,
+                                0, LEFT | DOWN]
+    assert np.allclose(push[1], (-2, 0))
+    assert np.allclose(push[2], (0, -2))
+    assert np.allclose(push[[0, 3, 4]], 0)
+
+
+def test_boxes_sliding_along_a_wall():
+    collider = make_collider()
+
+    # right up against the left side of the wall, in line with it
+    blocked, push = collider.boxes([14], [20], [6], [5])
+
+    assert blocked.tolist() == [RIGHT]
+    assert np.allclose(push, 0)
+
+
+def test_tile_changed():
+    collider = make_collider()
+    grid = collider.tile_grid
+
+    grid.set_value((0, 0), 1)
+    collider.tile_changed((0, 0))
+    assert collider.points([5], [5]).tolist() == [True]
+
+    # tile numbers past the end of the table aren't solid
+    grid.set_value((2, 2), 1000)
+    collider.tile_changed((2, 2))
+    assert len(collider.solid_lut) > 1000
+    assert collider.points([25], [25]).tolist() == [False]
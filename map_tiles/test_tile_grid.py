@@ -0,0 +1,112 @@
+'''
+    Checks of TileGrid and its map files in tile_grid.py.  These don't
+    need Kivy, run them from this directory with:
+
+        > python -m pytest test_tile_grid.py
+'''
+import numpy as np
+import pytest
+
+from tile_grid import HEADER, TileGrid
+
+
+def make_grid():
+    return TileGrid.from_rows([[1, 2, 3],
+                               [4, 5, 6]])
+
+
+def test_from_rows_puts_the_first_row_at_the_top():
+    grid = make_grid()
+
+    assert grid.size == (3, 2)
+    assert grid.cells.dtype == np.uint8
+    assert grid.map_value((0, 0)) == 4
+    assert grid.map_value((0, 1)) == 1
+    assert grid.map_value((3, 0), default=-1) == -1
+
+
+@pytest.mark.parametrize('mmap_mode', ['r', 'c', None])
+def test_save_and_load(tmp_path, mmap_mode):
+    filename = str(tmp_path / 'map.tmap')
+    grid = make_grid()
+    grid.save(filename)
+
+    loaded = TileGrid.load(filename, mmap_mode=mmap_mode)
+
+    assert loaded.cells.dtype == grid.cells.dtype
+    assert np.array_equal(loaded.cells, grid.cells)
+    assert isinstance(loaded.cells, np.memmap) == (mmap_mode is not None)
+
+
+def test_save_and_load_uint16(tmp_path):
+    filename = str(tmp_path / 'map.tmap')
+    grid = TileGrid(np.array([[0, 300], [65535, 7]]))
+    grid.save(filename)
+
+    loaded = TileGrid.load(filename)
+
+    assert loaded.cells.dtype == np.dtype('<u2')
+    assert loaded.map_value((0, 1)) == 65535
+
+
+def test_load_in_place_writes_back(tmp_path):
+    filename = str(tmp_path / 'map.tmap')
+    make_grid().save(filename)
+
+    grid = TileGrid.load(filename, mmap_mode='r+')
+    grid.set_value((1, 1), 9)
+    grid.cells.flush()
+    del grid
+
+    assert TileGrid.load(filename, mmap_mode=None).map_value((1, 1)) == 9
+
+
+def test_load_rejects_other_files(tmp_path):
+    filename = str(tmp_path / 'map.tmap')
+
+    with open(filename, 'wb') as f:
+        f.write(HEADER.pack(b'NOPE', 1, 1, 1, 1) + b'\0')
+
+    with pytest.raises(ValueError):
+        TileGrid.load(filename)
+
+    with open(filename, 'wb') as f:
+        f.write(b'TMAP')
+
+    with pytest.raises(ValueError):
+        TileGrid.load(filename)
+
+
+def test_set_value_widens_to_uint16():
+    grid = make_grid()
+    grid.set_value((2, 0), 1000)
+
+    assert grid.cells.dtype == np.dtype('<u2')
+    assert grid.map_value((2, 0)) == 1000
+    assert grid.map_value((0, 0)) == 4
+
+
+def test_set_value_rejects_bad_values():
+    grid = make_grid()
+
+    with pytest.raises(ValueError):
+        grid.set_value((0, 0), 65536)
+
+    with pytest.raises(ValueError):
+        grid.set_value((0, 0), -1)
+
+    with pytest.raises(IndexError):
+        grid.set_value((3, 0), 1)
+
+
+def test_set_value_cant_widen_a_memmap(tmp_path):
+    filename = str(tmp_path / 'map.tmap')
+    make_grid().save(filename)
+    grid = TileGrid.load(filename, mmap_mode='c')
+
+    with pytest.raises(ValueError):
+        grid.set_value((0, 0), 1000)
+
+    grid.set_value((0, 0), 200)
+
+    assert grid.map_value((0, 0)) == 200
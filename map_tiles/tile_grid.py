@@ -0,0 +1,187 @@
+'''
+    Compact storage for a grid of tile numbers.
+
+    The cells are kept in a 2D NumPy array of uint8 (or uint16 if the
+    tile numbers need it), indexed as cells[y][x] with row 0 at the
+    bottom of the map, the same way Kivy's y axis goes.
+
+    A grid can be saved in a simple binary format, a 16 byte header
+    followed by the raw cells, row by row from the bottom:
+
+        magic     4 bytes  b'TMAP'
+        version   uint16
+        itemsize  uint16   1 for uint8 cells, 2 for uint16
+        width     uint32
+        height    uint32
+
+    All little-endian.  Because the cells are stored raw, a map file can
+    be memory-mapped, so even a huge map opens instantly.
+
+    To convert a Python module with a map_array, like map_tiles.py:
+
+        > python tile_grid.py map_tiles map_tiles.tmap
+'''
+import struct
+import sys
+from importlib import import_module
+
+import numpy as np
+
+
+MAGIC = b'TMAP'
+VERSION = 1
+HEADER = struct.Struct('<4sHHII')
+DTYPES = {1: np.dtype('<u1'), 2: np.dtype('<u2')}
+
+
+class TileGrid(object):
+    def __init__(self, cells):
+        cells = np.asanyarray(cells)
+
+        if cells.ndim != 2:
+            raise ValueError('tile cells must be a 2D array')
+
+        if cells.dtype not in DTYPES.values():
+            cells = cells.astype(dtype_for(cells))
+
+        self.cells = cells
+
+    @classmethod
+    def from_rows(cls, rows):
+        '''
+            Make a grid from a list of rows written top row first,
+            the way map_array is laid out in map_tiles.py.
+        '''
+        cells = np.array(rows)
+
+        return cls(np.ascontiguousarray(cells[::-1]))
+
+    @classmethod
+    def blank(cls, width, height, dtype=np.uint8):
+        return cls(np.zeros((height, width), dtype=dtype))
+
+    @property
+    def width(self):
+        return self.cells.shape[1]
+
+    @property
+    def height(self):
+        return self.cells.shape[0]
+
+    @property
+    def size(self):
+        return self.width, self.height
+
+    def in_bounds(self, coord):
+        x, y = coord
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def map_value(self, coord, default=0):
+        '''
+            The tile number at (x, y), or default if that is off
+            the map.  We don't wrap around.
+        '''
+        x, y = coord
+
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return int(self.cells[y, x])
+
+        return default
+
+    def set_value(self, coord, value):
+        '''
+            Change the tile at (x, y).  A tile number too big for uint8
+            cells widens them to uint16, like it would have if it was in
+            the map to start with.
+        '''
+        x, y = coord
+
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError('tile {} is off the map'.format(coord))
+
+        if not 0 <= value <= 0xffff:
+            raise ValueError('tile numbers must be in the range 0-65535')
+
+        if value > np.iinfo(self.cells.dtype).max:
+            if isinstance(self.cells, np.memmap):
+                raise ValueError('tile number {} is too big for the cells '
+                                 'of a memory-mapped map'.format(value))
+
+            self.cells = self.cells.astype(DTYPES[2])
+
+        self.cells[y, x] = value
+
+    def save(self, filename):
+        cells = self.cells.astype(self.cells.dtype.newbyteorder('<'),
+                                  copy=False)
+
+        with open(filename, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, cells.dtype.itemsize,
+                                self.width, self.height))
+            f.write(np.ascontiguousarray(cells).tobytes())
+
+    @classmethod
+    def load(cls, filename, mmap_mode='r'):
+        '''
+            Open a saved grid.  By default the cells are memory-mapped
+            read-only.  Use mmap_mode='r+' to change the file in place,
+            'c' for changes that aren't written back, or None to read the
+            whole thing into memory.
+        '''
+        with open(filename, 'rb') as f:
+            header = f.read(HEADER.size)
+
+        if len(header) < HEADER.size:
+            raise ValueError('{} is not a tile map file'.format(filename))
+
+        magic, version, itemsize, width, height = HEADER.unpack(header)
+
+        if magic != MAGIC:
+            raise ValueError('{} is not a tile map file'.format(filename))
+
+        if version != VERSION or itemsize not in DTYPES:
+            raise ValueError('{}: unsupported tile map version {}, '
+                             'cell size {}'.format(filename, version,
+                                                   itemsize))
+
+        dtype = DTYPES[itemsize]
+
+        if mmap_mode is None:
+            cells = np.fromfile(filename, dtype=dtype, offset=HEADER.size,
+                                count=width * height)
+            cells = cells.reshape((height, width))
+        else:
+            cells = np.memmap(filename, dtype=dtype, mode=mmap_mode,
+                              offset=HEADER.size, shape=(height, width))
+
+        return cls(cells)
+
+
+def dtype_for(cells):
+    if cells.size and (cells.min() < 0 or cells.max() > 0xffff):
+        raise ValueError('tile numbers must be in the range 0-65535')
+
+    if cells.size and cells.max() > 0xff:
+        return DTYPES[2]
+
+    return DTYPES[1]
+
+
+def convert_module(module_name, filename):
+    '''
+        Save the map_array of a Python module as a binary map file.
+    '''
+    grid = TileGrid.from_rows(import_module(module_name).map_array)
+    grid.save(filename)
+
+    return grid
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('usage: python tile_grid.py <module> <output.tmap>')
+        sys.exit(1)
+
+    grid = convert_module(sys.argv[1], sys.argv[2])
+    print('wrote {}x{} map to {}'.format(grid.width, grid.height,
+                                         sys.argv[2]))
@@ -0,0 +1,130 @@
+'''
+    Build a whole layer of map tiles into a single Mesh.
+
+    Instead of looking up the atlas with a string key for every tile and
+    making a Rectangle for it, we load the atlas once into a table of
+    texture coordinates indexed by tile number.  Then the vertices for
+    a block of tiles can be built in a few NumPy operations.
+'''
+import numpy as np
+
+from kivy.graphics import Mesh
+
+
+# corners of a tile quad, in the same order as Texture.tex_coords
+CORNERS_X = np.array([0, 1, 1, 0], dtype=np.float32)
+CORNERS_Y = np.array([0, 0, 1, 1], dtype=np.float32)
+QUAD_INDICES = np.array([0, 1, 2, 2, 3, 0], dtype=np.uint32)
+
+# A mesh can't have more than 65535 indices
+MAX_TILES_PER_MESH = 65535 // 6
+
+
+class UVTable(object):
+    '''
+        The texture coordinates of every tile in an atlas, indexed by
+        tile number.  Tile numbers that aren't in the atlas are marked
+        as empty, and don't get drawn.
+    '''
+    def __init__(self, atlas):
+        ids = [int(key) for key in atlas.textures.keys() if key.isdigit()]
+        size = max(ids) + 1 if ids else 1
+
+        self.tex_coords = np.zeros((size, 8), dtype=np.float32)
+        self.valid = np.zeros(size, dtype=bool)
+        self.texture = None
+
+        for tile_id in ids:
+            region = atlas[str(tile_id)]
+            self.tex_coords[tile_id] = region.tex_coords
+            self.valid[tile_id] = True
+
+            # All of the regions are in the same texture, so binding any
+            # one of them binds the whole atlas image.
+            self.texture = region
+
+    def is_drawn(self, tiles):
+        '''
+            A mask of the tiles that have an image in the atlas.
+        '''
+        tiles = np.asarray(tiles)
+        drawn = np.zeros(tiles.shape, dtype=bool)
+        in_range = tiles < len(self.valid)
+        drawn[in_range] = self.valid[tiles[in_range]]
+
+        return drawn
+
+
+def build_tile_vertices(tiles, uv_table, tile_size, origin=(0, 0)):
+    '''
+        Make the vertices and indices for a 2D array of tile numbers,
+        with tiles[0][0] at the bottom left corner at origin (in tiles).
+
+        Every tile gets a quad, row by row, so the vertices of a tile
+        are easy to find again when it changes.  The quads of empty
+        tiles are collapsed to a point, so they don't draw anything.
+    '''
+    tiles = np.asarray(tiles)
+    count = tiles.size
+
+    if count > MAX_TILES_PER_MESH:
+        raise ValueError('too many tiles ({}) for one mesh'.format(count))
+
+    drawn = uv_table.is_drawn(tiles).ravel()
+    ids = np.where(drawn, tiles.ravel(), 0)
+    rows, cols = np.indices(tiles.shape)
+
+    tile_w, tile_h = tile_size
+    x = ((cols.ravel() + origin[0]) * tile_w).astype(np.float32)
+    y = ((rows.ravel() + origin[1]) * tile_h).astype(np.float32)
+    w = np.where(drawn, tile_w, 0).astype(np.float32)
+    h = np.where(drawn, tile_h, 0).astype(np.float32)
+
+    vertices = np.empty((count, 4, 4), dtype=np.float32)
+    vertices[:, :, 0] = x[:, None] + CORNERS_X * w[:, None]
+    vertices[:, :, 1] = y[:, None] + CORNERS_Y * h[:, None]
+    vertices[:, :, 2:] = uv_table.tex_coords[ids].reshape(count, 4, 2)
+
+    indices = (np.arange(count, dtype=np.uint32)[:, None] * 4 +
+               QUAD_INDICES).astype(np.uint16)
+
+    return vertices.ravel(), indices.ravel()
+
+
+class TileChunk(object):
+    '''
+        A rectangular block of map tiles drawn by one Mesh.
+
+        Changing a tile only rewrites the 16 floats of its quad in our
+        vertex buffer.  The buffer is handed to the mesh in flush(),
+        once for however many tiles changed.
+    '''
+    def __init__(self, tiles, uv_table, tile_size, origin=(0, 0)):
+        tiles = np.asarray(tiles)
+        self.rows, self.cols = tiles.shape
+        self.uv_table = uv_table
+        self.tile_size = tile_size
+        self.origin = origin
+        self.dirty = False
+
+        self.vertices, indices = build_tile_vertices(tiles, uv_table,
+                                                     tile_size, origin)
+        self.mesh = Mesh(vertices=self.vertices, indices=indices,
+                         mode='triangles', texture=uv_table.texture)
+
+    def set_tile(self, col, row, tile_id):
+        '''
+            Change the tile at (col, row) within this chunk.
+        '''
+        quad, _indices = build_tile_vertices(
+            [[tile_id]], self.uv_table, self.tile_size,
+            (self.origin[0] + col, self.origin[1] + row))
+
+        start = (row * self.cols + col) * 16
+        self.vertices[start:start + 16] = quad
+        self.dirty = True
+
+    def flush(self):
+        if self.dirty:
+            self.mesh.vertices = self.vertices
+            self.dirty = False
@@ -0,0 +1,154 @@
+'''
+    Some simple benchmarks for the Pong game logic.
+    These don't need a window, so they can be run anywhere:
+
+        > python benchmarks.py
+
+    With --json <file>, the results are saved for run_benchmarks.py
+    instead of printed.
+
+    Every benchmark also checks the results of what it timed, and stops
+    with an AssertionError if they are wrong.
+'''
+import sys
+from math import cos, radians, sin
+
+from gamelib.benchmark import best_of, check, save_results
+
+from simulation import PongSim
+
+
+def make_sim(seed=0):
+    return PongSim(800, 600, seed=seed)
+
+
+def bench_ticks(ticks=3000, repeat=3):
+    '''
+        The cost of a whole update tick, in demo mode with and without
+        the predictive AI, and in a game played by the AI.
+    '''
+    results = []
+
+    for name in ('demo', 'demo_chasing', 'game'):
+        sim = make_sim()
+        sim.predictive = name != 'demo_chasing'
+
+        if name == 'game':
+            sim.autoplay = True
+            sim.start_game()
+
+        sim.start_demo()
+
+        def run():
+            check(sim.step(ticks) == ticks, 'step() stopped early')
+            sim.reset_game()
+
+        results.append((name, best_of(run, repeat) / ticks))
+
+        check(sim.game_in_play == (name == 'game'),
+              'the {} ran in the wrong mode'.format(name))
+        check(sim.paddle_hits > 0, 'the paddles never hit the ball')
+
+    return results
+
+
+def check_prediction(sim, dt=1e-4):
+    '''
+        Follow the ball in small steps, bouncing it off the top and
+        bottom, and check it gets to the paddle where predict_ball()
+        said it would.
+    '''
+    ball = sim.ball
+    half = ball.height / 2.0
+
+    for degrees in (0, 20, 45, 70, 160, 200, 250, 300):
+        sim.center_ball()
+        ball.velocity = (sim.serve_speed * cos(radians(degrees)),
+                         sim.serve_speed * sin(radians(degrees)))
+        predicted = sim.predict_ball(ball)
+
+        if ball.velocity_x >= 0.0:
+            line = sim.player2.x - ball.width
+        else:
+            line = sim.player1.right
+
+        x, y = ball.x, ball.center_y
+        v_x, v_y = ball.velocity
+
+        while (line - x) * v_x > 0.0:
+            x, y = x + v_x * dt, y + v_y * dt
+
+            if y < half or y > sim.height - half:
+                v_y = -v_y
+
+        check(abs(predicted - y) < 1.0,
+              'predict_ball() is off by {:.1f} for a ball going off at '
+              '{} degrees'.format(predicted - y, degrees))
+
+
+def bench_predict_ball(calls=10000, repeat=3):
+    '''
+        One prediction of where the ball crosses, without the cache.
+    '''
+    sim = make_sim()
+    sim.start_demo()
+
+    def run():
+        for _i in range(calls):
+            sim.predict_ball(sim.ball)
+
+    elapsed = best_of(run, repeat) / calls
+    check_prediction(sim)
+
+    return elapsed
+
+
+def bench_serve_ball(calls=10000, repeat=3):
+    sim = make_sim()
+
+    def run():
+        for _i in range(calls):
+            sim.serve_ball()
+
+    elapsed = best_of(run, repeat) / calls
+    check(sim.serves == calls * repeat, 'some serves went missing')
+    check(abs(sim.ball.center_x - sim.width / 2.0) < 1e-9,
+          'serve_ball() left the ball off center')
+
+    return elapsed
+
+
+def suite():
+    '''
+        All of the benchmarks as a flat dict of times in seconds.
+    '''
+    results = {}
+
+    for name, elapsed in bench_ticks():
+        results['tick.' + name] = elapsed
+
+    results['predict_ball'] = bench_predict_ball()
+    results['serve_ball'] = bench_serve_ball()
+
+    return results
+
+
+def main():
+    if '--json' in sys.argv:
+        filename = sys.argv[sys.argv.index('--json') + 1]
+        save_results(suite(), filename)
+        return
+
+    print('update tick (microseconds)')
+    for name, elapsed in bench_ticks():
+        print('{:>14} {:>10.2f}'.format(name, elapsed * 1e6))
+
+    print('')
+    print('per call (microseconds)')
+    print('{:>14} {:>10.2f}'.format('predict_ball',
+                                    bench_predict_ball() * 1e6))
+    print('{:>14} {:>10.2f}'.format('serve_ball', bench_serve_ball() * 1e6))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,4 +1,8 @@
-from random import randint
+# This comes first, so that the startup timing covers the imports.
+from gamelib.startup import TimedStartup, on_first_frame
+
+import os
+from random import Random
 
 import kivy
 kivy.require('1.10.1')  # replace with your current kivy version !
@@ -9,17 +13,23 @@ from kivy.uix.modalview import ModalView
 from kivy.properties import (NumericProperty,
                              ReferenceListProperty,
                              ObjectProperty)
-from kivy.vector import Vector
 from kivy.clock import Clock
+from kivy.logger import Logger
+
+from gamelib.profiler import NULL_PROFILER, profiler_from_env
+from gamelib.replay import InputLog, MOVE, START, RESIZE
+from gamelib.scheduler import TickScheduler
+from gamelib.timestep import FixedTimestep
+from gamelib.touch_input import TouchCoalescer
+
+from simulation import PongSim
 
 
 class StartGameModal(ModalView):
     root = ObjectProperty(None)
 
     def dismiss(self, *args, **kwargs):
-        self.root.game_in_play = True
-        self.root.player1.score = 0
-        self.root.player2.score = 0
+        self.root.start_game()
 
         super(StartGameModal, self).dismiss(*args, **kwargs)
 
@@ -30,12 +40,6 @@ class StartGameModal(ModalView):
 class PongPaddle(Widget):
     score = NumericProperty(0)
 
-    def bounce_ball(self, ball):
-        if self.collide_widget(ball):
-            speedup = 1.1
-            offset = 0.02 * Vector(0, ball.center_y - self.center_y)
-            ball.velocity = speedup * (offset - ball.velocity)
-
 
 class PongBall(Widget):
     # velocity of the ball on x and y axis
@@ -46,11 +50,6 @@ class PongBall(Widget):
     # a shorthand, just like e.g. w.pos for w.x and w.y
     velocity = ReferenceListProperty(velocity_x, velocity_y)
 
-    def move(self):
-        # 'move' function will move the ball one step.  This
-        # will be called in equal intervals to animate the ball
-        self.pos = Vector(*self.velocity) + self.pos
-
 
 class PongGame(Widget):
     app = ObjectProperty(None)
@@ -61,6 +60,35 @@ class PongGame(Widget):
     game_in_play = ObjectProperty(False)
 
     start_dlg = None
+    sim = None
+    profiler = NULL_PROFILER
+
+    def __init__(self, **kwargs):
+        super(PongGame, self).__init__(**kwargs)
+
+        # The simulation owns the game state, and our widgets only
+        # mirror it when we render a frame.
+        seed = Random().randrange(1 << 32)
+        self.sim = PongSim(self.width, self.height,
+                           paddle_size=self.player1.size,
+                           ball_size=self.ball.width,
+                           seed=seed)
+
+        # Everything the players do is logged, so the session can be
+        # saved and replayed later.
+        self.input_log = InputLog(seed, self.sim.setup())
+
+        # Touch moves are saved up and applied once per physics step.
+        self.touches = TouchCoalescer()
+
+    def on_size(self, _instance, value):
+        width, height = value
+        self.input_log.record(self.sim.ticks, RESIZE, x=width, y=height)
+        self.sim.resize(width, height)
+        self.render()
+
+    def on_game_in_play(self, _instance, value):
+        self.sim.game_in_play = value
 
     def show_start_buttons(self):
         if self.start_dlg is None:
@@ -69,80 +97,82 @@ class PongGame(Widget):
 
         self.start_dlg.open()
 
-    def serve_ball(self):
-        self.ball.center = self.center
-        self.ball.velocity = Vector(4, 0).rotate(randint(0, 360))
-
-    def update(self, _dt):
-        self.ball.move()
-
-        # bounce off paddles
-        self.player1.bounce_ball(self.ball)
-        self.player2.bounce_ball(self.ball)
-
-        # bounce off top and bottom
-        if (self.ball.y < 0) or (self.ball.top > self.height):
-            self.ball.velocity_y *= -1
-
-        if self.game_in_play is True:
-            self.out_of_bounds()
-            if self.game_is_over():
-                self.game_in_play = False
-                self.serve_ball()
-                self.show_start_buttons()
-        else:
-            # demo game play
-            self.out_of_bounds(score_point=False)
-            self.follow_ball()
-
-    def out_of_bounds(self, score_point=True):
-        # went out-of-bounds to score point?
-        if self.ball.x < self.x:
-            if score_point:
-                self.player2.score += 1
-            self.serve_ball()
-        if self.ball.x > self.width:
-            if score_point:
-                self.player1.score += 1
-            self.serve_ball()
-
-    def follow_ball(self):
-        # Here we have the appropriate paddle try
-        # to hit the ball back.  This is just for demo play.
-        if self.ball.velocity_x >= 0.0:
-            if self.player2.center_y > self.ball.center_y:
-                self.player2.y -= 2
-
-            if self.player2.center_y < self.ball.center_y:
-                self.player2.y += 2
-        else:
-            if self.player1.center_y > self.ball.center_y:
-                self.player1.y -= 2
-
-            if self.player1.center_y < self.ball.center_y:
-                self.player1.y += 2
+        # The demo carries on under the modal, but nobody is watching
+        # it closely, so we don't need every frame.
+        self.app.scheduler.idle()
 
-    def game_is_over(self):
-        return (self.player1.score >= 5 or
-                self.player2.score >= 5)
+    def serve_ball(self):
+        self.sim.serve_ball()
+        self.render()
+
+    def reset_game(self):
+        self.sim.reset_game()
+        self.render()
+
+    def start_game(self):
+        self.input_log.record(self.sim.ticks, START)
+        self.sim.start_game()
+        self.game_in_play = True
+        self.app.scheduler.wake()
+        self.render()
+
+    def update(self, dt):
+        '''
+            Advance the game one physics step of dt seconds.
+            This is called by our FixedTimestep, which takes care of
+            calling render() once per frame.
+        '''
+        for player, move_to in self.touches.pop_moves():
+            self.move_player(player, move_to)
+
+        self.sim.step(1, dt)
+
+        if self.sim.game_over:
+            self.sim.game_over = False
+            self.game_in_play = False
+            self.show_start_buttons()
+
+    def add_widget(self, widget, *args, **kwargs):
+        self.profiler.count('widget_adds')
+        super(PongGame, self).add_widget(widget, *args, **kwargs)
+
+    def remove_widget(self, widget, *args, **kwargs):
+        self.profiler.count('widget_removes')
+        super(PongGame, self).remove_widget(widget, *args, **kwargs)
+
+    def render(self, alpha=1.0):
+        self.profiler.begin()
+        self.sync_widgets(alpha)
+        self.profiler.mark('render')
+
+    def sync_widgets(self, alpha=1.0):
+        sim = self.sim
+
+        self.ball.pos = sim.ball.lerp(alpha)
+        self.ball.velocity = sim.ball.velocity
+
+        for player, state in ((self.player1, sim.player1),
+                              (self.player2, sim.player2)):
+            player.pos = state.lerp(alpha)
+            player.score = state.score
 
     def on_touch_down(self, touch):
-        if self.is_player1(touch):
-            self.old_y1 = touch.y
-
-        if self.is_player2(touch):
-            self.old_y2 = touch.y
+        self.touches.down(touch.uid, touch.y)
 
     def on_touch_move(self, touch):
+        # Each touch steers the paddle on its side of the screen.  A
+        # touch in the middle third doesn't steer either of them.
         if self.is_player1(touch):
-            move_to = touch.y - self.old_y1
-            self.move_player(self.player1, move_to)
-            self.old_y1 = touch.y
+            player = self.player1
+        elif self.is_player2(touch):
+            player = self.player2
+        else:
+            player = None
+
+        self.touches.move(touch.uid, touch.y, player)
 
-        if self.is_player2(touch):
-            move_to = touch.y - self.old_y2
-            self.move_player(self.player2, move_to)
-            self.old_y2 = touch.y
+    def on_touch_up(self, touch):
+        self.touches.up(touch.uid)
 
     def is_player1(self, touch):
         return touch.x < self.width / 3
@@ -151,17 +181,41 @@ class PongGame(Widget):
         return touch.x > self.width - self.width / 3
 
     def move_player(self, player, move_to):
-        new_pos = player.center_y + move_to
-        player.center_y = min(self.height - player.height / 2,
-                              max(player.height / 2, new_pos))
+        if player is self.player1:
+            number, state = 1, self.sim.player1
+        else:
+            number, state = 2, self.sim.player2
+
+        self.input_log.record(self.sim.ticks, MOVE, number, move_to)
+        self.sim.move_player(state, move_to)
+        player.pos = state.x, state.y
+
+
+class PongApp(TimedStartup, App):
+    tick_rate = 60.0
+    timestep = None
+    scheduler = None
 
+    # frames per second while the start modal is up
+    idle_rate = 10.0
+
+    # Set PONG_REPLAY to a file name to save a replay of the session
+    # when we quit.  Play it back with replay.py.
+    replay_file = os.environ.get('PONG_REPLAY')
 
-class PongApp(App):
     def build(self):
         game = PongGame(app=self)
-
-        game.serve_ball()
-        Clock.schedule_interval(game.update, 1.0 / 60.0)
+        self.set_profiler(game, profiler_from_env())
+
+        game.input_log.setup['tick_rate'] = self.tick_rate
+        game.sim.start_demo()
+        game.render()
+        self.timestep = FixedTimestep(game.update, game.render,
+                                      rate=self.tick_rate)
+        self.scheduler = TickScheduler(self.timestep,
+                                       idle_rate=self.idle_rate)
+        self.scheduler.profiler = game.profiler
+        self.scheduler.start()
         Clock.schedule_once(self.show_start_buttons, 2)
 
         return game
@@ -169,6 +223,43 @@ class PongApp(App):
     def show_start_buttons(self, _instance):
         self.root.show_start_buttons()
 
+    def set_profiler(self, game, profiler):
+        game.profiler = game.sim.profiler = profiler
+        game.touches.profiler = profiler
+
+        if profiler.enabled:
+            from gamelib.profiler_overlay import ProfilerOverlay
+
+            # After the first frame our root widget is in the window, so
+            # the overlay goes on top of it rather than under the game.
+            on_first_frame(ProfilerOverlay(profiler).show)
+
+    def on_pause(self):
+        # Android is putting us in the background, so stop ticking
+        # until we come back.
+        self.scheduler.suspend()
+        return True
+
+    def on_resume(self):
+        # Only a game in play needs every frame.  Otherwise the start
+        # modal is up over the demo, so we go back to idling.
+        if self.root.game_in_play:
+            self.scheduler.wake()
+        else:
+            self.scheduler.idle()
+
+    def on_stop(self):
+        self.scheduler.stop()
+        Logger.info('Scheduler: {}'.format(self.scheduler.stats()))
+        Logger.info('Input: touch to physics latency\n' +
+                    self.root.touches.latency.report())
+        self.root.profiler.close()
+
+        if self.replay_file:
+            game = self.root
+            game.input_log.finish(game.sim)
+            game.input_log.save(self.replay_file)
+
 
 if __name__ == '__main__':
     PongApp().run()
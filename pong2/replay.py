@@ -0,0 +1,51 @@
+'''
+    Play back a saved Pong session without a window.
+
+    Record a session by setting PONG_REPLAY when running the game:
+
+        > PONG_REPLAY=session.rply python pong.py
+
+    Then fast-forward through it, and check that we end up in the same
+    state the game was in when it quit:
+
+        > python replay.py session.rply
+'''
+import sys
+import time
+
+from gamelib.replay import InputLog, replay
+
+from simulation import PongSim, TICK_RATE
+
+
+def play_back(filename):
+    log = InputLog.load(filename)
+    sim = PongSim.from_setup(log.setup, log.seed)
+    tick_rate = log.setup.get('tick_rate', TICK_RATE)
+
+    start = time.time()
+    sim.start_demo()
+    state_hash = replay(sim, log, 1.0 / tick_rate)
+    elapsed = time.time() - start
+
+    print('{}: {} inputs, {} ticks in {:.3f} s ({:.0f} ticks/s, '
+          '{:.0f}x real time)'.format(filename, len(log), sim.ticks,
+                                      elapsed,
+                                      sim.ticks / max(elapsed, 1e-9),
+                                      sim.ticks / tick_rate /
+                                      max(elapsed, 1e-9)))
+    print('score {} - {}'.format(sim.player1.score, sim.player2.score))
+
+    return state_hash == log.final_hash
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('usage: python replay.py <session.rply>')
+        sys.exit(1)
+
+    if play_back(sys.argv[1]):
+        print('replay matches the recorded session')
+    else:
+        print('replay does NOT match the recorded session')
+        sys.exit(1)
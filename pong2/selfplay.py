@@ -0,0 +1,67 @@
+'''
+    Tune the demo AI by having it play thousands of games against itself.
+
+    Both paddles are played by the demo AI, which moves a paddle towards
+    the ball (or with ai=predict, to where the ball is going to cross
+    it) at a fixed speed.  Player 1 uses the follow_speed we are
+    tuning, in pixels per second, and player 2 always uses the default
+    one.  Serves go off within serve_spread degrees of horizontal,
+    towards either player.  A game is won if player 1 wins it.
+
+        > python selfplay.py --games 500 --follow-speed 60,120,240
+
+    The games run across all of the cores, in a process pool.
+'''
+import argparse
+
+from gamelib import selfplay
+
+from simulation import PongSim, TICK_RATE
+
+
+WIDTH, HEIGHT = 800, 600
+
+# Give up on games that go on for longer than 10 minutes
+MAX_TICKS = int(TICK_RATE * 60 * 10)
+
+
+def play_game(params, seed):
+    sim = PongSim(WIDTH, HEIGHT, seed=seed)
+    sim.player1.follow_speed = params['follow_speed']
+    sim.serve_spread = params['serve_spread']
+    sim.predictive = params['ai'] == 'predict'
+    sim.autoplay = True
+
+    sim.start_game()
+    sim.start_demo()
+    sim.step(MAX_TICKS)
+
+    return {'won': sim.player1.score > sim.player2.score,
+            'paddle_hits': sim.paddle_hits,
+            'serves': sim.serves,
+            'ticks': sim.ticks,
+            'score': (sim.player1.score, sim.player2.score)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Pong self-play')
+    parser.add_argument('--follow-speed', type=selfplay.floats,
+                        default=[PongSim.follow_speed / 2,
+                                 PongSim.follow_speed,
+                                 PongSim.follow_speed * 2])
+    parser.add_argument('--serve-spread', type=selfplay.floats,
+                        default=[45])
+    parser.add_argument('--ai', type=selfplay.names,
+                        default=['chase', 'predict'],
+                        help='chase the ball, or predict where it goes')
+    selfplay.add_arguments(parser)
+    args = parser.parse_args()
+
+    param_sets = selfplay.grid(ai=args.ai,
+                               follow_speed=args.follow_speed,
+                               serve_spread=args.serve_spread)
+    selfplay.run(args, play_game, param_sets)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,349 @@
+'''
+    A headless simulation of the Pong game.
+
+    The game state lives here in plain Python objects, and the Kivy
+    widgets in pong.py only mirror it when a frame is rendered.
+    Velocities are in pixels per second.
+
+    Serves are random, but the randomness comes from a seeded generator,
+    so the same seed and inputs always play out the same game.
+'''
+from random import Random
+from math import cos, hypot, sin, radians
+
+from gamelib.profiler import NULL_PROFILER
+from gamelib.prediction import BallPredictor, predict_crossing, step_towards
+from gamelib.rect import Rect
+from gamelib.replay import MOVE, START, RESIZE, hash_values
+
+
+TICK_RATE = 60.0
+DEFAULT_DT = 1.0 / TICK_RATE
+
+
+class BallState(Rect):
+    def __init__(self, size=50.0):
+        super(BallState, self).__init__(width=size, height=size)
+        self.velocity_x = 0.0
+        self.velocity_y = 0.0
+
+    @property
+    def velocity(self):
+        return self.velocity_x, self.velocity_y
+
+    @velocity.setter
+    def velocity(self, value):
+        self.velocity_x, self.velocity_y = value
+
+    def move(self, dt):
+        self.x += self.velocity_x * dt
+        self.y += self.velocity_y * dt
+
+
+class PaddleState(Rect):
+    def __init__(self, width=25.0, height=150.0):
+        super(PaddleState, self).__init__(width=width, height=height)
+        self.score = 0
+
+        # how fast the demo AI moves this paddle, None for the default
+        self.follow_speed = None
+
+    def bounce_ball(self, ball, max_speed=None):
+        '''
+            Send the ball back, a little faster each time, but no faster
+            than max_speed.  We only bounce a ball that is coming
+            towards us, so one that is still overlapping us after a
+            bounce isn't bounced back again.
+        '''
+        if not self.collide(ball):
+            return False
+
+        if (self.center_x - ball.center_x) * ball.velocity_x <= 0.0:
+            return False
+
+        # Like the Kivy tutorial, only the x velocity turns around, and
+        # where the ball hits the paddle steers it up or down.  Turning
+        # the y velocity around too would send the ball straight back
+        # along its path, to where the other paddle already is.
+        speedup = 1.1
+        offset = 0.02 * TICK_RATE * (ball.center_y - self.center_y)
+        v_x = speedup * -ball.velocity_x
+        v_y = speedup * ball.velocity_y + offset
+        speed = hypot(v_x, v_y)
+
+        if max_speed is not None and speed > max_speed:
+            v_x, v_y = v_x * max_speed / speed, v_y * max_speed / speed
+
+        ball.velocity = v_x, v_y
+
+        return True
+
+
+class PongSim(object):
+    '''
+        The Pong game logic, free of any widgets.
+        The sizes default to the ones in pong.kv.
+    '''
+    winning_score = 5
+    serve_speed = 4 * TICK_RATE
+    follow_speed = 2 * TICK_RATE
+
+    # Each paddle hit speeds the ball up, up to this.  Any faster and
+    # it could go through a paddle in a single tick.
+    max_ball_speed = 16 * TICK_RATE
+
+    # Serves go off in a random direction, or if this is set, within
+    # this many degrees of horizontal towards a random player.
+    serve_spread = None
+
+    # Have the demo AI go to where the ball is going to cross the
+    # paddle, instead of chasing where it is now.
+    predictive = True
+
+    def __init__(self, width, height, paddle_size=(25.0, 150.0),
+                 ball_size=50.0, seed=None):
+        self.seed = seed
+        self.rng = Random(seed)
+        self.ball = BallState(ball_size)
+        self.player1 = PaddleState(*paddle_size)
+        self.player2 = PaddleState(*paddle_size)
+
+        self.game_in_play = False
+        self.game_over = False
+        self.autoplay = False
+        self.ticks = 0
+        self.serves = 0
+        self.paddle_hits = 0
+        self.predictor = BallPredictor(self.predict_ball)
+        self.profiler = NULL_PROFILER
+
+        self.width, self.height = 0.0, 0.0
+        self.resize(width, height)
+
+    def resize(self, width, height):
+        '''
+            Lay out the paddles for a new window size, the same way the
+            kv rules for the widgets would.
+        '''
+        self.width, self.height = float(width), float(height)
+
+        self.player1.x = 0.0
+        self.player2.x = self.width - self.player2.width
+
+        for player in (self.player1, self.player2):
+            player.center_y = self.height / 2.0
+            player.save_position()
+
+        if not self.game_in_play:
+            self.center_ball()
+
+        self.predictor.reset()
+
+    def center_ball(self):
+        self.ball.center_x = self.width / 2.0
+        self.ball.center_y = self.height / 2.0
+        self.ball.save_position()
+
+    def serve_ball(self):
+        self.center_ball()
+        if self.serve_spread is None:
+            direction = radians(self.rng.randint(0, 360))
+        else:
+            spread = int(self.serve_spread)
+            direction = radians(self.rng.randint(-spread, spread) +
+                                180 * self.rng.randint(0, 1))
+
+        self.ball.velocity = (self.serve_speed * cos(direction),
+                              self.serve_speed * sin(direction))
+        self.serves += 1
+        self.predictor.reset()
+
+    def step(self, n=1, dt=DEFAULT_DT):
+        '''
+            Advance the simulation n ticks of dt seconds each.
+            We stop early if the game ends, and return the number of
+            ticks that were actually run.
+        '''
+        for i in range(n):
+            self.tick(dt)
+
+            if self.game_over:
+                return i + 1
+
+        return n
+
+    def tick(self, dt):
+        profiler = self.profiler
+        profiler.begin()
+
+        self.ticks += 1
+        ball = self.ball
+
+        for rect in (ball, self.player1, self.player2):
+            rect.save_position()
+
+        ball.move(dt)
+        profiler.mark('move')
+
+        # bounce off paddles
+        for player in (self.player1, self.player2):
+            if player.bounce_ball(ball, self.max_ball_speed):
+                self.paddle_hits += 1
+
+        profiler.mark('paddles')
+
+        # bounce off top and bottom
+        if (ball.y < 0) or (ball.top > self.height):
+            ball.velocity_y *= -1
+
+        profiler.mark('walls')
+
+        if self.game_in_play:
+            self.out_of_bounds()
+            profiler.mark('out_of_bounds')
+
+            if self.autoplay:
+                self.follow_ball(dt)
+                profiler.mark('ai')
+
+            if self.game_is_over():
+                self.game_in_play = False
+                self.game_over = True
+                self.serve_ball()
+
+            profiler.mark('game_over')
+        else:
+            # demo game play
+            self.out_of_bounds(score_point=False)
+            profiler.mark('out_of_bounds')
+            self.follow_ball(dt)
+            profiler.mark('ai')
+
+    def out_of_bounds(self, score_point=True):
+        # went out-of-bounds to score point?  The ball has to be all the
+        # way off the screen on either side.
+        if self.ball.right < 0:
+            if score_point:
+                self.player2.score += 1
+            self.serve_ball()
+
+        if self.ball.x > self.width:
+            if score_point:
+                self.player1.score += 1
+            self.serve_ball()
+
+    def follow_ball(self, dt):
+        # Here we have the appropriate paddle try
+        # to hit the ball back.  This is just for demo play.
+        if self.ball.velocity_x >= 0.0:
+            player = self.player2
+        else:
+            player = self.player1
+
+        speed = player.follow_speed
+        if speed is None:
+            speed = self.follow_speed
+
+        if self.predictive:
+            target = self.predictor.target_for(self.ball)
+
+            if target is None:
+                target = self.ball.center_y
+
+            player.center_y = step_towards(player.center_y, target,
+                                           speed * dt)
+            return
+
+        if player.center_y > self.ball.center_y:
+            player.y -= speed * dt
+
+        if player.center_y < self.ball.center_y:
+            player.y += speed * dt
+
+    def predict_ball(self, ball):
+        '''
+            Where the ball's center_y will be when it gets to the paddle
+            it is heading for, bouncing off the top and bottom on the way.
+        '''
+        if ball.velocity_x >= 0.0:
+            line = self.player2.x - ball.width
+        else:
+            line = self.player1.right
+
+        half = ball.height / 2.0
+        crossing = predict_crossing(ball.x, ball.center_y,
+                                    ball.velocity_x, ball.velocity_y,
+                                    line, half, self.height - half)
+
+        if crossing is None:
+            return None
+
+        return crossing[1]
+
+    def reset_game(self):
+        self.player1.score = 0
+        self.player2.score = 0
+        self.game_over = False
+
+    def start_demo(self):
+        self.serve_ball()
+
+    def start_game(self):
+        self.game_in_play = True
+        self.reset_game()
+
+    def apply_input(self, kind, player, x, y):
+        '''
+            Apply a recorded input.  Everything the players can do to
+            the game goes through here when we replay a session.
+        '''
+        if kind == MOVE:
+            state = self.player1 if player == 1 else self.player2
+            self.move_player(state, x)
+        elif kind == START:
+            self.start_game()
+        elif kind == RESIZE:
+            self.resize(x, y)
+
+    def game_is_over(self):
+        return (self.player1.score >= self.winning_score or
+                self.player2.score >= self.winning_score)
+
+    def move_player(self, player, move_to):
+        new_pos = player.center_y + move_to
+        player.center_y = min(self.height - player.height / 2,
+                              max(player.height / 2, new_pos))
+        player.save_position()
+
+    def setup(self):
+        '''
+            What we need, along with the seed, to set up the same game
+            again.
+        '''
+        return {'width': self.width,
+                'height': self.height,
+                'paddle_size': [self.player1.width, self.player1.height],
+                'ball_size': self.ball.width,
+                'winning_score': self.winning_score,
+                'serve_spread': self.serve_spread,
+                'predictive': self.predictive}
+
+    @classmethod
+    def from_setup(cls, setup, seed):
+        sim = cls(setup['width'], setup['height'],
+                  paddle_size=setup['paddle_size'],
+                  ball_size=setup['ball_size'], seed=seed)
+        sim.winning_score = setup['winning_score']
+        sim.serve_spread = setup.get('serve_spread')
+        sim.predictive = setup.get('predictive', cls.predictive)
+
+        return sim
+
+    def state_hash(self):
+        ball, player1, player2 = self.ball, self.player1, self.player2
+
+        return hash_values(self.ticks, float(self.game_in_play),
+                           self.width, self.height,
+                           ball.x, ball.y, ball.velocity_x, ball.velocity_y,
+                           player1.y, player1.score,
+                           player2.y, player2.score)
@@ -0,0 +1,155 @@
+'''
+    Run the benchmarks of every game and compare them with a baseline.
+
+        > python run_benchmarks.py          compare with the baseline
+        > python run_benchmarks.py --save   save the results as the baseline
+
+    Each game's benchmarks.py is run from its own directory, with an
+    offscreen window so the rendering benchmarks can run anywhere.  A
+    benchmark that is slower than the baseline by more than the threshold
+    is flagged, and the exit status is 1 if any are, or if any of the
+    benchmarks' checks failed.  Every game is run a few times and we keep
+    the median time of each benchmark, which one lucky or unlucky run
+    can't move.  Benchmarks under a millisecond get a looser threshold,
+    since a context switch or a garbage collection is enough to move
+    them by 25%.
+
+    Timings are only comparable on the same machine, so the baseline is
+    not kept in the repo.  Save one on yours before making changes, and
+    compare against it afterwards.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+
+from gamelib.benchmark import (compare, format_time, load_results, median,
+                               save_results)
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GAMES = ('breakout', 'pong2', 'bounce_vector', 'map_tiles')
+BASELINE = os.path.join(ROOT, 'benchmarks_baseline.json')
+
+
+class BenchmarkFailed(Exception):
+    pass
+
+
+def run_game(game, render=True):
+    '''
+        Run one game's benchmarks, and return its results with the
+        names prefixed by the game.  Raises BenchmarkFailed with the last
+        line of the error if they fail, or one of their checks does.
+    '''
+    env = dict(os.environ, SDL_VIDEODRIVER='offscreen')
+    handle, filename = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+
+    command = [sys.executable, 'benchmarks.py', '--json', filename]
+    if render:
+        command.append('--render')
+
+    try:
+        process = subprocess.run(command, cwd=os.path.join(ROOT, game),
+                                 env=env, stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.PIPE,
+                                 universal_newlines=True)
+
+        if process.returncode != 0:
+            lines = process.stderr.strip().splitlines() or ['no output']
+            raise BenchmarkFailed(lines[-1])
+
+        results = load_results(filename)
+    finally:
+        os.remove(filename)
+
+    return {'{}.{}'.format(game, name): seconds
+            for name, seconds in results.items()}
+
+
+def print_table(rows):
+    print('{:<40} {:>12} {:>12} {:>7}'.format('benchmark', 'baseline',
+                                              'result', 'ratio'))
+
+    for name, old, new, ratio, status in rows:
+        ratio = '-' if ratio is None else '{:.2f}'.format(ratio)
+        print('{:<40} {:>12} {:>12} {:>7}  {}'.format(
+            name, format_time(old), format_time(new), ratio, status))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('games', nargs='*', default=GAMES,
+                        help='games to benchmark (default: all of them)')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file (default: %(default)s)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='flag benchmarks that are slower by more than '
+                             'this fraction (default: %(default)s)')
+    parser.add_argument('--fast-threshold', type=float, default=0.5,
+                        help='the threshold for benchmarks under a '
+                             'millisecond (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=5,
+                        help='runs of each game to take the median of '
+                             '(default: %(default)s)')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline')
+    parser.add_argument('--no-render', action='store_true',
+                        help="skip the benchmarks that need a GL context")
+    args = parser.parse_args()
+
+    samples = {}
+    failed = []
+    for game in args.games:
+        print('running {} benchmarks...'.format(game))
+
+        try:
+            for _i in range(args.runs):
+                for name, seconds in run_game(game,
+                                              not args.no_render).items():
+                    samples.setdefault(name, []).append(seconds)
+        except BenchmarkFailed as e:
+            print('{} benchmarks failed: {}'.format(game, e))
+            failed.append(game)
+
+    if failed:
+        # don't save or compare results from code that is broken
+        return 1
+
+    results = {name: median(times) for name, times in samples.items()}
+
+    if args.save:
+        if os.path.exists(args.baseline):
+            # keep the baseline of any games we didn't run
+            baseline = load_results(args.baseline)
+            baseline.update(results)
+            results = baseline
+
+        save_results(results, args.baseline)
+        print('saved {} results to {}'.format(len(results), args.baseline))
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print('no baseline, run with --save to make one')
+        return 0
+
+    baseline = load_results(args.baseline)
+    baseline = {name: seconds for name, seconds in baseline.items()
+                if name.split('.')[0] in args.games}
+    rows = compare(results, baseline, args.threshold,
+                   fast_threshold=args.fast_threshold)
+    print_table(rows)
+
+    slower = [row for row in rows if row[4] == 'slower']
+    if slower:
+        print('{} benchmarks are more than {:.0%} slower'.format(
+            len(slower), args.threshold))
+        return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,149 @@
+'''
+    Time how long every game takes to get its first frame up.
+
+        > python run_startup.py          check the games against the budget
+        > python run_startup.py --save   save the current times as the baseline
+
+    Each game is started a few times, from its own directory, with an
+    offscreen window and GAME_STARTUP set, so it saves the time of each
+    phase of its startup and quits after the first frame (see
+    gamelib/startup.py).  We print the median time of every phase, and
+    warn about any game whose time to first frame is over its budget:
+    its time in startup_baseline.json plus a margin.  With --strict the
+    exit status is 1 if any are.
+
+    --save starts each game more times than a check does, and saves the
+    median time to first frame of each as its baseline.  Like the
+    benchmarks, the times only mean something on the same machine, and
+    a phone is a lot slower than a desktop, so the baseline isn't kept
+    in the repo.  Save one on the machine you check on.
+'''
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+from collections import OrderedDict
+
+from gamelib.benchmark import format_time, load_results, median, save_results
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+GAMES = OrderedDict([('breakout', 'main.py'),
+                     ('pong2', 'pong.py'),
+                     ('bounce_vector', 'bounce_vector.py'),
+                     ('map_tiles', 'main.py')])
+PHASES = ('import', 'kv', 'window', 'build', 'first_frame', 'total')
+BASELINE = os.path.join(ROOT, 'startup_baseline.json')
+
+
+def run_game(game):
+    '''
+        Start a game once, and return the times of its startup phases.
+    '''
+    handle, filename = tempfile.mkstemp(suffix='.json')
+    os.close(handle)
+    env = dict(os.environ, SDL_VIDEODRIVER='offscreen', KIVY_NO_ARGS='1',
+               GAME_STARTUP=filename, GAME_STARTUP_EXIT='1')
+
+    try:
+        subprocess.run([sys.executable, GAMES[game]],
+                       cwd=os.path.join(ROOT, game), env=env,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       check=True, timeout=60)
+        return load_results(filename)
+    finally:
+        os.remove(filename)
+
+
+def time_game(game, runs):
+    '''
+        The median time of each phase over a number of runs, after one
+        run to warm up the disk cache and compile the .pyc files.
+    '''
+    run_game(game)
+    samples = [run_game(game) for _i in range(runs)]
+
+    return OrderedDict((phase, median([s.get(phase, 0.0) for s in samples]))
+                       for phase in PHASES)
+
+
+def print_table(times, budget):
+    print(('{:<14}' + ' {:>11}' * (len(PHASES) + 1)).format(
+        'game', *(PHASES + ('budget',))))
+
+    for game, phases in times.items():
+        columns = [format_time(phases[phase]) for phase in PHASES]
+        columns.append(format_time(budget.get(game)))
+        status = 'over' if over_budget(phases, budget.get(game)) else ''
+
+        print(('{:<14}' + ' {:>11}' * len(columns) + '  {}').format(
+            game, *(columns + [status])))
+
+
+def over_budget(phases, budget):
+    return budget is not None and phases['total'] > budget
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('games', nargs='*', default=list(GAMES),
+                        help='games to time (default: all of them)')
+    parser.add_argument('--baseline', default=BASELINE,
+                        help='baseline file (default: %(default)s)')
+    parser.add_argument('--runs', type=int, default=None,
+                        help='runs of each game to take the median of '
+                             '(default: 5, or 9 with --save)')
+    parser.add_argument('--save', action='store_true',
+                        help='save the times as the baseline')
+    parser.add_argument('--margin', type=float, default=0.25,
+                        help='fraction of the baseline a game can be '
+                             'slower by (default: %(default)s)')
+    parser.add_argument('--strict', action='store_true',
+                        help='exit with an error if any game is over '
+                             'its budget')
+    args = parser.parse_args()
+
+    if args.runs is None:
+        args.runs = 9 if args.save else 5
+
+    times = OrderedDict()
+    for game in args.games:
+        print('starting {}...'.format(game))
+        times[game] = time_game(game, args.runs)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        baseline = load_results(args.baseline)
+
+    if args.save:
+        # keep the baseline of any games we didn't run
+        baseline.update((game, phases['total'])
+                        for game, phases in times.items())
+        save_results(baseline, args.baseline)
+
+    budget = {game: seconds * (1.0 + args.margin)
+              for game, seconds in baseline.items()}
+    print_table(times, budget)
+
+    if args.save:
+        print('saved the baseline of {} games to {}'.format(len(times),
+                                                            args.baseline))
+        return 0
+
+    if not baseline:
+        print('no baseline, run with --save to make one')
+        return 0
+
+    over = [game for game, phases in times.items()
+            if over_budget(phases, budget.get(game))]
+    if over:
+        print('warning: {} over their startup budget'.format(
+            ', '.join(over)))
+        return 1 if args.strict else 0
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())